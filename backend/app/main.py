@@ -2,23 +2,46 @@
 Dale API - Backend principal
 API REST para la plataforma de viajes compartidos Dale.
 """
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.exceptions import RequestValidationError
+# Primero: mide el tiempo de importación del resto de la app
+from app.utils import startup
+from app.utils.startup import FAST_STARTUP, phase
+
+with phase("fastapi"):
+    from fastapi import FastAPI, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+    from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
 import logging
 import os
-from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
 # CRITICAL: Load environment variables BEFORE importing app modules
-# auth.py reads SUPABASE_JWT_SECRET at import time
-load_dotenv()
+# auth.py reads SUPABASE_JWT_SECRET at import time.
+# En modo FAST_STARTUP la plataforma ya inyecta las variables.
+if not FAST_STARTUP:
+    with phase("dotenv"):
+        from dotenv import load_dotenv
+        load_dotenv()
 
 # Importar routers (after load_dotenv!)
-from app.routes import users, rides, bookings, reviews, notifications
+with phase("routes"):
+    from app.routes import users, rides, bookings, reviews, notifications, batch, cities
+with phase("middleware"):
+    from app.utils.cache import entity_cache
+    from app.middleware.http_cache import HTTPCacheMiddleware
+    from app.middleware.admission import AdmissionControlMiddleware, admission_controller
+    from app.middleware.rate_limit import RateLimitMiddleware, stats as rate_limit_stats
+    from app.utils.singleflight import flights
+    from app.utils.resilience import db_breaker
+    from app.utils.cancellation import stats as cancellation_stats
+    from app.utils.streaming import stats as streaming_stats
+    from app.services.cities import city_index
+    from app.services.ride_index import ride_index
+    from app.services.pricing import price_model
+    from app.middleware.loop_monitor import LOOP_MONITOR_ENABLED, LoopMonitorMiddleware, loop_monitor
+    from app.middleware.profiler import PROFILER_ENABLED, ProfilerMiddleware
 
 
 @asynccontextmanager
@@ -29,11 +52,25 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Dale API starting up")
     logger.info("Supabase connection configured: %s", bool(os.getenv("SUPABASE_URL")))
+    logger.info("Redis cache configured: %s", bool(os.getenv("REDIS_URL")))
+    await entity_cache.start()
+    await city_index.start()
+    await ride_index.start()
+    await price_model.start()
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    await startup.warm_up(app)
+    logger.info("Startup (%s mode): %s", "fast" if FAST_STARTUP else "warm", startup.snapshot())
     
     yield
     
     # Shutdown
     logger.info("Dale API shutting down")
+    await loop_monitor.stop()
+    await price_model.stop()
+    await ride_index.stop()
+    await city_index.stop()
+    await entity_cache.stop()
 
 
 # Crear aplicación FastAPI
@@ -50,6 +87,28 @@ app = FastAPI(
 )
 
 
+# ETag / Cache-Control para endpoints públicos de lectura
+# (se registra antes que CORS para que CORS quede como capa exterior)
+app.add_middleware(HTTPCacheMiddleware)
+
+# Control de admisión: limita requests concurrentes por clase de ruta y
+# responde 503 + Retry-After cuando la cola se llena
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+
+# Rate limiting por usuario (JWT sub) o IP; va por fuera del control de
+# admisión para rechazar a los clientes abusivos antes de que ocupen cola
+app.add_middleware(RateLimitMiddleware)
+
+# Asocia cada request a su tarea para atribuir los bloqueos del event loop
+# a una ruta (el monitor se arranca en lifespan)
+app.add_middleware(LoopMonitorMiddleware)
+
+# Profiler bajo demanda (cabecera X-Dale-Profile); nunca en producción.
+# Envuelve al rate limiting para incluir también la verificación del JWT.
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+
 # Configurar CORS — entirely environment-driven
 # Set CORS_ORIGINS as a comma-separated list, e.g.:
 #   Dev:  CORS_ORIGINS=http://localhost:3000,http://localhost:3001
@@ -77,6 +136,8 @@ app.include_router(rides.router)
 app.include_router(bookings.router)
 app.include_router(reviews.router)
 app.include_router(notifications.router)
+app.include_router(batch.router)
+app.include_router(cities.router)
 
 
 # Manejador global de errores de validación
@@ -129,6 +190,31 @@ async def health_check():
     }
 
 
+# Métricas internas del worker
+@app.get("/metrics", tags=["health"])
+async def metrics():
+    """
+    Métricas del worker: control de admisión, caché, coalescencia, estado
+    del circuit breaker de base de datos, trabajo cancelado por desconexión,
+    respuestas en streaming, índices de ciudades y de viajes, modelo de
+    precios, desglose del tiempo de arranque y lag / bloqueos del event loop.
+    """
+    return {
+        "admission": admission_controller.snapshot(),
+        "cache": entity_cache.stats,
+        "singleflight": {**flights.stats, "in_flight": flights.in_flight()},
+        "rate_limit": rate_limit_stats,
+        "db_breaker": db_breaker.snapshot(),
+        "cancellation": cancellation_stats,
+        "streaming": streaming_stats,
+        "cities": city_index.snapshot(),
+        "ride_index": ride_index.snapshot(),
+        "pricing": price_model.snapshot(),
+        "startup": startup.snapshot(),
+        "event_loop": loop_monitor.snapshot(),
+    }
+
+
 # Endpoint de información
 @app.get("/api/info", tags=["info"])
 async def api_info():
@@ -140,12 +226,19 @@ async def api_info():
             "users": {
                 "GET /api/users/me": "Obtener perfil del usuario autenticado",
                 "PATCH /api/users/me": "Actualizar perfil del usuario",
+                "GET /api/users?ids=...": "Obtener varios perfiles públicos por ID",
                 "GET /api/users/{id}": "Obtener perfil público de usuario"
             },
             "rides": {
                 "POST /api/rides": "Crear nuevo viaje (requiere rol driver)",
                 "GET /api/rides": "Buscar viajes con filtros",
+                "GET /api/rides/search": "Buscar viajes en un rango de fechas, agrupados por día",
+                "GET /api/rides/page": "Buscar viajes: una página con total y facetas",
+                "GET /api/rides/corridor?from_lat=...": "Buscar viajes que pasan cerca de recogida y destino",
+                "GET /api/rides/price-suggestion?from_lat=...": "Sugerir precio según viajes anteriores",
+                "GET /api/rides/recommended?from_lat=...": "Viajes recomendados para mí",
                 "GET /api/rides/{id}": "Obtener detalles de un viaje",
+                "GET /api/rides/batch?ids=...": "Obtener varios viajes por ID",
                 "GET /api/rides/my/rides": "Obtener mis viajes como conductor",
                 "DELETE /api/rides/{id}": "Eliminar mi viaje"
             },
@@ -155,6 +248,16 @@ async def api_info():
                 "GET /api/bookings/{id}": "Obtener detalles de una reserva",
                 "DELETE /api/bookings/{id}": "Cancelar reserva",
                 "PATCH /api/bookings/{id}/confirm": "Confirmar reserva (solo conductor)"
+            },
+            "cities": {
+                "GET /api/cities/suggest?q=...": "Autocompletar ciudades (sin acentos, por número de viajes)"
+            },
+            "batch": {
+                "POST /api/batch": "Ejecutar varias peticiones GET en una sola llamada"
+            },
+            "health": {
+                "GET /health": "Health check",
+                "GET /metrics": "Métricas del worker (admisión, caché, coalescencia, event loop)"
             }
         },
         "authentication": {
@@ -164,6 +267,10 @@ async def api_info():
     }
 
 
+startup.finish_import()
+
+
+# Desarrollo (con recarga). En producción: python -m app.server
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,224 @@
+"""
+Middleware de control de admisión y descarte de carga (load shedding).
+
+Limita los requests concurrentes por clase de ruta (búsqueda, lecturas,
+escrituras, notificaciones). Los que exceden el límite esperan en una
+cola acotada durante un tiempo máximo; si la cola está llena o se agota
+la espera, se responde 503 con `Retry-After` en lugar de dejar que los
+requests se acumulen en uvicorn hasta que todos expiren a la vez.
+
+Los health checks y las peticiones CORS preflight nunca se encolan. Un
+`POST /api/batch` tampoco ocupa cupo: cada uno de sus sub-requests pasa
+por este middleware y se admite en la compuerta de su propia clase, igual
+que si llegara por separado.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rutas que siempre se atienden (prioridad para monitoreo)
+PRIORITY_PATHS = {"/", "/health", "/metrics"}
+
+# Límites por defecto: (concurrentes, tamaño de cola, espera máxima en segundos)
+DEFAULT_LIMITS = {
+    "search": (32, 64, 2.0),
+    "reads": (32, 64, 2.0),
+    "writes": (16, 32, 5.0),
+    "notifications": (8, 16, 1.0),
+}
+
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """
+    Determina la clase de admisión de un request.
+
+    Returns:
+        Nombre de la clase, o None si el request no se limita
+    """
+    if method == "OPTIONS" or path in PRIORITY_PATHS:
+        return None
+    if path.startswith("/api/batch"):
+        # Se admiten sus sub-requests, cada uno en su clase
+        return None
+    if path.startswith("/api/notifications"):
+        return "notifications"
+    if method not in ("GET", "HEAD"):
+        return "writes"
+    if path.startswith("/api/rides"):
+        return "search"
+    return "reads"
+
+
+class AdmissionGate:
+    """
+    Semáforo con cola FIFO acotada y espera máxima para una clase de rutas.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """
+        Intenta obtener un cupo.
+
+        Returns:
+            True si el request fue admitido, False si debe descartarse
+        """
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Si el cupo ya nos fue cedido, se devuelve al siguiente
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+        if waiter.done() and not waiter.cancelled():
+            self.admitted += 1
+            return True
+
+        self._discard(waiter)
+        self.shed += 1
+        return False
+
+    def release(self) -> None:
+        """
+        Libera un cupo, cediéndolo directamente al primero de la cola.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+class AdmissionController:
+    """
+    Conjunto de compuertas de admisión, una por clase de ruta.
+    """
+
+    def __init__(self, limits: Dict[str, tuple] = DEFAULT_LIMITS):
+        self.gates = {
+            name: AdmissionGate(name, *limit) for name, limit in limits.items()
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Crea el controlador leyendo `ADMISSION_<CLASE>_{CONCURRENCY,QUEUE,WAIT}`.
+        """
+        limits = {}
+        for name, (concurrency, queue, wait) in DEFAULT_LIMITS.items():
+            prefix = f"ADMISSION_{name.upper()}_"
+            limits[name] = (
+                int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+                int(os.getenv(prefix + "QUEUE", queue)),
+                float(os.getenv(prefix + "WAIT", wait)),
+            )
+        return cls(limits)
+
+    def snapshot(self) -> dict:
+        return {name: gate.snapshot() for name, gate in self.gates.items()}
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI que aplica el `AdmissionController` a cada request HTTP.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify_request(scope["method"], scope["path"])
+        gate = self.controller.gates.get(route_class) if route_class else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire():
+            logger.warning("Request descartado (%s): %s %s", gate.name, scope["method"], scope["path"])
+            await _send_overloaded(send, gate)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+async def _send_overloaded(send, gate: AdmissionGate) -> None:
+    """
+    Envía una respuesta 503 con `Retry-After`.
+    """
+    body = json.dumps({
+        "detail": "El servidor está saturado, intenta de nuevo en unos segundos"
+    }).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(gate.max_wait))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Controlador compartido por el worker (también usado por /metrics)
+admission_controller = AdmissionController.from_env()
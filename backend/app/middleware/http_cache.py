@@ -0,0 +1,135 @@
+"""
+Middleware de caché HTTP para endpoints públicos de lectura.
+
+Calcula un ETag fuerte a partir del contenido de la respuesta, responde
+304 Not Modified cuando coincide con `If-None-Match` y añade cabeceras
+`Cache-Control` con `stale-while-revalidate` para que el CDN (Vercel)
+y los navegadores puedan servir vistas repetidas sin llegar a la API.
+"""
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+_UUID = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+
+# (ruta, max-age, stale-while-revalidate) en segundos.
+# Solo rutas públicas: su respuesta no depende del usuario autenticado.
+CACHE_RULES: List[Tuple[re.Pattern, int, int]] = [
+    (re.compile(r"^/api/rides$"), 15, 60),
+    (re.compile(r"^/api/rides/search$"), 15, 60),
+    (re.compile(r"^/api/rides/page$"), 15, 60),
+    (re.compile(r"^/api/rides/corridor$"), 15, 60),
+    (re.compile(r"^/api/rides/price-suggestion$"), 300, 600),
+    (re.compile(rf"^/api/rides/{_UUID}$"), 30, 120),
+    (re.compile(rf"^/api/users/{_UUID}$"), 60, 300),
+    (re.compile(rf"^/api/reviews/user/{_UUID}$"), 60, 300),
+    (re.compile(r"^/api/cities/suggest$"), 300, 600),
+]
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Calcula un ETag fuerte a partir del contenido.
+    """
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Compara `If-None-Match` con un ETag (comparación débil, RFC 9110 §13.1.2).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _match_rule(path: str) -> Optional[Tuple[int, int]]:
+    for pattern, max_age, swr in CACHE_RULES:
+        if pattern.match(path):
+            return max_age, swr
+    return None
+
+
+class HTTPCacheMiddleware:
+    """
+    Middleware ASGI que añade ETag / Cache-Control y resuelve GET condicionales.
+
+    Solo actúa sobre respuestas 200 de una sola parte; las respuestas en
+    streaming (varios fragmentos) se dejan pasar sin modificar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        rule = _match_rule(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_age, swr = rule
+        cache_control = f"public, max-age={max_age}, stale-while-revalidate={swr}".encode()
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Respuesta en streaming: no se puede calcular el ETag
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            etag = compute_etag(body)
+            headers = [
+                (k, v) for k, v in start_message.get("headers", [])
+                if k != b"etag"
+            ]
+            headers.append((b"etag", etag.encode()))
+            # Respeta el Cache-Control fijado por la ruta (p. ej. respuestas obsoletas)
+            if not any(k == b"cache-control" for k, _ in headers):
+                headers.append((b"cache-control", cache_control))
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                headers = [
+                    (k, v) for k, v in headers
+                    if k not in (b"content-length", b"content-type")
+                ]
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send({**start_message, "headers": headers})
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,274 @@
+"""
+Monitor de lag del event loop y detector de llamadas bloqueantes.
+
+- Una tarea del propio loop duerme `LOOP_MONITOR_INTERVAL` segundos en
+  bucle y mide cuánto tarda de más en despertar: ese retraso es el lag del
+  loop, que se acumula en un histograma.
+- Un hilo watchdog comprueba que esa tarea siga despertando. Si el loop
+  lleva más de `LOOP_BLOCK_THRESHOLD` segundos sin atenderla, captura la
+  pila del hilo del loop (`sys._current_frames`) y la ruta del request cuya
+  tarea se está ejecutando. La pila solo se escribe en el log: `/metrics`
+  es público y solo expone recuentos y duraciones.
+
+`LoopMonitorMiddleware` asocia cada tarea de request a su scope ASGI; las
+tareas que crea un request (single-flight, cancelación, batch) heredan la
+asociación mediante la task factory del loop.
+
+El coste en reposo es un despertar del loop cada `LOOP_MONITOR_INTERVAL` y
+uno del hilo cada `LOOP_BLOCK_THRESHOLD / 2`.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))
+
+# Límites superiores (ms) de los buckets del histograma de lag
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Frames de pila que se guardan por evento de bloqueo
+STACK_LIMIT = 15
+
+
+class LagHistogram:
+    """
+    Histograma acumulativo (estilo Prometheus) de lag en milisegundos.
+    """
+
+    def __init__(self, buckets=LAG_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[f"le_{bound}"] = running
+        cumulative["+Inf"] = self.count
+        return {
+            "buckets_ms": cumulative,
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+def _route_label(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "unknown"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', '?')} {path}"
+
+
+class LoopMonitor:
+    """
+    Mide el lag del loop y registra los bloqueos con su ruta y pila.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        threshold: float = LOOP_BLOCK_THRESHOLD,
+        max_events: int = 50
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = LagHistogram()
+        self.blocking_events: Deque[dict] = deque(maxlen=max_events)
+        self.blocked_by_route: Dict[str, int] = {}
+        self._task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._previous_factory = None
+        self._probe: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._last_tick = 0.0
+        self._reported_tick = 0.0
+        self._pending_event: Optional[dict] = None
+
+    # --- Asociación tarea -> request ---
+
+    def bind(self, scope: dict) -> Optional[dict]:
+        """
+        Asocia la tarea actual al scope de un request. Devuelve el scope
+        anterior para restaurarlo con `unbind`.
+        """
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        previous = self._task_scopes.get(task)
+        self._task_scopes[task] = scope
+        return previous
+
+    def unbind(self, previous: Optional[dict]) -> None:
+        task = asyncio.current_task()
+        if task is None:
+            return
+        if previous is None:
+            self._task_scopes.pop(task, None)
+        else:
+            self._task_scopes[task] = previous
+
+    def scope_of(self, task: asyncio.Task) -> Optional[dict]:
+        """
+        Scope ASGI del request al que pertenece una tarea, si se conoce.
+        """
+        return self._task_scopes.get(task)
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        # La tarea hija hereda el request de la tarea que la crea
+        parent = asyncio.current_task(loop)
+        if parent is not None:
+            scope = self._task_scopes.get(parent)
+            if scope is not None:
+                self._task_scopes[task] = scope
+        return task
+
+    # --- Ciclo de vida ---
+
+    async def start(self) -> None:
+        if self._probe is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._last_tick = time.monotonic()
+        self._stopping.clear()
+        self._probe = asyncio.create_task(self._run_probe())
+        self._watchdog = threading.Thread(target=self._run_watchdog, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._probe is None:
+            return
+        self._stopping.set()
+        self._probe.cancel()
+        try:
+            await self._probe
+        except asyncio.CancelledError:
+            pass
+        self._probe = None
+        if self._loop.get_task_factory() == self._task_factory:
+            self._loop.set_task_factory(self._previous_factory)
+        self._watchdog.join(timeout=1.0)
+
+    # --- Medición ---
+
+    async def _run_probe(self) -> None:
+        while True:
+            self._last_tick = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._last_tick - self.interval)
+            self.lag.observe(lag * 1000)
+
+            event = self._pending_event
+            if event is not None:
+                # El watchdog vio el bloqueo; ahora se conoce su duración
+                self._pending_event = None
+                event["duration_ms"] = round(lag * 1000, 1)
+                logger.warning(
+                    "Event loop bloqueado %.0f ms en %s:\n%s",
+                    event["duration_ms"], event["route"], "".join(event["stack"])
+                )
+            elif lag > self.threshold:
+                # Bloqueo que el watchdog no llegó a muestrear
+                self._record_event("unknown", [], lag * 1000)
+
+    def _run_watchdog(self) -> None:
+        while not self._stopping.wait(self.threshold / 2):
+            tick = self._last_tick
+            if tick == self._reported_tick:
+                continue
+            if time.monotonic() - tick - self.interval < self.threshold:
+                continue
+
+            self._reported_tick = tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame else []
+            task = asyncio.current_task(self._loop)
+            scope = self.scope_of(task) if task is not None else None
+            self._pending_event = self._record_event(_route_label(scope), stack, None)
+
+    def _record_event(self, route: str, stack: List[str], duration_ms: Optional[float]) -> dict:
+        event = {
+            "at": time.time(),
+            "route": route,
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            "stack": stack,
+        }
+        self.blocking_events.append(event)
+        self.blocked_by_route[route] = self.blocked_by_route.get(route, 0) + 1
+        return event
+
+    def snapshot(self) -> dict:
+        # Sin pilas (rutas de archivos y código del servidor)
+        recent = [
+            {key: value for key, value in event.items() if key != "stack"}
+            for event in list(self.blocking_events)[-10:]
+        ]
+        return {
+            "enabled": self._probe is not None,
+            "interval_seconds": self.interval,
+            "block_threshold_seconds": self.threshold,
+            "lag": self.lag.snapshot(),
+            "blocked_by_route": dict(self.blocked_by_route),
+            "recent_blocks": recent,
+        }
+
+
+# Instancia compartida por el worker
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """
+    Middleware ASGI que asocia la tarea de cada request a su scope para
+    poder atribuir los bloqueos del loop a una ruta.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        previous = self.monitor.bind(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.unbind(previous)
@@ -0,0 +1,214 @@
+"""
+Profiler por request bajo demanda (solo fuera de producción).
+
+Un request con la cabecera `X-Dale-Profile: 1` (o el query param
+`__profile=1`) se ejecuta normalmente mientras un hilo muestrea su pila
+cada `PROFILER_INTERVAL` segundos:
+
+- el hilo del event loop, cuando la tarea en ejecución es de ese request
+  (incluidas sus tareas hijas, vía `loop_monitor`), y
+- los hilos del threadpool que ejecutan sus consultas a PostgREST
+  (`run_query` los registra con `app.utils.profiling.wrap_thread`).
+
+En lugar de la respuesta de la ruta se devuelve un archivo de pilas
+"folded" (`frame;frame;frame N`), compatible con flamegraph.pl,
+speedscope o Firefox Profiler. La cabecera `X-Profile-Summary` resume el
+porcentaje de muestras en JWT, Pydantic, PostgREST y codificación JSON.
+
+El middleware solo se instala con `PROFILER_ENABLED=true` (apagado por
+defecto) y nunca con `ENV=production`. Si `PROFILER_TOKEN` está definido,
+la cabecera debe llevar ese valor.
+"""
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qsl
+from app.middleware.loop_monitor import loop_monitor
+from app.utils.profiling import profiled_threads
+
+# Apagado salvo que se active explícitamente (p. ej. en docker-compose.yml)
+PROFILER_ENABLED = (
+    os.getenv("ENV") != "production"
+    and os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+)
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.001"))
+
+PROFILE_HEADER = b"x-dale-profile"
+PROFILE_QUERY_PARAM = "__profile"
+
+# Categorías del resumen: fragmentos de ruta de archivo que las identifican
+CATEGORIES = {
+    "jwt": ("/jwt/", "/jose/"),
+    "pydantic": ("/pydantic/", "/pydantic_core/"),
+    "postgrest": ("/postgrest/", "/httpx/", "/httpcore/"),
+    "json_encoding": ("/json/", "/fastapi/encoders.py", "/starlette/responses.py"),
+}
+
+# Prefijos que se recortan de las rutas de archivo en las pilas
+_PATH_PREFIX = re.compile(r"^.*?(?:site-packages/|/backend/|/lib/python3\.\d+/)")
+
+# Intervalo de cambio de hilo mientras hay perfiles activos: con el valor por
+# defecto (5 ms) el hilo de muestreo apenas obtiene el GIL si el loop está
+# ocupado con trabajo de CPU
+_PROFILING_SWITCH_INTERVAL = 0.0005
+_switch_lock = threading.Lock()
+_active_profiles = 0
+_default_switch_interval = sys.getswitchinterval()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = _PATH_PREFIX.sub("", code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """
+    Muestreo de pilas de un único request.
+    """
+
+    def __init__(self, scope: dict, interval: float = PROFILER_INTERVAL):
+        self.scope = scope
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.total = 0
+        self.threads: Set[int] = set()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._root_task = asyncio.current_task()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        global _active_profiles
+        with _switch_lock:
+            _active_profiles += 1
+            sys.setswitchinterval(_PROFILING_SWITCH_INTERVAL)
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        global _active_profiles
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        with _switch_lock:
+            _active_profiles -= 1
+            if _active_profiles == 0:
+                sys.setswitchinterval(_default_switch_interval)
+
+    def _belongs(self, task: asyncio.Task) -> bool:
+        if task is self._root_task:
+            return True
+        scope = loop_monitor.scope_of(task)
+        # Sin asociación conocida (monitor apagado) se cuenta la muestra
+        return scope is None or scope is self.scope
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            task = asyncio.current_task(self._loop)
+            if task is not None and self._belongs(task):
+                self._add(frames.get(self._loop_thread_id), "event_loop")
+            for thread_id in list(self.threads):
+                self._add(frames.get(thread_id), "threadpool")
+
+    def _add(self, frame, root: str) -> None:
+        if frame is None:
+            return
+        labels, filenames = [], []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            filenames.append(frame.f_code.co_filename)
+            frame = frame.f_back
+        labels.append(root)
+        labels.reverse()
+
+        self.samples[";".join(labels)] += 1
+        self.total += 1
+        files = " ".join(filenames)
+        for category, markers in CATEGORIES.items():
+            if any(marker in files for marker in markers):
+                self.categories[category] += 1
+
+    def folded(self) -> bytes:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        ).encode()
+
+    def summary(self) -> str:
+        if not self.total:
+            return "samples=0"
+        parts = [f"samples={self.total}", f"elapsed_ms={self.elapsed * 1000:.1f}"]
+        for category in CATEGORIES:
+            parts.append(f"{category}={100 * self.categories[category] / self.total:.1f}%")
+        return "; ".join(parts)
+
+
+def profiling_requested(scope: dict, token: Optional[str] = PROFILER_TOKEN) -> bool:
+    expected = token or "1"
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1") == expected
+    if PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+        params = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        return params.get(PROFILE_QUERY_PARAM) == expected
+    return False
+
+
+class ProfilerMiddleware:
+    """
+    Middleware ASGI que perfila los requests que lo piden y devuelve el
+    perfil como archivo descargable.
+    """
+
+    def __init__(self, app, token: Optional[str] = PROFILER_TOKEN, interval: float = PROFILER_INTERVAL):
+        self.app = app
+        self.token = token
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_requested(scope, self.token):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope, self.interval)
+        status: Dict[str, int] = {"code": 500}
+
+        async def capture(message):
+            # La respuesta de la ruta se descarta; solo se guarda su status
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        token = profiled_threads.set(profile.threads)
+        profile.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profile.stop()
+            profiled_threads.reset(token)
+
+        body = profile.folded()
+        filename = f"profile-{int(time.time())}.folded"
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"content-disposition", f'attachment; filename="{filename}"'.encode()),
+                (b"cache-control", b"no-store"),
+                (b"x-profile-status", str(status["code"]).encode()),
+                (b"x-profile-summary", profile.summary().encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
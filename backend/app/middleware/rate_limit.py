@@ -0,0 +1,263 @@
+"""
+Middleware de rate limiting por usuario / IP con token bucket.
+
+Cada request consume un token del bucket asociado a (regla, identidad),
+donde la identidad es el `sub` del JWT si el token es válido o la IP del
+cliente en caso contrario. Los sub-requests de `POST /api/batch` heredan
+la identidad del batch y consumen cada uno de la regla de su ruta, como si
+llegaran por separado. Hay dos implementaciones:
+
+- `MemoryTokenBucket`: en memoria del proceso (un solo worker).
+- `RedisTokenBucket`: atómica en Redis mediante un script Lua, compartida
+  por todos los workers de `docker-compose.prod.yml`.
+
+Si Redis falla, se usa el bucket en memoria en lugar de rechazar tráfico.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import jwt
+from app.middleware.auth import JWT_ALGORITHM, JWT_AUDIENCE, SUPABASE_JWT_SECRET
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory")
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+# Contadores expuestos en /metrics
+stats = {"backend": RATE_LIMIT_BACKEND, "limited": 0}
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Presupuesto de una familia de rutas: `rate` tokens/segundo, hasta `burst`."""
+    name: str
+    methods: Tuple[str, ...]
+    pattern: re.Pattern
+    rate: float
+    burst: int
+
+
+# Se aplica la primera regla que coincida
+RATE_LIMIT_RULES: List[RateLimitRule] = [
+    RateLimitRule("search", ("GET", "HEAD"), re.compile(r"^/api/rides(/(page|search|corridor|recommended))?$"), rate=1.0, burst=30),
+    RateLimitRule("writes", ("POST", "PUT", "PATCH", "DELETE"), re.compile(r"^/api/(?!batch)"), rate=0.5, burst=20),
+    RateLimitRule("api", ("GET", "HEAD", "POST"), re.compile(r"^/api/"), rate=5.0, burst=60),
+]
+
+
+def match_rule(method: str, path: str) -> Optional[RateLimitRule]:
+    for rule in RATE_LIMIT_RULES:
+        if method in rule.methods and rule.pattern.match(path):
+            return rule
+    return None
+
+
+class MemoryTokenBucket:
+    """
+    Token bucket en memoria. Cada bucket es una lista [tokens, timestamp].
+    """
+
+    def __init__(self, max_keys: int = 50_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, int, float]:
+        return self.hit_sync(key, rate, burst)
+
+    def hit_sync(self, key: str, rate: float, burst: int) -> Tuple[bool, int, float]:
+        """
+        Consume un token.
+
+        Returns:
+            (permitido, tokens restantes, segundos hasta el próximo token)
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, int(bucket[0]), 0.0
+        return False, 0, (1 - bucket[0]) / rate
+
+
+# KEYS[1] = clave del bucket; ARGV = rate, burst
+# Usa el reloj de Redis para que todos los workers compartan la misma hora.
+_REDIS_TOKEN_BUCKET = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+  tokens = burst
+  ts = now
+end
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket atómico en Redis (script Lua), compartido entre workers.
+    """
+
+    def __init__(self, fallback: MemoryTokenBucket, prefix: str = "dale:ratelimit"):
+        self.fallback = fallback
+        self.prefix = prefix
+        self._script = None
+
+    async def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, int, float]:
+        redis = get_redis()
+        if redis is None:
+            return self.fallback.hit_sync(key, rate, burst)
+
+        try:
+            if self._script is None:
+                self._script = redis.register_script(_REDIS_TOKEN_BUCKET)
+            allowed, tokens = await self._script(keys=[f"{self.prefix}:{key}"], args=[rate, burst])
+            tokens = float(tokens)
+        except Exception as e:
+            logger.warning("Rate limiting en Redis no disponible, usando memoria: %s", e)
+            return self.fallback.hit_sync(key, rate, burst)
+
+        if allowed:
+            return True, int(tokens), 0.0
+        return False, 0, (1 - tokens) / rate
+
+
+class _SubjectCache:
+    """
+    Cache token JWT -> sub, para no verificar la firma en cada request.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[str, int]] = {}
+
+    def subject(self, token: str) -> Optional[str]:
+        entry = self._entries.get(token)
+        if entry is not None:
+            sub, exp = entry
+            return sub if exp > time.time() else None
+
+        try:
+            payload = jwt.decode(
+                token,
+                SUPABASE_JWT_SECRET,
+                algorithms=[JWT_ALGORITHM],
+                audience=JWT_AUDIENCE,
+            )
+        except jwt.PyJWTError:
+            return None
+
+        sub = payload.get("sub")
+        if sub:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[token] = (sub, int(payload.get("exp", 0)))
+        return sub
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI que aplica `RATE_LIMIT_RULES` por usuario o IP.
+    """
+
+    def __init__(self, app, enabled: bool = RATE_LIMIT_ENABLED, backend: str = RATE_LIMIT_BACKEND):
+        self.app = app
+        self.enabled = enabled
+        memory = MemoryTokenBucket()
+        self.limiter = RedisTokenBucket(memory) if backend == "redis" else memory
+        self._subjects = _SubjectCache()
+        stats["backend"] = backend
+
+    def identity(self, scope) -> str:
+        """
+        Identidad del cliente: `user:<sub>` si hay un JWT válido, `ip:<addr>` si no.
+        """
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    sub = self._subjects.subject(token)
+                    if sub:
+                        return f"user:{sub}"
+            elif name == b"x-forwarded-for" and TRUST_PROXY_HEADERS:
+                forwarded = value.decode("latin-1").split(",")[0].strip()
+
+        if forwarded:
+            return f"ip:{forwarded}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = match_rule(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, remaining, retry_after = await self.limiter.hit(
+            f"{rule.name}:{self.identity(scope)}", rule.rate, rule.burst
+        )
+        limit_headers = [
+            (b"x-ratelimit-limit", str(rule.burst).encode()),
+            (b"x-ratelimit-remaining", str(remaining).encode()),
+        ]
+
+        if not allowed:
+            stats["limited"] += 1
+            body = json.dumps({
+                "detail": "Demasiadas solicitudes, intenta de nuevo más tarde"
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                    *limit_headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *limit_headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -2,7 +2,7 @@
 Modelos Pydantic para validación de datos de la API.
 """
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Literal
+from typing import Any, Dict, List, Optional, Literal, Tuple
 from datetime import datetime
 from uuid import UUID
 import re
@@ -63,7 +63,19 @@ class RideBase(BaseModel):
 
 
 class RideCreate(RideBase):
-    pass
+    route: Optional[List[Tuple[float, float]]] = Field(
+        None,
+        max_length=500,
+        description="Ruta aproximada [[lat, lon], ...] entre origen y destino (para búsqueda por corredor)"
+    )
+
+    @field_validator('route')
+    @classmethod
+    def validate_route(cls, v):
+        for lat, lon in v or []:
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError('Coordenadas de ruta inválidas')
+        return v
 
 
 class RideResponse(RideBase):
@@ -77,6 +89,64 @@ class RideResponse(RideBase):
         from_attributes = True
 
 
+class PriceSuggestion(BaseModel):
+    """Schema for a suggested ride price."""
+    distance_km: float
+    suggested_price: float
+    low: float
+    high: float
+    basis: Literal["pair", "distance", "default"]
+    sample_size: int
+
+
+class RideRecommendation(BaseModel):
+    """Schema for a recommended ride with its score."""
+    ride: RideResponse
+    score: float
+    origin_km: float
+    destination_km: Optional[float] = None
+
+
+class RideDay(BaseModel):
+    """Schema for the rides departing on one day of a search window."""
+    date: str
+    count: int
+    rides: List[RideResponse]
+
+
+class RideDaySearch(BaseModel):
+    """Schema for a search window grouped by day."""
+    date_from: str
+    date_to: str
+    total: int
+    days: List[RideDay]
+
+
+class PriceFacet(BaseModel):
+    """Schema for the number of rides in one price band."""
+    min: float
+    max: Optional[float] = None
+    count: int
+
+
+class RideFacets(BaseModel):
+    """Schema for the facet counts of a search."""
+    price: List[PriceFacet]
+    price_unknown: int
+    time_of_day: Dict[str, int]
+    seats: Dict[str, int]
+
+
+class RideSearchPage(BaseModel):
+    """Schema for a page of search results with total and facets."""
+    total: int
+    truncated: bool = False
+    offset: int
+    limit: int
+    facets: RideFacets
+    rides: List[RideResponse]
+
+
 class RideSearchParams(BaseModel):
     from_city: Optional[str] = None
     to_city: Optional[str] = None
@@ -187,3 +257,38 @@ class PaginatedNotificationsResponse(BaseModel):
 class UnreadCountResponse(BaseModel):
     """Schema for unread notifications count."""
     count: int
+
+
+# ============= BATCH MODELS =============
+
+class BatchSubRequest(BaseModel):
+    """Schema for a single GET sub-request inside a batch."""
+    id: Optional[str] = Field(None, max_length=100, description="Client-side identifier echoed back")
+    path: str = Field(..., min_length=1, max_length=2000, description="Path and query, e.g. /api/bookings")
+
+
+class BatchRequest(BaseModel):
+    """Schema for POST /api/batch."""
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=10)
+
+
+class BatchSubResponse(BaseModel):
+    """Schema for the result of a single sub-request."""
+    id: Optional[str] = None
+    path: str
+    status: int
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    """Schema for the combined batch response."""
+    responses: List[BatchSubResponse]
+
+
+# ============= CITY MODELS =============
+
+class CitySuggestion(BaseModel):
+    """Schema for a city autocomplete suggestion."""
+    name: str
+    state: Optional[str] = None
+    ride_count: int = 0
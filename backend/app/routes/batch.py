@@ -0,0 +1,127 @@
+"""
+Rutas de API para agrupar varias peticiones GET en una sola (batch).
+
+Pensado para clientes móviles: en lugar de abrir una conexión por cada
+endpoint al iniciar la app, se envían todas las lecturas en un único
+`POST /api/batch` que las ejecuta en el mismo proceso y en paralelo.
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Request
+from app.models.schemas import (
+    BatchRequest,
+    BatchResponse,
+    BatchSubRequest,
+    BatchSubResponse
+)
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+# Cabeceras del request original que se propagan a cada sub-request
+FORWARDED_HEADERS = {
+    b"authorization",
+    b"accept",
+    b"accept-language",
+    b"user-agent",
+    b"x-forwarded-for",
+    b"x-real-ip",
+}
+
+
+@router.post("", response_model=BatchResponse)
+async def batch(batch_request: BatchRequest, request: Request):
+    """
+    Ejecuta varias peticiones GET a la API en una sola llamada.
+
+    **La autenticación se hereda**: el header `Authorization` del batch se
+    reenvía a cada sub-request, que aplica sus propias reglas de acceso.
+
+    Cada sub-request se ejecuta en paralelo dentro del proceso y su
+    resultado incluye su propio `status` (200, 401, 404, ...).
+
+    Body:
+    ```json
+    {"requests": [{"id": "me", "path": "/api/users/me"},
+                  {"id": "unread", "path": "/api/notifications/unread-count"}]}
+    ```
+    """
+    responses = await asyncio.gather(
+        *(_dispatch(request, sub) for sub in batch_request.requests)
+    )
+    return BatchResponse(responses=list(responses))
+
+
+async def _dispatch(request: Request, sub: BatchSubRequest) -> BatchSubResponse:
+    """
+    Ejecuta un sub-request GET contra la propia aplicación ASGI.
+    """
+    path, _, query = sub.path.partition("?")
+
+    if not path.startswith("/api/") or path.startswith(router.prefix):
+        return BatchSubResponse(
+            id=sub.id,
+            path=sub.path,
+            status=400,
+            body={"detail": "Solo se permiten rutas GET de /api (excepto /api/batch)"}
+        )
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": [
+            (name, value) for name, value in request.scope["headers"]
+            if name in FORWARDED_HEADERS
+        ],
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+    }
+
+    finished = asyncio.Event()
+    request_sent = False
+    status = 500
+    content_type = ""
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # El cliente "sigue conectado" hasta que el sub-request termina
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", []):
+                if name.lower() == b"content-type":
+                    content_type = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware ya envió el 500; solo se evita propagar el error
+        status = 500
+    finally:
+        finished.set()
+
+    raw_body = b"".join(chunks)
+    body = raw_body.decode("utf-8", errors="replace") if raw_body else None
+    if raw_body and content_type.startswith("application/json"):
+        try:
+            body = json.loads(raw_body)
+        except ValueError:
+            pass
+
+    return BatchSubResponse(id=sub.id, path=sub.path, status=status, body=body)
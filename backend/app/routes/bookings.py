@@ -1,12 +1,15 @@
 """
 Rutas de API para gestión de reservas (bookings).
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request
 from typing import List
 from app.models.schemas import BookingCreate, BookingResponse, TokenPayload
 from app.middleware.auth import get_current_user
-from app.utils.database import get_db
+from app.utils.database import Client, get_db, run_query
+from app.utils.cache import entity_cache, ride_tag
+from app.utils.cancellation import run_until_disconnect, serialize_rows
+from app.utils.streaming import stream_json_list
+from app.utils.loader import RequestLoaders, get_loaders
 from app.services.notifications import NotificationService
 
 router = APIRouter(prefix="/api/bookings", tags=["bookings"])
@@ -17,7 +20,8 @@ async def create_booking(
     booking: BookingCreate,
     background_tasks: BackgroundTasks,
     current_user: TokenPayload = Depends(get_current_user),
-    db: Client = Depends(get_db)
+    db: Client = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """
     Crea una nueva reserva para un viaje.
@@ -28,14 +32,12 @@ async def create_booking(
     El estado inicial de la reserva es "pending".
     """
     try:
-        # Verificar que el viaje existe
-        ride_response = db.table("Ride").select("*").eq("id", str(booking.ride_id)).execute()
+        # Verificar que el viaje existe (se carga junto con su conductor)
+        ride = await loaders.rides.load(booking.ride_id)
         
-        if not ride_response.data or len(ride_response.data) == 0:
+        if not ride:
             raise HTTPException(status_code=404, detail="Viaje no encontrado")
         
-        ride = ride_response.data[0]
-        
         # Verificar que no sea el propio conductor
         if ride["driver_id"] == current_user.sub:
             raise HTTPException(
@@ -51,9 +53,9 @@ async def create_booking(
             )
         
         # Verificar que el usuario no tenga ya una reserva para este viaje
-        existing_booking = db.table("Booking").select("*").eq(
+        existing_booking = await run_query(db.table("Booking").select("*").eq(
             "ride_id", str(booking.ride_id)
-        ).eq("rider_id", current_user.sub).execute()
+        ).eq("rider_id", current_user.sub))
         
         if existing_booking.data and len(existing_booking.data) > 0:
             raise HTTPException(
@@ -68,7 +70,7 @@ async def create_booking(
             "status": "pending"
         }
         
-        booking_response = db.table("Booking").insert(booking_data).execute()
+        booking_response = await run_query(db.table("Booking").insert(booking_data))
         
         if not booking_response.data or len(booking_response.data) == 0:
             raise HTTPException(status_code=500, detail="Error al crear reserva")
@@ -77,18 +79,16 @@ async def create_booking(
         
         # Decrementar plazas disponibles
         new_seats = ride["seats_available"] - 1
-        db.table("Ride").update({"seats_available": new_seats}).eq(
+        await run_query(db.table("Ride").update({"seats_available": new_seats}).eq(
             "id", str(booking.ride_id)
-        ).execute()
-        
-        # Obtener reserva con información del viaje y usuario
-        booking_with_details = db.table("Booking").select(
-            "*, ride:Ride(*, driver:User(*)), rider:User(*)"
-        ).eq("id", created_booking["id"]).execute()
+        ))
+        ride = {**ride, "seats_available": new_seats}
+        loaders.rides.prime(ride)
+        await entity_cache.invalidate(ride_tag(ride["id"]))
         
-        # Get rider name for notification
-        rider_response = db.table("User").select("name").eq("id", current_user.sub).execute()
-        rider_name = rider_response.data[0]["name"] if rider_response.data else "Un usuario"
+        # El viaje y su conductor ya están cargados; solo falta el pasajero
+        rider = await loaders.users.load(current_user.sub)
+        rider_name = rider["name"] if rider else "Un usuario"
         
         # Send notification to driver about new booking request
         async def send_booking_notification():
@@ -103,10 +103,7 @@ async def create_booking(
         
         background_tasks.add_task(send_booking_notification)
         
-        if booking_with_details.data and len(booking_with_details.data) > 0:
-            return BookingResponse(**booking_with_details.data[0])
-        
-        return BookingResponse(**created_booking)
+        return BookingResponse(**{**created_booking, "ride": ride, "rider": rider})
         
     except HTTPException:
         raise
@@ -116,6 +113,8 @@ async def create_booking(
 
 @router.get("", response_model=List[BookingResponse])
 async def get_my_bookings(
+    request: Request,
+    stream: bool = Query(False, description="Enviar el resultado en streaming, por páginas"),
     current_user: TokenPayload = Depends(get_current_user),
     db: Client = Depends(get_db)
 ):
@@ -123,15 +122,27 @@ async def get_my_bookings(
     Obtiene todas las reservas del usuario autenticado.
     
     **Requiere autenticación.**
+    Si el cliente se desconecta, la consulta y la conversión se cancelan.
+    Con `stream=true` el array JSON se envía por páginas.
     """
     try:
-        response = db.table("Booking").select(
-            "*, ride:Ride(*, driver:User(*)), rider:User(*)"
-        ).eq("rider_id", current_user.sub).order("created_at", desc=True).execute()
+        def build_query():
+            return db.table("Booking").select(
+                "*, ride:Ride(*, driver:User(*)), rider:User(*)"
+            ).eq("rider_id", current_user.sub).order("created_at", desc=True)
+        
+        if stream:
+            return await stream_json_list(build_query, BookingResponse, order_by="created_at", desc=True)
+        
+        async def fetch_bookings():
+            response = await run_query(build_query())
+            
+            return await serialize_rows(response.data, BookingResponse)
         
-        bookings = [BookingResponse(**booking) for booking in response.data]
-        return bookings
+        return await run_until_disconnect(request, fetch_bookings, "get_my_bookings")
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener reservas: {str(e)}")
 
@@ -149,9 +160,9 @@ async def get_booking_by_id(
     Solo el usuario que hizo la reserva o el conductor del viaje pueden verla.
     """
     try:
-        response = db.table("Booking").select(
+        response = await run_query(db.table("Booking").select(
             "*, ride:Ride(*, driver:User(*)), rider:User(*)"
-        ).eq("id", booking_id).execute()
+        ).eq("id", booking_id))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Reserva no encontrada")
@@ -181,7 +192,8 @@ async def cancel_booking(
     booking_id: str,
     background_tasks: BackgroundTasks,
     current_user: TokenPayload = Depends(get_current_user),
-    db: Client = Depends(get_db)
+    db: Client = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """
     Cancela una reserva.
@@ -192,15 +204,18 @@ async def cancel_booking(
     Al cancelar, se incrementa automáticamente `seats_available` del viaje.
     """
     try:
-        # Obtener la reserva
-        booking_response = db.table("Booking").select(
-            "*, ride:Ride(*)"
-        ).eq("id", booking_id).execute()
+        # Obtener la reserva con el viaje, el conductor y el pasajero
+        booking_response = await run_query(db.table("Booking").select(
+            "*, ride:Ride(*, driver:User(*)), rider:User(*)"
+        ).eq("id", booking_id))
         
         if not booking_response.data or len(booking_response.data) == 0:
             raise HTTPException(status_code=404, detail="Reserva no encontrada")
         
         booking = booking_response.data[0]
+        loaders.rides.prime(booking["ride"])
+        if booking.get("rider"):
+            loaders.users.prime(booking["rider"])
         
         # Verificar permisos
         is_rider = booking["rider_id"] == current_user.sub
@@ -220,7 +235,7 @@ async def cancel_booking(
             )
         
         # Marcar como cancelada (no eliminar para mantener historial)
-        db.table("Booking").update({"status": "cancelled"}).eq("id", booking_id).execute()
+        await run_query(db.table("Booking").update({"status": "cancelled"}).eq("id", booking_id))
         
         # Incrementar plazas disponibles
         ride = booking["ride"]
@@ -230,14 +245,15 @@ async def cancel_booking(
         if new_seats > ride["seats_total"]:
             new_seats = ride["seats_total"]
         
-        db.table("Ride").update({"seats_available": new_seats}).eq(
+        await run_query(db.table("Ride").update({"seats_available": new_seats}).eq(
             "id", ride["id"]
-        ).execute()
+        ))
+        await entity_cache.invalidate(ride_tag(ride["id"]))
         
         # Send notification to the counterparty about cancellation
-        # Get current user's name for notification
-        canceller_response = db.table("User").select("name").eq("id", current_user.sub).execute()
-        canceller_name = canceller_response.data[0]["name"] if canceller_response.data else "Un usuario"
+        # The canceller is either the rider or the driver, both already loaded
+        canceller = await loaders.users.load(current_user.sub)
+        canceller_name = canceller["name"] if canceller else "Un usuario"
         
         # Notify the other party (if rider cancelled, notify driver; if driver cancelled, notify rider)
         notify_user_id = ride["driver_id"] if is_rider else booking["rider_id"]
@@ -275,10 +291,10 @@ async def confirm_booking(
     **Requiere autenticación y ser el conductor del viaje.**
     """
     try:
-        # Obtener la reserva
-        booking_response = db.table("Booking").select(
-            "*, ride:Ride(*)"
-        ).eq("id", booking_id).execute()
+        # Obtener la reserva con todos sus detalles
+        booking_response = await run_query(db.table("Booking").select(
+            "*, ride:Ride(*, driver:User(*)), rider:User(*)"
+        ).eq("id", booking_id))
         
         if not booking_response.data or len(booking_response.data) == 0:
             raise HTTPException(status_code=404, detail="Reserva no encontrada")
@@ -300,18 +316,13 @@ async def confirm_booking(
             )
         
         # Actualizar a confirmed
-        update_response = db.table("Booking").update(
+        update_response = await run_query(db.table("Booking").update(
             {"status": "confirmed"}
-        ).eq("id", booking_id).execute()
+        ).eq("id", booking_id))
         
         if not update_response.data or len(update_response.data) == 0:
             raise HTTPException(status_code=500, detail="Error al confirmar reserva")
         
-        # Obtener reserva actualizada con detalles
-        booking_with_details = db.table("Booking").select(
-            "*, ride:Ride(*, driver:User(*)), rider:User(*)"
-        ).eq("id", booking_id).execute()
-        
         # Send notification to rider about confirmation
         async def send_confirmation_notification():
             notification_service = NotificationService(db)
@@ -324,10 +335,8 @@ async def confirm_booking(
         
         background_tasks.add_task(send_confirmation_notification)
         
-        if booking_with_details.data and len(booking_with_details.data) > 0:
-            return BookingResponse(**booking_with_details.data[0])
-        
-        return BookingResponse(**update_response.data[0])
+        # La reserva ya trae viaje y usuarios embebidos; solo cambia el estado
+        return BookingResponse(**{**booking, **update_response.data[0]})
         
     except HTTPException:
         raise
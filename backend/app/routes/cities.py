@@ -0,0 +1,33 @@
+"""
+Rutas de API para ciudades (autocompletado del buscador).
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import List
+from app.models.schemas import CitySuggestion
+from app.services.cities import city_index
+
+router = APIRouter(prefix="/api/cities", tags=["cities"])
+
+
+@router.get("/suggest", response_model=List[CitySuggestion])
+async def suggest_cities(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto escrito por el usuario"),
+    limit: int = Query(8, ge=1, le=20, description="Máximo de sugerencias")
+):
+    """
+    Sugiere ciudades cuyo nombre, o alguna de sus palabras, empieza por `q`.
+    
+    **No requiere autenticación.**
+    
+    No distingue mayúsculas ni acentos ("merida" encuentra "Mérida") y
+    ordena por número de viajes recientes. Se resuelve en memoria, sin
+    consultar la base de datos.
+    """
+    try:
+        return [
+            CitySuggestion(name=city.name, state=city.state, ride_count=city.ride_count)
+            for city in city_index.suggest(q, limit)
+        ]
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al sugerir ciudades: {str(e)}")
@@ -2,7 +2,6 @@
 API routes for notifications management.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from supabase import Client
 from app.models.schemas import (
     NotificationResponse,
     PaginatedNotificationsResponse,
@@ -10,7 +9,7 @@ from app.models.schemas import (
     TokenPayload
 )
 from app.middleware.auth import get_current_user
-from app.utils.database import get_db
+from app.utils.database import Client, get_db, run_query
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
@@ -34,16 +33,16 @@ async def get_notifications(
         offset = (page - 1) * page_size
         
         # Get total count
-        count_response = db.table("notifications").select(
+        count_response = await run_query(db.table("notifications").select(
             "*", count="exact"
-        ).eq("user_id", current_user.sub).execute()
+        ).eq("user_id", current_user.sub))
         
         total = count_response.count or 0
         
         # Get paginated notifications
-        response = db.table("notifications").select("*").eq(
+        response = await run_query(db.table("notifications").select("*").eq(
             "user_id", current_user.sub
-        ).order("created_at", desc=True).range(offset, offset + page_size - 1).execute()
+        ).order("created_at", desc=True).range(offset, offset + page_size - 1))
         
         notifications = [NotificationResponse(**n) for n in response.data]
         has_more = (offset + len(notifications)) < total
@@ -56,6 +55,8 @@ async def get_notifications(
             has_more=has_more
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -74,12 +75,14 @@ async def get_unread_count(
     **Requiere autenticación.**
     """
     try:
-        response = db.table("notifications").select(
+        response = await run_query(db.table("notifications").select(
             "*", count="exact"
-        ).eq("user_id", current_user.sub).eq("is_read", False).execute()
+        ).eq("user_id", current_user.sub).eq("is_read", False))
         
         return UnreadCountResponse(count=response.count or 0)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -102,9 +105,9 @@ async def mark_notification_read(
     """
     try:
         # Verify notification exists and belongs to user
-        existing = db.table("notifications").select("*").eq(
+        existing = await run_query(db.table("notifications").select("*").eq(
             "id", notification_id
-        ).eq("user_id", current_user.sub).execute()
+        ).eq("user_id", current_user.sub))
         
         if not existing.data or len(existing.data) == 0:
             raise HTTPException(
@@ -113,9 +116,9 @@ async def mark_notification_read(
             )
         
         # Update to read
-        response = db.table("notifications").update(
+        response = await run_query(db.table("notifications").update(
             {"is_read": True}
-        ).eq("id", notification_id).execute()
+        ).eq("id", notification_id))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -148,9 +151,9 @@ async def mark_all_notifications_read(
     """
     try:
         # Get count of unread notifications first
-        count_response = db.table("notifications").select(
+        count_response = await run_query(db.table("notifications").select(
             "*", count="exact"
-        ).eq("user_id", current_user.sub).eq("is_read", False).execute()
+        ).eq("user_id", current_user.sub).eq("is_read", False))
         
         unread_count = count_response.count or 0
         
@@ -158,15 +161,17 @@ async def mark_all_notifications_read(
             return {"message": "No hay notificaciones sin leer", "updated_count": 0}
         
         # Update all unread notifications
-        db.table("notifications").update(
+        await run_query(db.table("notifications").update(
             {"is_read": True}
-        ).eq("user_id", current_user.sub).eq("is_read", False).execute()
+        ).eq("user_id", current_user.sub).eq("is_read", False))
         
         return {
             "message": f"{unread_count} notificaciones marcadas como leídas",
             "updated_count": unread_count
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
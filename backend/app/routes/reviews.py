@@ -2,12 +2,12 @@
 Rutas de API para gestión de reseñas (reviews/ratings).
 """
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.models.schemas import ReviewCreate, ReviewResponse, TokenPayload
 from app.middleware.auth import get_current_user
-from app.utils.database import get_db
+from app.utils.database import Client, get_db, run_query
+from app.utils.cache import entity_cache, user_tag
 
 router = APIRouter(prefix="/api/reviews", tags=["reviews"])
 
@@ -32,9 +32,9 @@ async def create_review(
     """
     try:
         # Obtener la reserva con información del viaje
-        booking_response = db.table("Booking").select(
+        booking_response = await run_query(db.table("Booking").select(
             "*, ride:Ride(*)"
-        ).eq("id", str(review.booking_id)).execute()
+        ).eq("id", str(review.booking_id)))
         
         if not booking_response.data or len(booking_response.data) == 0:
             raise HTTPException(status_code=404, detail="Reserva no encontrada")
@@ -94,9 +94,9 @@ async def create_review(
             )
         
         # Verificar que no exista ya una reseña del mismo autor para esta reserva
-        existing_review = db.table("ratings").select("*").eq(
+        existing_review = await run_query(db.table("ratings").select("*").eq(
             "booking_id", str(review.booking_id)
-        ).eq("author_id", current_user.sub).execute()
+        ).eq("author_id", current_user.sub))
         
         if existing_review.data and len(existing_review.data) > 0:
             raise HTTPException(
@@ -114,7 +114,7 @@ async def create_review(
             "role": review.role
         }
         
-        review_response = db.table("ratings").insert(review_data).execute()
+        review_response = await run_query(db.table("ratings").insert(review_data))
         
         if not review_response.data or len(review_response.data) == 0:
             raise HTTPException(status_code=500, detail="Error al crear reseña")
@@ -125,9 +125,9 @@ async def create_review(
         await _update_user_rating(db, str(review.subject_id))
         
         # Obtener reseña con información del autor
-        review_with_author = db.table("ratings").select(
+        review_with_author = await run_query(db.table("ratings").select(
             '*, author:User!ratings_author_id_fkey(*)'
-        ).eq("id", created_review["id"]).execute()
+        ).eq("id", created_review["id"]))
         
         if review_with_author.data and len(review_with_author.data) > 0:
             return ReviewResponse(**review_with_author.data[0])
@@ -156,23 +156,25 @@ async def get_user_reviews(
     """
     try:
         # Obtener reseñas con información del autor
-        response = db.table("ratings").select(
+        response = await run_query(db.table("ratings").select(
             '*, author:User!ratings_author_id_fkey(*)'
-        ).eq("subject_id", user_id).order("created_at", desc=True).execute()
+        ).eq("subject_id", user_id).order("created_at", desc=True))
         
         visible_reviews = []
         for review_data in response.data:
             # Check visibility using simplified logic
-            if _check_review_visibility_simple(db, review_data):
+            if await _check_review_visibility_simple(db, review_data):
                 visible_reviews.append(ReviewResponse(**review_data))
         
         return visible_reviews
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener reseñas: {str(e)}")
 
 
-def _check_review_visibility_simple(db: Client, review: dict) -> bool:
+async def _check_review_visibility_simple(db: Client, review: dict) -> bool:
     """
     Determina si una reseña debe ser visible según las reglas de "Mutual Blindness".
     
@@ -191,9 +193,9 @@ def _check_review_visibility_simple(db: Client, review: dict) -> bool:
     
     try:
         # Obtener el booking y su ride asociado
-        booking_response = db.table("Booking").select(
+        booking_response = await run_query(db.table("Booking").select(
             "*, ride:Ride(*)"
-        ).eq("id", booking_id).execute()
+        ).eq("id", booking_id))
         
         if not booking_response.data:
             return True  # Si no encontramos el booking, mostrar por defecto
@@ -211,9 +213,9 @@ def _check_review_visibility_simple(db: Client, review: dict) -> bool:
             return True
         
         # Verificar si existe reseña recíproca (de otro autor para el mismo booking)
-        reciprocal = db.table("ratings").select("id").eq(
+        reciprocal = await run_query(db.table("ratings").select("id").eq(
             "booking_id", booking_id
-        ).neq("author_id", author_id).execute()
+        ).neq("author_id", author_id))
         
         return bool(reciprocal.data)
         
@@ -223,7 +225,7 @@ def _check_review_visibility_simple(db: Client, review: dict) -> bool:
         return True
 
 
-def _check_review_visibility(db: Client, review: dict, ride: dict) -> bool:
+async def _check_review_visibility(db: Client, review: dict, ride: dict) -> bool:
     """
     Determina si una reseña debe ser visible según las reglas de "Mutual Blindness".
     
@@ -245,9 +247,9 @@ def _check_review_visibility(db: Client, review: dict, ride: dict) -> bool:
         return True
     
     # Verificar si existe reseña recíproca (de otro autor para el mismo booking)
-    reciprocal = db.table("ratings").select("id").eq(
+    reciprocal = await run_query(db.table("ratings").select("id").eq(
         "booking_id", booking_id
-    ).neq("author_id", author_id).execute()
+    ).neq("author_id", author_id))
     
     return bool(reciprocal.data)
 
@@ -258,9 +260,9 @@ async def _update_user_rating(db: Client, user_id: str):
     """
     try:
         # Obtener todas las reseñas del usuario
-        reviews_response = db.table("ratings").select("score").eq(
+        reviews_response = await run_query(db.table("ratings").select("score").eq(
             "subject_id", user_id
-        ).execute()
+        ))
         
         if reviews_response.data:
             scores = [r["score"] for r in reviews_response.data]
@@ -268,10 +270,11 @@ async def _update_user_rating(db: Client, user_id: str):
             rating_count = len(scores)
             
             # Actualizar usuario
-            db.table("User").update({
+            await run_query(db.table("User").update({
                 "average_rating": round(avg_rating, 2),
                 "rating_count": rating_count
-            }).eq("id", user_id).execute()
+            }).eq("id", user_id))
+            await entity_cache.invalidate(user_tag(user_id))
             
     except Exception as e:
         # Log pero no fallar
@@ -1,18 +1,116 @@
 """
 Rutas de API para gestión de viajes (rides).
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from supabase import Client
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request, Response
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-from app.models.schemas import RideCreate, RideResponse, TokenPayload
+import time
+from app.models.schemas import (
+    PriceSuggestion, RideCreate, RideDaySearch, RideRecommendation, RideResponse, RideSearchPage, TokenPayload
+)
 from app.middleware.auth import get_current_user
-from app.utils.database import get_db
+from app.utils.database import Client, get_db, run_query
+from app.utils.cache import entity_cache, ride_tag, user_tag
+from app.utils.singleflight import flight_key, flights
+from app.utils.resilience import with_stale_fallback
+from app.utils.cancellation import run_until_disconnect, serialize_rows
+from app.utils.streaming import stream_json_list
+from app.utils.loader import MAX_BATCH_IDS, RequestLoaders, get_loaders, parse_ids
 from app.services.notifications import NotificationService
+from app.services.cities import city_index
+from app.services.ride_index import columns_from_rows, encode_json_array, ride_index
+from app.services.corridors import heads_forward, point_cell, route_cells
+from app.services.pricing import price_model
+from app.services.geo import bounding_box
+from app.services.ride_search import (
+    MAX_FLEX_DAYS, SEARCH_DEFAULT_DAYS, SEARCH_FACET_MAX_ROWS, SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE,
+    date_window, encode_page, group_by_day
+)
+from app.services.recommendations import RECOMMEND_MAX_CANDIDATES, recommend
 
 router = APIRouter(prefix="/api/rides", tags=["rides"])
 
 
+def _city_filter(query, column: str, city: str):
+    """
+    Filtra por ciudad: igualdad sobre la clave normalizada (`<column>_key`,
+    indexada) si `city` es una ciudad conocida, o `ilike` como respaldo
+    para textos parciales o desconocidos.
+    """
+    key = city_index.match_key(city)
+    if key is not None:
+        return query.eq(f"{column}_key", key)
+    return query.ilike(column, f"%{city}%")
+
+
+def _search_query(
+    db: Client,
+    from_city: Optional[str],
+    to_city: Optional[str],
+    window: Optional[tuple],
+    min_seats: Optional[int],
+    max_price: Optional[float],
+    now: str
+):
+    """
+    Consulta de búsqueda: viajes futuros con plazas, filtrados y ordenados
+    por fecha. Se crea una por uso (los builders acumulan parámetros).
+    """
+    # Iniciar query
+    query = db.table("Ride").select("*, driver:User(*)")
+    
+    # Filtrar solo viajes futuros
+    query = query.gte("date_time", now)
+    
+    # Filtrar solo viajes con plazas disponibles
+    query = query.gt("seats_available", 0)
+    
+    # Aplicar filtros opcionales
+    if from_city:
+        query = _city_filter(query, "from_city", from_city)
+    
+    if to_city:
+        query = _city_filter(query, "to_city", to_city)
+    
+    if window:
+        query = query.gte("date_time", window[0].isoformat())
+        query = query.lt("date_time", window[1].isoformat())
+    
+    if min_seats is not None:
+        query = query.gte("seats_available", min_seats)
+    
+    if max_price is not None:
+        query = query.lte("price", max_price)
+    
+    # Ordenar por fecha
+    return query.order("date_time", desc=False)
+
+
+def _index_select(
+    from_city: Optional[str],
+    to_city: Optional[str],
+    window: Optional[tuple],
+    min_seats: Optional[int],
+    max_price: Optional[float]
+) -> Optional[dict]:
+    """
+    La misma búsqueda en el índice en memoria (si está activo y cargado).
+    Solo con ciudades conocidas: los textos parciales van a la base de datos.
+    """
+    from_key = city_index.match_key(from_city) if from_city else None
+    to_key = city_index.match_key(to_city) if to_city else None
+    if (from_city and not from_key) or (to_city and not to_key):
+        return None
+    return ride_index.select(
+        from_key=from_key,
+        to_key=to_key,
+        since=max(time.time(), window[0].timestamp()) if window else None,
+        until=window[1].timestamp() if window else None,
+        min_seats=min_seats or 1,
+        max_price=max_price
+    )
+
+
 @router.post("", response_model=RideResponse, status_code=201)
 async def create_ride(
     ride: RideCreate,
@@ -36,23 +134,32 @@ async def create_ride(
         
         # Preparar datos del viaje
         ride_data = ride.model_dump()
+        route = ride_data.pop("route", None)
         ride_data["driver_id"] = current_user.sub
         ride_data["seats_available"] = ride.seats_total
+        # Claves de ciudad (del nombre y las coordenadas, contra el
+        # nomenclátor): la búsqueda filtra por igualdad sobre ellas
+        ride_data["from_city_key"], ride_data["to_city_key"] = city_index.ride_keys([ride_data])[0]
+        # Celdas del corredor de la ruta, para la búsqueda por corredor
+        ride_data["route_cells"] = route_cells(ride_data, route)
         # Convert datetime to ISO string for Supabase
         ride_data["date_time"] = ride.date_time.isoformat()
         
         # Insertar viaje
-        response = db.table("Ride").insert(ride_data).execute()
+        response = await run_query(db.table("Ride").insert(ride_data))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=500, detail="Error al crear viaje")
         
         created_ride = response.data[0]
+        city_index.record_ride(created_ride)
+        # Avisa a los índices en memoria de todos los workers
+        await entity_cache.invalidate(ride_tag(created_ride["id"]))
         
         # Obtener viaje con información del conductor
-        ride_with_driver = db.table("Ride").select(
+        ride_with_driver = await run_query(db.table("Ride").select(
             "*, driver:User(*)"
-        ).eq("id", created_ride["id"]).execute()
+        ).eq("id", created_ride["id"]))
         
         if ride_with_driver.data and len(ride_with_driver.data) > 0:
             return RideResponse(**ride_with_driver.data[0])
@@ -70,8 +177,16 @@ async def search_rides(
     from_city: Optional[str] = Query(None, description="Ciudad de origen"),
     to_city: Optional[str] = Query(None, description="Ciudad de destino"),
     date: Optional[str] = Query(None, description="Fecha del viaje (YYYY-MM-DD)"),
+    flex_days: int = Query(0, ge=0, le=MAX_FLEX_DAYS, description="Días de margen antes y después de `date`"),
+    date_from: Optional[str] = Query(None, description="Primer día (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Último día, incluido (YYYY-MM-DD)"),
     min_seats: Optional[int] = Query(None, ge=1, description="Mínimo de plazas disponibles"),
     max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    limit: Optional[int] = Query(None, ge=1, le=SEARCH_MAX_PAGE_SIZE, description="Resultados por página"),
+    offset: int = Query(0, ge=0, description="Resultados a saltar"),
+    stream: bool = Query(False, description="Enviar el resultado en streaming, por páginas"),
+    request: Request = None,
+    response: Response = None,
     db: Client = Depends(get_db)
 ):
     """
@@ -80,66 +195,348 @@ async def search_rides(
     **No requiere autenticación.**
     
     Parámetros de búsqueda:
-    - `from_city`: Filtra por ciudad de origen (case-insensitive)
-    - `to_city`: Filtra por ciudad de destino (case-insensitive)
+    - `from_city`: Filtra por ciudad de origen (sin distinguir mayúsculas ni
+      acentos; coincidencia parcial si no es una ciudad conocida)
+    - `to_city`: Filtra por ciudad de destino (ídem)
     - `date`: Filtra por fecha (YYYY-MM-DD, busca viajes ese día)
+    - `flex_days`: Amplía `date` a ± N días
+    - `date_from` / `date_to`: Filtra por un rango de días (incluidos)
     - `min_seats`: Filtra por mínimo de plazas disponibles
     - `max_price`: Filtra por precio máximo
+    - `limit` / `offset`: Paginación (total y facetas en `GET /api/rides/page`)
+    - `stream`: Envía el array JSON por páginas, con memoria constante (sin
+      caché, ETag ni respuesta obsoleta de respaldo)
     
     Por defecto, solo muestra viajes futuros con plazas disponibles.
+    
+    Si la base de datos no está disponible se sirve el último resultado
+    conocido para la misma búsqueda, marcado con `Warning: 110`. Si el
+    cliente se desconecta, la consulta y la conversión se cancelan.
     """
     try:
-        # Iniciar query
-        query = db.table("Ride").select("*, driver:User(*)")
+        try:
+            window = date_window(date, flex_days, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        now = datetime.now().isoformat()
+        
+        def build_query():
+            return _search_query(db, from_city, to_city, window, min_seats, max_price, now)
+        
+        if stream:
+            if limit is not None or offset:
+                raise HTTPException(status_code=400, detail="`stream` no admite `limit` ni `offset`")
+            return await stream_json_list(build_query, RideResponse, order_by="date_time")
+        
+        columns = _index_select(from_city, to_city, window, min_seats, max_price)
+        if columns is not None:
+            payloads = columns["payloads"]
+            rows = columns["rows"][offset:offset + limit if limit is not None else None]
+            body = encode_json_array(payloads[row] for row in rows.tolist())
+            return Response(content=body, media_type="application/json")
+        
+        query = build_query()
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        
+        async def fetch_rides():
+            result = await run_query(query)
+            # Convertir a modelos Pydantic (una sola vez para todos los que esperan)
+            return await serialize_rows(result.data, RideResponse)
+        
+        # Búsquedas idénticas concurrentes comparten una sola consulta
+        # ("Mérida" y "merida" son la misma búsqueda)
+        key = flight_key("search_rides", {
+            "from_city": city_index.match_key(from_city) or from_city,
+            "to_city": city_index.match_key(to_city) or to_city,
+            "window": [d.isoformat() for d in window] if window else None,
+            "min_seats": min_seats,
+            "max_price": max_price,
+            "limit": limit,
+            "offset": offset,
+        })
+        return await run_until_disconnect(
+            request,
+            lambda: with_stale_fallback(
+                str(key),
+                lambda: flights.do(key, fetch_rides),
+                response,
+                tags=lambda rides: [ride_tag(ride.id) for ride in rides]
+            ),
+            "search_rides"
+        )
         
-        # Filtrar solo viajes futuros
-        query = query.gte("date_time", datetime.now().isoformat())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar viajes: {str(e)}")
+
+
+@router.get("/page", response_model=RideSearchPage)
+async def search_rides_page(
+    from_city: Optional[str] = Query(None, description="Ciudad de origen"),
+    to_city: Optional[str] = Query(None, description="Ciudad de destino"),
+    date: Optional[str] = Query(None, description="Fecha del viaje (YYYY-MM-DD)"),
+    flex_days: int = Query(0, ge=0, le=MAX_FLEX_DAYS, description="Días de margen antes y después de `date`"),
+    date_from: Optional[str] = Query(None, description="Primer día (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Último día, incluido (YYYY-MM-DD)"),
+    min_seats: Optional[int] = Query(None, ge=1, description="Mínimo de plazas disponibles"),
+    max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE, description="Resultados por página"),
+    offset: int = Query(0, ge=0, description="Resultados a saltar"),
+    db: Client = Depends(get_db)
+):
+    """
+    Busca viajes y responde una página con el total y las facetas (bandas
+    de precio, franja horaria y plazas) del conjunto filtrado completo.
+    
+    **No requiere autenticación.**
+    
+    Mismos filtros que `GET /api/rides`. Facetas y página salen del mismo
+    conjunto: el índice en memoria o una sola consulta, limitada a
+    `SEARCH_FACET_MAX_ROWS` viajes (`truncated: true` si se alcanza).
+    """
+    try:
+        try:
+            window = date_window(date, flex_days, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        truncated = False
+        columns = _index_select(from_city, to_city, window, min_seats, max_price)
+        if columns is None:
+            now = datetime.now().isoformat()
+            query = _search_query(db, from_city, to_city, window, min_seats, max_price, now)
+            result = await run_query(query.limit(SEARCH_FACET_MAX_ROWS))
+            rows = result.data or []
+            truncated = len(rows) >= SEARCH_FACET_MAX_ROWS
+            columns = columns_from_rows(rows)
+        
+        body = encode_page(columns, offset, limit, truncated)
+        return Response(content=body, media_type="application/json")
         
-        # Filtrar solo viajes con plazas disponibles
-        query = query.gt("seats_available", 0)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar viajes: {str(e)}")
+
+
+@router.get("/search", response_model=RideDaySearch)
+async def search_rides_by_day(
+    from_city: Optional[str] = Query(None, description="Ciudad de origen"),
+    to_city: Optional[str] = Query(None, description="Ciudad de destino"),
+    date: Optional[str] = Query(None, description="Fecha del viaje (YYYY-MM-DD)"),
+    flex_days: int = Query(0, ge=0, le=MAX_FLEX_DAYS, description="Días de margen antes y después de `date`"),
+    date_from: Optional[str] = Query(None, description="Primer día (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Último día, incluido (YYYY-MM-DD)"),
+    min_seats: Optional[int] = Query(None, ge=1, description="Mínimo de plazas disponibles"),
+    max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    db: Client = Depends(get_db)
+):
+    """
+    Busca viajes en una ventana de fechas y los agrupa por día.
+    
+    **No requiere autenticación.**
+    
+    Mismos filtros que `GET /api/rides`. La ventana es `date` ± `flex_days`
+    o `date_from`..`date_to` (máximo 14 días); sin fecha, los próximos 7
+    días. Cada día de la ventana aparece con su número de viajes, aunque
+    sea cero.
+    """
+    try:
+        try:
+            window = date_window(date, flex_days, date_from, date_to, default_days=SEARCH_DEFAULT_DAYS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Aplicar filtros opcionales
-        if from_city:
-            query = query.ilike("from_city", f"%{from_city}%")
+        columns = _index_select(from_city, to_city, window, min_seats, max_price)
+        if columns is None:
+            now = datetime.now().isoformat()
+            result = await run_query(_search_query(db, from_city, to_city, window, min_seats, max_price, now))
+            columns = columns_from_rows(result.data or [])
         
-        if to_city:
-            query = query.ilike("to_city", f"%{to_city}%")
+        return Response(content=group_by_day(columns, *window), media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar viajes: {str(e)}")
+
+
+@router.get("/corridor", response_model=List[RideResponse])
+async def search_rides_by_corridor(
+    from_lat: float = Query(..., ge=-90, le=90, description="Latitud de recogida"),
+    from_lon: float = Query(..., ge=-180, le=180, description="Longitud de recogida"),
+    to_lat: float = Query(..., ge=-90, le=90, description="Latitud de destino"),
+    to_lon: float = Query(..., ge=-180, le=180, description="Longitud de destino"),
+    date: Optional[str] = Query(None, description="Fecha del viaje (YYYY-MM-DD)"),
+    min_seats: Optional[int] = Query(None, ge=1, description="Mínimo de plazas disponibles"),
+    db: Client = Depends(get_db)
+):
+    """
+    Busca viajes cuya ruta pasa cerca de la recogida y del destino.
+    
+    **No requiere autenticación.**
+    
+    Incluye viajes que empiezan antes o terminan después (Caracas →
+    Barquisimeto para ir de Valencia a Barquisimeto), siempre que vayan en
+    el mismo sentido. Solo viajes futuros con plazas disponibles, ordenados
+    por fecha.
+    """
+    try:
+        query = db.table("Ride").select("*, driver:User(*)")
+        query = query.gte("date_time", datetime.now().isoformat()).gt("seats_available", 0)
+        
+        # Intersección de celdas: ambas deben estar en el corredor del viaje
+        cells = sorted({point_cell(from_lat, from_lon), point_cell(to_lat, to_lon)})
+        query = query.contains("route_cells", cells)
         
         if date:
-            # Buscar viajes en ese día específico
             try:
                 target_date = datetime.fromisoformat(date)
-                next_day = target_date + timedelta(days=1)
-                query = query.gte("date_time", target_date.isoformat())
-                query = query.lt("date_time", next_day.isoformat())
             except ValueError:
                 raise HTTPException(status_code=400, detail="Formato de fecha inválido. Use YYYY-MM-DD")
+            query = query.gte("date_time", target_date.isoformat())
+            query = query.lt("date_time", (target_date + timedelta(days=1)).isoformat())
         
         if min_seats is not None:
             query = query.gte("seats_available", min_seats)
         
-        if max_price is not None:
-            query = query.lte("price", max_price)
+        result = await run_query(query.order("date_time", desc=False))
+        rows = [
+            row for row in result.data
+            if heads_forward(row, (from_lat, from_lon), (to_lat, to_lon))
+        ]
+        return await serialize_rows(rows, RideResponse)
         
-        # Ordenar por fecha
-        query = query.order("date_time", desc=False)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar viajes: {str(e)}")
+
+
+@router.get("/price-suggestion", response_model=PriceSuggestion)
+async def suggest_price(
+    from_lat: float = Query(..., ge=-90, le=90, description="Latitud de origen"),
+    from_lon: float = Query(..., ge=-180, le=180, description="Longitud de origen"),
+    to_lat: float = Query(..., ge=-90, le=90, description="Latitud de destino"),
+    to_lon: float = Query(..., ge=-180, le=180, description="Longitud de destino"),
+    from_city: Optional[str] = Query(None, description="Ciudad de origen"),
+    to_city: Optional[str] = Query(None, description="Ciudad de destino")
+):
+    """
+    Sugiere un precio para un viaje a partir de viajes anteriores.
+    
+    **No requiere autenticación.**
+    
+    Usa el precio habitual del par de ciudades si hay suficientes viajes, si
+    no el precio por km de viajes de distancia parecida. No consulta la base
+    de datos: el historial se agrega periódicamente en memoria.
+    """
+    try:
+        return PriceSuggestion(**price_model.suggest(from_lat, from_lon, to_lat, to_lon, from_city, to_city))
         
-        # Ejecutar query
-        response = query.execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al sugerir precio: {str(e)}")
+
+
+@router.get("/recommended", response_model=List[RideRecommendation])
+async def get_recommended_rides(
+    from_lat: float = Query(..., ge=-90, le=90, description="Latitud de origen"),
+    from_lon: float = Query(..., ge=-180, le=180, description="Longitud de origen"),
+    to_lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud de destino"),
+    to_lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud de destino"),
+    date_time: Optional[datetime] = Query(None, description="Hora de salida deseada (por defecto, ahora)"),
+    radius_km: float = Query(30, gt=0, le=200, description="Distancia máxima al origen (km)"),
+    min_seats: int = Query(1, ge=1, description="Mínimo de plazas disponibles"),
+    limit: int = Query(10, ge=1, le=50, description="Número de recomendaciones"),
+    current_user: TokenPayload = Depends(get_current_user),
+    db: Client = Depends(get_db)
+):
+    """
+    Recomienda viajes próximos para el pasajero autenticado.
+    
+    **Requiere autenticación.**
+    
+    Puntúa los viajes que salen a menos de `radius_km` del origen según
+    cercanía de origen y destino, hora de salida, precio y valoración del
+    conductor. No incluye los viajes propios.
+    """
+    try:
+        target_time = (date_time or datetime.now()).timestamp()
+        
+        # Candidatos: índice en memoria o, si no está activo, rectángulo
+        # alrededor del origen en la base de datos
+        candidates = ride_index.nearby(
+            from_lat, from_lon, radius_km, min_seats=min_seats, exclude_driver_id=current_user.sub
+        )
+        if candidates is None:
+            d_lat, d_lon = bounding_box(from_lat, radius_km)
+            result = await run_query(
+                db.table("Ride").select("*, driver:User(*)")
+                .gte("date_time", datetime.now().isoformat())
+                .gte("seats_available", min_seats)
+                .neq("driver_id", current_user.sub)
+                .gte("from_lat", from_lat - d_lat).lte("from_lat", from_lat + d_lat)
+                .gte("from_lon", from_lon - d_lon).lte("from_lon", from_lon + d_lon)
+                .order("date_time", desc=False)
+                .limit(RECOMMEND_MAX_CANDIDATES)
+            )
+            candidates = columns_from_rows(result.data or [])
+        
+        body = recommend(
+            candidates,
+            limit,
+            from_lat=from_lat,
+            from_lon=from_lon,
+            radius_km=radius_km,
+            target_time=target_time,
+            to_lat=to_lat,
+            to_lon=to_lon
+        )
+        return Response(content=body, media_type="application/json")
         
-        # Convertir a modelos Pydantic
-        rides = [RideResponse(**ride) for ride in response.data]
-        return rides
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recomendar viajes: {str(e)}")
+
+
+@router.get("/batch", response_model=Dict[str, RideResponse])
+async def get_rides_by_ids(
+    ids: str = Query(..., description=f"IDs separados por coma (máximo {MAX_BATCH_IDS})"),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    """
+    Obtiene varios viajes (con su conductor) en una sola consulta.
+    
+    **No requiere autenticación.**
+    
+    Retorna un objeto indexado por ID; los IDs inexistentes se omiten.
+    """
+    ride_ids = parse_ids(ids)
+    
+    try:
+        rides = await loaders.rides.load_many(ride_ids)
+        return {
+            ride_id: RideResponse(**ride)
+            for ride_id, ride in rides.items()
+            if ride is not None
+        }
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al buscar viajes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al obtener viajes: {str(e)}")
 
 
 @router.get("/{ride_id}", response_model=RideResponse)
 async def get_ride_by_id(
     ride_id: str,
+    response: Response,
     db: Client = Depends(get_db)
 ):
     """
@@ -148,14 +545,33 @@ async def get_ride_by_id(
     **No requiere autenticación.**
     """
     try:
-        response = db.table("Ride").select(
-            "*, driver:User(*)"
-        ).eq("id", ride_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Viaje no encontrado")
+        cache_key = ride_tag(ride_id)
+        ride = await entity_cache.get(cache_key)
+        
+        if ride is None:
+            async def fetch_ride():
+                result = await flights.do(
+                    flight_key("get_ride_by_id", {"ride_id": ride_id}),
+                    lambda: run_query(
+                        db.table("Ride").select("*, driver:User(*)").eq("id", ride_id)
+                    )
+                )
+                
+                if not result.data or len(result.data) == 0:
+                    raise HTTPException(status_code=404, detail="Viaje no encontrado")
+                
+                row = result.data[0]
+                # El detalle incluye al conductor: también depende de su perfil
+                await entity_cache.set(cache_key, row, [cache_key, user_tag(row["driver_id"])])
+                return row
+            
+            ride = await with_stale_fallback(
+                cache_key,
+                fetch_ride,
+                response,
+                tags=lambda row: [cache_key, user_tag(row["driver_id"])]
+            )
         
-        ride = response.data[0]
         return RideResponse(**ride)
         
     except HTTPException:
@@ -166,6 +582,7 @@ async def get_ride_by_id(
 
 @router.get("/my/rides", response_model=List[RideResponse])
 async def get_my_rides(
+    stream: bool = Query(False, description="Enviar el resultado en streaming, por páginas"),
     current_user: TokenPayload = Depends(get_current_user),
     db: Client = Depends(get_db)
 ):
@@ -173,15 +590,24 @@ async def get_my_rides(
     Obtiene todos los viajes creados por el usuario autenticado.
     
     **Requiere autenticación.**
+    Con `stream=true` el array JSON se envía por páginas.
     """
     try:
-        response = db.table("Ride").select(
-            "*, driver:User(*)"
-        ).eq("driver_id", current_user.sub).order("date_time", desc=False).execute()
+        def build_query():
+            return db.table("Ride").select(
+                "*, driver:User(*)"
+            ).eq("driver_id", current_user.sub).order("date_time", desc=False)
+        
+        if stream:
+            return await stream_json_list(build_query, RideResponse, order_by="date_time")
+        
+        response = await run_query(build_query())
         
         rides = [RideResponse(**ride) for ride in response.data]
         return rides
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener viajes: {str(e)}")
 
@@ -201,7 +627,7 @@ async def delete_ride(
     """
     try:
         # Verificar que el viaje existe y pertenece al usuario
-        ride_response = db.table("Ride").select("*").eq("id", ride_id).execute()
+        ride_response = await run_query(db.table("Ride").select("*").eq("id", ride_id))
         
         if not ride_response.data or len(ride_response.data) == 0:
             raise HTTPException(status_code=404, detail="Viaje no encontrado")
@@ -215,15 +641,17 @@ async def delete_ride(
             )
         
         # Get all passengers with active bookings for this ride to notify them
-        bookings_response = db.table("Booking").select("rider_id").eq(
+        bookings_response = await run_query(db.table("Booking").select("rider_id").eq(
             "ride_id", ride_id
-        ).neq("status", "cancelled").execute()
+        ).neq("status", "cancelled"))
         
         passenger_ids = [b["rider_id"] for b in bookings_response.data] if bookings_response.data else []
         destination_city = ride["to_city"]
         
         # Eliminar viaje (las reservas se eliminarán en cascada)
-        db.table("Ride").delete().eq("id", ride_id).execute()
+        await run_query(db.table("Ride").delete().eq("id", ride_id))
+        await entity_cache.invalidate(ride_tag(ride_id))
+        city_index.record_ride(ride, delta=-1)
         
         # Notify all passengers about ride cancellation
         if passenger_ids:
@@ -1,17 +1,21 @@
 """
 Rutas de API para gestión de usuarios y perfiles.
 """
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Dict, Optional
 from app.models.schemas import UserResponse, UserUpdate, TokenPayload
 from app.middleware.auth import get_current_user
-from app.utils.database import get_db
+from app.utils.database import Client, get_db, run_query
+from app.utils.cache import entity_cache, user_tag
+from app.utils.resilience import with_stale_fallback
+from app.utils.loader import MAX_BATCH_IDS, RequestLoaders, get_loaders, parse_ids
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_my_profile(
+    response: Response,
     current_user: TokenPayload = Depends(get_current_user),
     db: Client = Depends(get_db)
 ):
@@ -21,13 +25,7 @@ async def get_my_profile(
     **Requiere autenticación.**
     """
     try:
-        # Buscar usuario por ID
-        response = db.table("User").select("*").eq("id", current_user.sub).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        user = response.data[0]
+        user = await _get_user_row(db, current_user.sub, response)
         return UserResponse(**user)
         
     except HTTPException:
@@ -60,12 +58,13 @@ async def update_my_profile(
             raise HTTPException(status_code=400, detail="No hay campos para actualizar")
         
         # Actualizar usuario
-        response = db.table("User").update(update_data).eq("id", current_user.sub).execute()
+        response = await run_query(db.table("User").update(update_data).eq("id", current_user.sub))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
         updated_user = response.data[0]
+        await entity_cache.invalidate(user_tag(current_user.sub))
         return UserResponse(**updated_user)
         
     except HTTPException:
@@ -74,9 +73,38 @@ async def update_my_profile(
         raise HTTPException(status_code=500, detail=f"Error al actualizar perfil: {str(e)}")
 
 
+@router.get("", response_model=Dict[str, UserResponse])
+async def get_users_by_ids(
+    ids: str = Query(..., description=f"IDs separados por coma (máximo {MAX_BATCH_IDS})"),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    """
+    Obtiene varios perfiles públicos en una sola consulta.
+    
+    **No requiere autenticación.**
+    
+    Retorna un objeto indexado por ID; los IDs inexistentes se omiten.
+    """
+    user_ids = parse_ids(ids)
+    
+    try:
+        users = await loaders.users.load_many(user_ids)
+        return {
+            user_id: UserResponse(**user)
+            for user_id, user in users.items()
+            if user is not None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
     user_id: str,
+    response: Response,
     db: Client = Depends(get_db)
 ):
     """
@@ -85,15 +113,39 @@ async def get_user_by_id(
     **No requiere autenticación.**
     """
     try:
-        response = db.table("User").select("*").eq("id", user_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        user = response.data[0]
+        user = await _get_user_row(db, user_id, response)
         return UserResponse(**user)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener usuario: {str(e)}")
+
+
+async def _get_user_row(db: Client, user_id: str, response: Optional[Response] = None) -> dict:
+    """
+    Obtiene la fila de un usuario, usando la caché de entidades.
+    
+    Si la base de datos no está disponible, sirve la última copia conocida
+    marcada como obsoleta en `response`.
+    
+    Raises:
+        HTTPException: 404 si el usuario no existe
+    """
+    cache_key = user_tag(user_id)
+    user = await entity_cache.get(cache_key)
+    
+    if user is None:
+        async def fetch_user():
+            result = await run_query(db.table("User").select("*").eq("id", user_id))
+            
+            if not result.data or len(result.data) == 0:
+                raise HTTPException(status_code=404, detail="Usuario no encontrado")
+            
+            row = result.data[0]
+            await entity_cache.set(cache_key, row, [cache_key])
+            return row
+        
+        user = await with_stale_fallback(cache_key, fetch_user, response)
+    
+    return user
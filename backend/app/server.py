@@ -0,0 +1,155 @@
+"""
+Servidor de producción de Dale API.
+
+Uso:
+    python -m app.server
+
+Lee la configuración del entorno (`WORKERS`, `PORT`, ...) y arranca:
+
+- Gunicorn con workers de uvicorn y `preload_app`, si gunicorn está
+  instalado (Linux / Docker). La app se importa una sola vez en el proceso
+  maestro y los workers comparten ese código por copy-on-write; gunicorn
+  además reinicia los workers que se caen o se bloquean.
+- uvicorn con `workers=N` en caso contrario (p. ej. Windows).
+
+En ambos casos usa uvloop y httptools si están disponibles, y al recibir
+SIGTERM deja de aceptar conexiones y espera hasta `GRACEFUL_TIMEOUT_SECONDS`
+a que terminen los requests en curso y sus background tasks (notificaciones).
+
+Para desarrollo sigue usándose `python -m app.main` (con recarga automática).
+"""
+import importlib.util
+import logging
+import os
+import sys
+import warnings
+
+logger = logging.getLogger(__name__)
+
+
+def _default_workers() -> int:
+    # CPUs disponibles para el proceso (respeta cgroups/affinity en contenedores)
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+# Configuración
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS") or _default_workers())
+# Mayor que el idle timeout típico de los balanceadores (60 s) para que sea
+# el proxy, y no el servidor, quien cierre las conexiones keep-alive
+KEEPALIVE_SECONDS = int(os.getenv("KEEPALIVE_SECONDS", "65"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+WORKER_TIMEOUT_SECONDS = int(os.getenv("WORKER_TIMEOUT_SECONDS", "60"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+APP = "app.main:app"
+EVENT_LOOP = "uvloop" if sys.platform != "win32" and _available("uvloop") else "asyncio"
+HTTP_PARSER = "httptools" if _available("httptools") else "h11"
+
+
+def uvicorn_options() -> dict:
+    """
+    Opciones comunes de uvicorn (servidor directo o workers de gunicorn).
+    """
+    return {
+        "loop": EVENT_LOOP,
+        "http": HTTP_PARSER,
+        "lifespan": "on",
+        "timeout_graceful_shutdown": GRACEFUL_TIMEOUT_SECONDS,
+    }
+
+
+if _available("gunicorn"):
+    from gunicorn.app.base import BaseApplication
+
+    with warnings.catch_warnings():
+        # uvicorn >= 0.30 marca el módulo como obsoleto en favor de `uvicorn-worker`
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from uvicorn.workers import UvicornWorker
+
+    class DaleUvicornWorker(UvicornWorker):
+        """
+        Worker de gunicorn con el loop / parser elegidos y drenado de requests.
+        """
+        CONFIG_KWARGS = uvicorn_options()
+
+    class GunicornServer(BaseApplication):
+        """
+        Gunicorn configurado desde código, sin archivo `gunicorn.conf.py`.
+        """
+
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            # Se comparte también el módulo de supabase; el cliente (y su
+            # pool HTTP) se crea después del fork, en cada worker
+            import supabase  # noqa: F401
+            return app
+else:  # pragma: no cover - depende del entorno
+    GunicornServer = None
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WORKERS,
+        "worker_class": "app.server.DaleUvicornWorker",
+        "preload_app": True,
+        "keepalive": KEEPALIVE_SECONDS,
+        "backlog": BACKLOG,
+        "timeout": WORKER_TIMEOUT_SECONDS,
+        # Margen para que uvicorn termine su propio drenado antes del SIGKILL
+        "graceful_timeout": GRACEFUL_TIMEOUT_SECONDS + 5,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "loglevel": LOG_LEVEL,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+
+def main() -> None:
+    logger.info(
+        "Dale API: %d workers en %s:%d (loop=%s, http=%s, %s)",
+        WORKERS, HOST, PORT, EVENT_LOOP, HTTP_PARSER,
+        "gunicorn" if GunicornServer else "uvicorn"
+    )
+
+    if GunicornServer is not None:
+        GunicornServer(gunicorn_options()).run()
+        return
+
+    import uvicorn
+    uvicorn.run(
+        APP,
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        log_level=LOG_LEVEL,
+        access_log=True,
+        **uvicorn_options(),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL.upper())
+    main()
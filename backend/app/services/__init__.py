@@ -2,5 +2,6 @@
 Services package for Dale API.
 """
 from .notifications import NotificationService
+from .cities import CityIndex, city_index, normalize_city
 
-__all__ = ["NotificationService"]
+__all__ = ["NotificationService", "CityIndex", "city_index", "normalize_city"]
@@ -0,0 +1,412 @@
+"""
+Índice de ciudades en memoria para el autocompletado del buscador.
+
+`search_rides` filtra con `ilike '%texto%'`, que ningún índice B-tree
+puede resolver, y el usuario escribe el nombre de la ciudad a mano. El
+autocompletado propone nombres canónicos sin consultar la base de datos:
+
+- Las ciudades salen del nomenclátor incluido (`app/data/venezuela_cities.csv`)
+  y de los valores de `from_city` / `to_city` de los viajes recientes.
+- Los términos indexados son el nombre normalizado (minúsculas, sin
+  acentos ni signos) y cada sufijo que empieza en una palabra, de modo que
+  "cruz" encuentra "Puerto La Cruz". Se guardan en una lista ordenada y un
+  prefijo se resuelve con búsqueda binaria.
+- Los resultados se ordenan por número de viajes y, a igualdad, por
+  población (aproximada, solo sirve para desempatar).
+
+`canonical_key` da la clave de ciudad que se guarda en cada viaje y con la
+que `search_rides` filtra por igualdad (ver la migración
+`20261019_add_ride_city_keys.sql`).
+
+El índice se reconstruye cada `CITY_INDEX_REFRESH_SECONDS` desde la base
+de datos y se actualiza al momento con los viajes que crea o elimina este
+worker.
+"""
+import asyncio
+import csv
+import logging
+import os
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.services.geo import CityLocator, haversine_km
+from app.utils.database import Client, get_supabase_client, run_query
+from app.utils.startup import FAST_STARTUP
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = Path(__file__).parent.parent / "data" / "venezuela_cities.csv"
+
+# Configuración
+CITY_INDEX_REFRESH_SECONDS = float(os.getenv("CITY_INDEX_REFRESH_SECONDS", "600"))
+CITY_INDEX_LOOKBACK_DAYS = int(os.getenv("CITY_INDEX_LOOKBACK_DAYS", "180"))
+# Distancia máxima (km) entre las coordenadas de un viaje y la ciudad que
+# escribió el conductor para aceptar ese nombre (áreas metropolitanas)
+CITY_MATCH_MAX_KM = float(os.getenv("CITY_MATCH_MAX_KM", "40"))
+# Distancia máxima (km) para asignar la ciudad más cercana por coordenadas
+CITY_SNAP_MAX_KM = float(os.getenv("CITY_SNAP_MAX_KM", "25"))
+
+# Filas por consulta al recargar (límite por defecto de PostgREST)
+REFRESH_PAGE_SIZE = 1000
+
+# Palabras con las que no se indexa un sufijo ("de los Morros", "la Cruz"...)
+_STOPWORDS = {"de", "del", "la", "las", "el", "los", "y"}
+
+# Prefijos memorizados entre cambios del índice
+_MAX_MEMO_ENTRIES = 4096
+
+# Abreviaturas habituales al escribir nombres de ciudades
+_ABBREVIATIONS = {
+    "pto": "puerto",
+    "sta": "santa",
+    "sto": "santo",
+    "sn": "san",
+    "cd": "ciudad",
+    "edo": "estado",
+}
+
+# Otros nombres de ciudades del nomenclátor (ya normalizados)
+CITY_ALIASES = {
+    "ccs": "caracas",
+    "bqto": "barquisimeto",
+    "plc": "puerto la cruz",
+    "ciudad guayana": "puerto ordaz",
+    "guayana": "puerto ordaz",
+    "margarita": "porlamar",
+    "isla de margarita": "porlamar",
+    "vargas": "la guaira",
+    "el tigre anzoategui": "el tigre",
+    "san jose de guanipa": "el tigrito",
+    "villa bruzual": "turen",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_city(name: Optional[str]) -> str:
+    """
+    Normaliza un nombre de ciudad: minúsculas, sin acentos ni signos de
+    puntuación y con los espacios colapsados ("  Mérida. " -> "merida").
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+def _terms(key: str) -> List[str]:
+    """
+    Términos indexados de una ciudad: el nombre completo y los sufijos que
+    empiezan en una palabra significativa.
+    """
+    words = key.split()
+    return [key] + [
+        " ".join(words[i:]) for i in range(1, len(words))
+        if words[i] not in _STOPWORDS
+    ]
+
+
+@dataclass
+class City:
+    """Ciudad del índice."""
+    key: str
+    name: str
+    state: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    population: int = 0
+    ride_count: int = 0
+
+    @property
+    def rank(self) -> Tuple[int, int, str]:
+        return (-self.ride_count, -self.population, self.key)
+
+
+def load_gazetteer(path: Path = GAZETTEER_PATH) -> List[City]:
+    """
+    Lee el nomenclátor de ciudades incluido con la aplicación.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        return [
+            City(
+                key=normalize_city(row["name"]),
+                name=row["name"],
+                state=row["state"],
+                lat=float(row["lat"]),
+                lon=float(row["lon"]),
+                population=int(row["population"]),
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+class CityIndex:
+    """
+    Índice de prefijos sobre las ciudades conocidas.
+    """
+
+    def __init__(self, gazetteer: Optional[List[City]] = None):
+        self._gazetteer = gazetteer if gazetteer is not None else load_gazetteer()
+        self._gazetteer_keys = {city.key for city in self._gazetteer}
+        self._located = [city for city in self._gazetteer if city.lat is not None and city.lon is not None]
+        self._located_index = {city.key: i for i, city in enumerate(self._located)}
+        self.locator = CityLocator([c.lat for c in self._located], [c.lon for c in self._located])
+        # Sufijos de estado que se quitan al canonicalizar ("Valencia, Carabobo")
+        self._state_suffixes = sorted(
+            {" " + normalize_city(city.state) for city in self._gazetteer if city.state} | {" d c", " dc"},
+            key=len,
+            reverse=True
+        )
+        self.cities: Dict[str, City] = {}
+        # (término, clave de ciudad), ordenado por término
+        self._terms: List[Tuple[str, str]] = []
+        self._memo: Dict[Tuple[str, int], List[City]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshed_at: Optional[float] = None
+        self.stats = {"lookups": 0, "memo_hits": 0, "refreshes": 0, "refresh_errors": 0}
+        self._rebuild(Counter(), {})
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    # --- Construcción ---
+
+    def _rebuild(self, counts: Counter, names: Dict[str, str]) -> None:
+        cities: Dict[str, City] = {}
+        for city in self._gazetteer:
+            cities.setdefault(city.key, replace(city, ride_count=counts.get(city.key, 0)))
+        for key, count in counts.items():
+            if key not in cities:
+                cities[key] = City(key=key, name=names[key], ride_count=count)
+
+        terms = sorted((term, key) for key in cities for term in _terms(key))
+        # Se reemplaza todo de una vez: las búsquedas en curso no ven un
+        # índice a medio construir
+        self.cities, self._terms, self._memo = cities, terms, {}
+
+    def canonical_key(self, name: Optional[str]) -> str:
+        """
+        Clave de ciudad que se guarda en `Ride.from_city_key` / `to_city_key`.
+
+        Normaliza el nombre, expande abreviaturas ("Pto La Cruz"), resuelve
+        alias ("Ciudad Guayana") y quita el estado al final ("Valencia,
+        Edo. Carabobo") cuando lo que queda es una ciudad del nomenclátor.
+        Los nombres desconocidos quedan solo normalizados.
+        """
+        key = normalize_city(name)
+        if not key:
+            return ""
+        key = " ".join(_ABBREVIATIONS.get(word, word) for word in key.split())
+        key = CITY_ALIASES.get(key, key)
+        if key in self._gazetteer_keys:
+            return key
+
+        for suffix in self._state_suffixes:
+            if key.endswith(suffix):
+                base = key[:-len(suffix)].removesuffix(" estado")
+                base = CITY_ALIASES.get(base, base)
+                if base in self._gazetteer_keys:
+                    return base
+        return key
+
+    def match_key(self, name: Optional[str]) -> Optional[str]:
+        """
+        Clave canónica de `name` si es una ciudad conocida (del nomenclátor o
+        de algún viaje); None si no lo es (p. ej. un nombre a medio escribir).
+        """
+        key = self.canonical_key(name)
+        return key if key in self.cities else None
+
+    def ride_keys(self, rides: List[dict]) -> List[Tuple[str, str]]:
+        """
+        Claves (origen, destino) de varios viajes a partir del nombre escrito
+        y de las coordenadas, resueltas en lote:
+
+        1. Si el nombre es una ciudad del nomenclátor a menos de
+           `CITY_MATCH_MAX_KM` de las coordenadas, esa ciudad.
+        2. Si no, la ciudad del nomenclátor más cercana a las coordenadas,
+           si está a menos de `CITY_SNAP_MAX_KM`.
+        3. Si no, la clave canónica del nombre escrito.
+        """
+        points = [
+            (ride.get(f"{side}_city"), ride.get(f"{side}_lat"), ride.get(f"{side}_lon"))
+            for ride in rides
+            for side in ("from", "to")
+        ]
+        keys = [self.canonical_key(name) for name, _, _ in points]
+        located = [i for i, (_, lat, lon) in enumerate(points) if lat is not None and lon is not None]
+
+        if located and self._located:
+            lats = [points[i][1] for i in located]
+            lons = [points[i][2] for i in located]
+            nearest, nearest_km = self.locator.nearest(lats, lons)
+
+            # Distancia a la ciudad escrita (NaN si no es del nomenclátor)
+            typed = [self._located_index.get(keys[i]) for i in located]
+            typed_km = haversine_km(
+                lats, lons,
+                [self._located[t].lat if t is not None else float("nan") for t in typed],
+                [self._located[t].lon if t is not None else float("nan") for t in typed],
+            ).tolist()
+
+            for j, i in enumerate(located):
+                if typed[j] is not None and typed_km[j] <= CITY_MATCH_MAX_KM:
+                    continue
+                if nearest_km[j] <= CITY_SNAP_MAX_KM:
+                    keys[i] = self._located[nearest[j]].key
+
+        return [(keys[i], keys[i + 1]) for i in range(0, len(keys), 2)]
+
+    def _add(self, city: City) -> None:
+        self.cities[city.key] = city
+        for term in _terms(city.key):
+            insort(self._terms, (term, city.key))
+
+    def record(self, name: Optional[str], delta: int = 1, key: Optional[str] = None) -> None:
+        """
+        Suma (o resta) viajes a una ciudad; la añade si no se conocía.
+        `key` es la clave guardada en el viaje, si se conoce.
+        """
+        key = key or self.canonical_key(name)
+        if not key:
+            return
+        city = self.cities.get(key)
+        if city is None:
+            if delta <= 0 or not name:
+                # Sin nombre no hay nada que sugerir
+                return
+            city = City(key=key, name=" ".join(name.split()))
+            self._add(city)
+        city.ride_count = max(0, city.ride_count + delta)
+        self._memo = {}
+
+    def record_ride(self, ride: dict, delta: int = 1) -> None:
+        """
+        Actualiza el índice con un viaje creado (`delta=1`) o eliminado (`-1`).
+        """
+        self.record(ride.get("from_city"), delta, ride.get("from_city_key"))
+        self.record(ride.get("to_city"), delta, ride.get("to_city_key"))
+
+    # --- Consulta ---
+
+    def suggest(self, query: str, limit: int = 8) -> List[City]:
+        """
+        Ciudades cuyo nombre (o una de sus palabras) empieza por `query`,
+        sin distinguir mayúsculas ni acentos.
+        """
+        prefix = normalize_city(query)
+        if not prefix:
+            return []
+
+        self.stats["lookups"] += 1
+        memo_key = (prefix, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            self.stats["memo_hits"] += 1
+            return cached
+
+        keys = set()
+        terms = self._terms
+        for i in range(bisect_left(terms, (prefix,)), len(terms)):
+            term, key = terms[i]
+            if not term.startswith(prefix):
+                break
+            keys.add(key)
+
+        result = sorted((self.cities[key] for key in keys), key=lambda c: c.rank)[:limit]
+        if len(self._memo) >= _MAX_MEMO_ENTRIES:
+            self._memo = {}
+        self._memo[memo_key] = result
+        return result
+
+    def resolve(self, name: Optional[str]) -> Optional[City]:
+        """
+        Ciudad conocida con ese nombre (según su clave canónica).
+        """
+        return self.cities.get(self.canonical_key(name))
+
+    # --- Recarga desde la base de datos ---
+
+    async def refresh(self, db: Client) -> None:
+        """
+        Recuenta los viajes por ciudad de los últimos
+        `CITY_INDEX_LOOKBACK_DAYS` días (incluidos los futuros).
+        """
+        since = (datetime.now() - timedelta(days=CITY_INDEX_LOOKBACK_DAYS)).isoformat()
+        counts: Counter = Counter()
+        names: Dict[str, str] = {}
+        offset = 0
+        while True:
+            result = await run_query(
+                db.table("Ride").select("from_city, to_city, from_city_key, to_city_key")
+                .gte("date_time", since)
+                .order("id")
+                .range(offset, offset + REFRESH_PAGE_SIZE - 1)
+            )
+            rows = result.data or []
+            for row in rows:
+                for side in ("from", "to"):
+                    name = row.get(f"{side}_city")
+                    key = row.get(f"{side}_city_key") or self.canonical_key(name)
+                    if key and name:
+                        counts[key] += 1
+                        names.setdefault(key, " ".join(name.split()))
+            if len(rows) < REFRESH_PAGE_SIZE:
+                break
+            offset += REFRESH_PAGE_SIZE
+
+        self._rebuild(counts, names)
+        self.refreshed_at = time.time()
+        self.stats["refreshes"] += 1
+
+    async def _run(self, interval: float, delay: float) -> None:
+        from fastapi.concurrency import run_in_threadpool
+
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                db = await run_in_threadpool(get_supabase_client)
+                await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning("No se pudo recargar el índice de ciudades: %s", e)
+            await asyncio.sleep(interval)
+
+    async def start(self, interval: float = CITY_INDEX_REFRESH_SECONDS) -> None:
+        """
+        Inicia la recarga periódica. En modo `FAST_STARTUP` la primera
+        recarga se aplaza un intervalo; mientras tanto se sirve el nomenclátor.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval, interval if FAST_STARTUP else 0))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "cities": len(self.cities),
+            "terms": len(self._terms),
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+# Instancia compartida por el worker
+city_index = CityIndex()
@@ -0,0 +1,50 @@
+"""
+Corredores de viaje: búsqueda de viajes que pasan cerca de la recogida y
+el destino del pasajero, no solo de los que empiezan y terminan allí
+(Caracas → Barquisimeto recoge en Valencia).
+
+Al crear un viaje, su ruta (la polilínea enviada por el conductor o, si no
+hay, el círculo máximo entre origen y destino) se densifica y se convierte
+en el conjunto de celdas de la rejilla a menos de `CORRIDOR_BUFFER_KM`
+(`Ride.route_cells`, con índice GIN). Buscar es entonces comprobar que las
+celdas de la recogida y del destino están en ese conjunto (`@>`), sin
+calcular geometría por viaje; solo se verifica después el sentido.
+"""
+import os
+from typing import List, Optional, Sequence, Tuple
+from app.services.geo import buffered_cells, cell_ids, great_circle_path, haversine_km
+
+CORRIDOR_BUFFER_KM = float(os.getenv("CORRIDOR_BUFFER_KM", "10"))
+
+# Separación máxima entre puntos de la ruta densificada (menor que una celda)
+CORRIDOR_STEP_KM = 5.0
+
+
+def route_cells(ride: dict, route: Optional[Sequence[Tuple[float, float]]] = None) -> List[int]:
+    """
+    Celdas del corredor de un viaje.
+
+    Args:
+        ride: Viaje con `from_lat/from_lon/to_lat/to_lon`
+        route: Polilínea aproximada [(lat, lon), ...] entre origen y destino
+            (opcional; se le añaden los extremos del viaje)
+    """
+    points = [(ride["from_lat"], ride["from_lon"]), *(route or []), (ride["to_lat"], ride["to_lon"])]
+    lats, lons = great_circle_path([p[0] for p in points], [p[1] for p in points], CORRIDOR_STEP_KM)
+    return buffered_cells(lats, lons, CORRIDOR_BUFFER_KM)
+
+
+def point_cell(lat: float, lon: float) -> int:
+    """
+    Celda de la rejilla que contiene un punto.
+    """
+    return int(cell_ids(lat, lon))
+
+
+def heads_forward(ride: dict, pickup: Tuple[float, float], dropoff: Tuple[float, float]) -> bool:
+    """
+    Las celdas no tienen sentido: el viaje sirve si la recogida está más
+    cerca de su origen que el destino del pasajero.
+    """
+    distances = haversine_km(ride["from_lat"], ride["from_lon"], [pickup[0], dropoff[0]], [pickup[1], dropoff[1]])
+    return bool(distances[0] < distances[1])
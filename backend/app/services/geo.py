@@ -0,0 +1,243 @@
+"""
+Geometría sobre el nomenclátor: distancias haversine vectorizadas y un
+k-d tree para encontrar la ciudad más cercana a unas coordenadas, sin
+llamar a servicios de geocodificación externos.
+
+También define la rejilla de celdas con la que se comparan corredores de
+viaje (ver `app/services/corridors.py`).
+
+El árbol se construye sobre los vectores unitarios (x, y, z) de cada
+ciudad: en la esfera la distancia euclídea (cuerda) crece con la distancia
+de círculo máximo, así que el vecino más cercano en 3D es también el más
+cercano sobre la superficie y no hay problemas con el antimeridiano.
+
+`numpy` se importa al construir el árbol (no al importar la app), para no
+penalizar el arranque en modo `FAST_STARTUP`.
+"""
+import math
+import threading
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Rejilla de celdas: 0.1° (~11 km de lado en latitud). El ID de una celda
+# es fila * columnas + columna y cabe en un `integer` de Postgres.
+CELL_DEGREES = 0.1
+CELL_COLUMNS = round(360 / CELL_DEGREES)
+KM_PER_DEGREE = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> "np.ndarray":
+    """
+    Distancia de círculo máximo en km entre arrays de coordenadas (grados).
+    Acepta escalares o arrays que se puedan combinar por broadcasting.
+    """
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def unit_vectors(lat, lon) -> "np.ndarray":
+    """
+    Coordenadas (grados) -> vectores unitarios de forma (n, 3).
+    """
+    import numpy as np
+
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def bounding_box(lat: float, radius_km: float) -> Tuple[float, float]:
+    """
+    Semiancho en grados (latitud, longitud) de un rectángulo que contiene
+    el círculo de `radius_km` alrededor de un punto a latitud `lat`.
+    """
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lon = d_lat / max(math.cos(math.radians(min(abs(lat) + d_lat, 89.0))), 0.01)
+    return d_lat, d_lon
+
+
+def cell_ids(lat, lon) -> "np.ndarray":
+    """
+    IDs de las celdas de la rejilla que contienen cada coordenada.
+    """
+    import numpy as np
+
+    rows = np.floor((np.asarray(lat, dtype=float) + 90) / CELL_DEGREES).astype(np.int64)
+    cols = np.floor((np.asarray(lon, dtype=float) + 180) / CELL_DEGREES).astype(np.int64) % CELL_COLUMNS
+    return rows * CELL_COLUMNS + cols
+
+
+def great_circle_path(lats: Sequence[float], lons: Sequence[float], step_km: float) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Densifica una polilínea siguiendo el círculo máximo entre cada par de
+    vértices, con puntos a lo sumo cada `step_km`.
+    """
+    import numpy as np
+
+    vectors = unit_vectors(lats, lons)
+    samples = [vectors[:1]]
+    for p, q in zip(vectors[:-1], vectors[1:]):
+        omega = float(np.arccos(np.clip(p @ q, -1.0, 1.0)))
+        steps = max(1, int(np.ceil(omega * EARTH_RADIUS_KM / step_km)))
+        t = np.arange(1, steps + 1)[:, None] / steps
+        if omega < 1e-9:
+            samples.append(np.repeat(q[None, :], steps, axis=0))
+            continue
+        # Interpolación esférica (slerp) entre los dos vértices
+        samples.append((np.sin((1 - t) * omega) * p + np.sin(t * omega) * q) / np.sin(omega))
+    points = np.concatenate(samples)
+    return (
+        np.degrees(np.arcsin(np.clip(points[:, 2], -1.0, 1.0))),
+        np.degrees(np.arctan2(points[:, 1], points[:, 0])),
+    )
+
+
+def buffered_cells(lats: Sequence[float], lons: Sequence[float], buffer_km: float) -> List[int]:
+    """
+    Celdas (ordenadas, sin repetir) a menos de ~`buffer_km` de algún punto.
+    El buffer es un rectángulo de celdas alrededor de cada punto; en
+    longitud se usa el radio de la latitud más alejada del ecuador.
+    """
+    import numpy as np
+
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    if not len(lats):
+        return []
+    cos_lat = max(float(np.cos(np.radians(np.abs(lats).max()))), 0.01)
+    row_radius = int(np.ceil(buffer_km / (KM_PER_DEGREE * CELL_DEGREES)))
+    col_radius = int(np.ceil(buffer_km / (KM_PER_DEGREE * cos_lat * CELL_DEGREES)))
+
+    centers = cell_ids(lats, lons)
+    rows, cols = np.divmod(np.unique(centers), CELL_COLUMNS)
+    d_rows, d_cols = np.meshgrid(
+        np.arange(-row_radius, row_radius + 1), np.arange(-col_radius, col_radius + 1), indexing="ij"
+    )
+    all_rows = rows[:, None] + d_rows.ravel()[None, :]
+    all_cols = (cols[:, None] + d_cols.ravel()[None, :]) % CELL_COLUMNS
+    cells = all_rows * CELL_COLUMNS + all_cols
+    return np.unique(cells[(all_rows >= 0) & (all_rows < 180 / CELL_DEGREES)]).tolist()
+
+
+class KDTree:
+    """
+    k-d tree estático sobre puntos en 3D, guardado en arrays paralelos
+    (nodo -> punto, eje de corte, hijo izquierdo, hijo derecho).
+    """
+
+    def __init__(self, points: "np.ndarray"):
+        import numpy as np
+
+        self.points = np.asarray(points, dtype=float)
+        n = len(self.points)
+        self._point = np.empty(n, dtype=np.intp)
+        self._axis = np.empty(n, dtype=np.intp)
+        self._left = np.full(n, -1, dtype=np.intp)
+        self._right = np.full(n, -1, dtype=np.intp)
+        self._size = 0
+        self.root = self._build(np.arange(n)) if n else -1
+        # Listas de Python: el recorrido es escalar y así evita crear
+        # objetos numpy en cada paso
+        self._coords = self.points.tolist()
+        self._point_l, self._axis_l = self._point.tolist(), self._axis.tolist()
+        self._left_l, self._right_l = self._left.tolist(), self._right.tolist()
+
+    def _build(self, indices: "np.ndarray") -> int:
+        if len(indices) == 0:
+            return -1
+        # Corta por el eje de mayor extensión
+        spread = self.points[indices].max(axis=0) - self.points[indices].min(axis=0)
+        axis = int(spread.argmax())
+        order = indices[self.points[indices, axis].argsort()]
+        median = len(order) // 2
+
+        node = self._size
+        self._size += 1
+        self._point[node] = order[median]
+        self._axis[node] = axis
+        self._left[node] = self._build(order[:median])
+        self._right[node] = self._build(order[median + 1:])
+        return node
+
+    def nearest_one(self, target: Sequence[float]) -> Tuple[int, float]:
+        """
+        Índice del punto más cercano a `target` y su distancia euclídea al cuadrado.
+        """
+        coords, point, axis = self._coords, self._point_l, self._axis_l
+        left, right = self._left_l, self._right_l
+        best, best_d2 = -1, float("inf")
+        stack = [self.root] if self.root >= 0 else []
+        while stack:
+            node = stack.pop()
+            p = coords[point[node]]
+            d2 = (p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 + (p[2] - target[2]) ** 2
+            if d2 < best_d2:
+                best, best_d2 = point[node], d2
+            diff = target[axis[node]] - p[axis[node]]
+            near, far = (left[node], right[node]) if diff < 0 else (right[node], left[node])
+            # El lado lejano solo se visita si el plano de corte está más
+            # cerca que el mejor candidato (se apila primero: sale después)
+            if far >= 0 and diff * diff < best_d2:
+                stack.append(far)
+            if near >= 0:
+                stack.append(near)
+        return best, best_d2
+
+    def nearest(self, targets: "np.ndarray") -> "np.ndarray":
+        """
+        Índices de los puntos más cercanos a cada fila de `targets` (n, 3).
+        """
+        import numpy as np
+
+        return np.fromiter(
+            (self.nearest_one(t)[0] for t in np.asarray(targets, dtype=float).tolist()),
+            dtype=np.intp,
+            count=len(targets)
+        )
+
+
+class CityLocator:
+    """
+    Ciudad del nomenclátor más cercana a unas coordenadas (en lote).
+    """
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float]):
+        self._lats = list(lats)
+        self._lons = list(lons)
+        self._tree: Optional[KDTree] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tree(self) -> KDTree:
+        # Se construye la primera vez (o en el warm-up de arranque)
+        if self._tree is None:
+            with self._lock:
+                if self._tree is None:
+                    self._tree = KDTree(unit_vectors(self._lats, self._lons))
+        return self._tree
+
+    def nearest(self, lats: Sequence[float], lons: Sequence[float]) -> Tuple[List[int], List[float]]:
+        """
+        Para cada punto, índice de la ciudad más cercana y distancia en km.
+        """
+        import numpy as np
+
+        tree = self.tree
+        if not len(lats):
+            return [], []
+        indices = tree.nearest(unit_vectors(lats, lons))
+        distances = haversine_km(
+            lats, lons,
+            np.asarray(self._lats)[indices], np.asarray(self._lons)[indices]
+        )
+        return indices.tolist(), distances.tolist()
@@ -3,7 +3,7 @@ Notification Service for handling notification creation and delivery.
 """
 from typing import Optional, Dict, Any
 from uuid import UUID
-from supabase import Client
+from app.utils.database import Client, run_query
 
 
 class NotificationService:
@@ -54,7 +54,7 @@ class NotificationService:
             "metadata": metadata or {}
         }
         
-        response = self.db.table("notifications").insert(notification_data).execute()
+        response = await run_query(self.db.table("notifications").insert(notification_data))
         
         if not response.data or len(response.data) == 0:
             raise Exception("Failed to create notification")
@@ -86,7 +86,7 @@ class NotificationService:
         """
         # TODO: Implement with Resend
         # Example:
-        # user = self.db.table("users").select("email").eq("id", user_id).execute()
+        # user = await run_query(self.db.table("users").select("email").eq("id", user_id))
         # if user.data:
         #     await resend.send(
         #         to=user.data[0]["email"],
@@ -112,7 +112,7 @@ class NotificationService:
         """
         # TODO: Implement with FCM/OneSignal
         # Example:
-        # user = self.db.table("users").select("fcm_token").eq("id", user_id).execute()
+        # user = await run_query(self.db.table("users").select("fcm_token").eq("id", user_id))
         # if user.data and user.data[0].get("fcm_token"):
         #     await fcm.send(
         #         token=user.data[0]["fcm_token"],
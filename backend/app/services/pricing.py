@@ -0,0 +1,254 @@
+"""
+Sugerencia de precio para conductores a partir de viajes anteriores.
+
+Cada `PRICE_REFRESH_SECONDS` se leen los precios de los últimos
+`PRICE_LOOKBACK_DAYS` días y se agregan con numpy, de una vez:
+
+- Por par de ciudades (sin sentido: Caracas-Valencia = Valencia-Caracas):
+  percentiles 25/50/75 del precio.
+- Por banda de distancia: percentiles del precio por km.
+
+Las tablas resultantes son la caché por par de ciudades; una sugerencia
+solo calcula la distancia y consulta un diccionario, sin tocar la base de
+datos. Se usa el par si tiene al menos `PRICE_MIN_SAMPLES` viajes, si no
+la banda de distancia y, sin historial, `PRICE_DEFAULT_PER_KM`.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.services.cities import city_index
+from app.services.geo import haversine_km
+from app.utils.database import Client, get_supabase_client, run_query
+from app.utils.startup import FAST_STARTUP
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRICE_REFRESH_SECONDS = float(os.getenv("PRICE_REFRESH_SECONDS", "3600"))
+PRICE_LOOKBACK_DAYS = int(os.getenv("PRICE_LOOKBACK_DAYS", "365"))
+PRICE_MIN_SAMPLES = int(os.getenv("PRICE_MIN_SAMPLES", "5"))
+PRICE_DEFAULT_PER_KM = float(os.getenv("PRICE_DEFAULT_PER_KM", "0.1"))
+
+# Límites inferiores de las bandas de distancia (km)
+DISTANCE_BANDS_KM = (0, 25, 50, 100, 200, 400, 800)
+
+# Los precios sugeridos se redondean a este múltiplo
+PRICE_STEP = 0.5
+
+REFRESH_PAGE_SIZE = 1000
+
+# (p25, mediana, p75, viajes)
+Stats = Tuple[float, float, float, int]
+
+
+def grouped_quantiles(groups: "np.ndarray", values: "np.ndarray", qs: Sequence[float]):
+    """
+    Percentiles (interpolación lineal) de `values` para cada grupo.
+
+    Returns:
+        (grupos, número de valores por grupo, matriz len(qs) x grupos)
+    """
+    import numpy as np
+
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    result = np.empty((len(qs), len(keys)))
+    for i, q in enumerate(qs):
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.ceil(position).astype(np.intp)
+        fraction = position - lower
+        result[i] = values[lower] * (1 - fraction) + values[upper] * fraction
+    return keys, counts, result
+
+
+def _round_price(value: float) -> float:
+    return round(value / PRICE_STEP) * PRICE_STEP
+
+
+def distance_band(distance_km: float) -> int:
+    import numpy as np
+
+    return int(np.digitize(distance_km, DISTANCE_BANDS_KM)) - 1
+
+
+class PriceModel:
+    """
+    Tablas de precios por par de ciudades y por banda de distancia.
+    """
+
+    def __init__(self):
+        self.pairs: Dict[Tuple[str, str], Stats] = {}
+        self.bands: Dict[int, Stats] = {}
+        self.rides = 0
+        self.refreshed_at: Optional[float] = None
+        self.stats = {"suggestions": 0, "refreshes": 0, "refresh_errors": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def pair_key(from_key: str, to_key: str) -> Tuple[str, str]:
+        return (from_key, to_key) if from_key <= to_key else (to_key, from_key)
+
+    def rebuild(self, rows: Sequence[dict]) -> None:
+        """
+        Recalcula las tablas a partir de filas de viajes con precio.
+        """
+        import numpy as np
+
+        rows = [row for row in rows if row.get("price") is not None]
+        if not rows:
+            self.pairs, self.bands, self.rides = {}, {}, 0
+            return
+
+        def column(name):
+            return np.fromiter((row[name] for row in rows), dtype=float, count=len(rows))
+
+        prices = column("price")
+        distances = haversine_km(column("from_lat"), column("from_lon"), column("to_lat"), column("to_lon"))
+        valid = distances >= 1.0
+
+        # Par de ciudades -> código entero
+        codes: Dict[Tuple[str, str], int] = {}
+        pair_codes = np.fromiter((
+            codes.setdefault(self.pair_key(
+                row.get("from_city_key") or city_index.canonical_key(row.get("from_city")) or "",
+                row.get("to_city_key") or city_index.canonical_key(row.get("to_city")) or ""
+            ), len(codes))
+            for row in rows
+        ), dtype=np.int64, count=len(rows))
+        names = list(codes)
+
+        qs = (0.25, 0.5, 0.75)
+        keys, counts, quantiles = grouped_quantiles(pair_codes[valid], prices[valid], qs)
+        self.pairs = {
+            names[code]: (*quantiles[:, i].tolist(), int(count))
+            for i, (code, count) in enumerate(zip(keys.tolist(), counts.tolist()))
+        }
+
+        bands = np.digitize(distances[valid], DISTANCE_BANDS_KM) - 1
+        keys, counts, quantiles = grouped_quantiles(bands, prices[valid] / distances[valid], qs)
+        self.bands = {
+            band: (*quantiles[:, i].tolist(), int(count))
+            for i, (band, count) in enumerate(zip(keys.tolist(), counts.tolist()))
+        }
+        self.rides = int(valid.sum())
+
+    def suggest(
+        self,
+        from_lat: float,
+        from_lon: float,
+        to_lat: float,
+        to_lon: float,
+        from_city: Optional[str] = None,
+        to_city: Optional[str] = None
+    ) -> dict:
+        """
+        Precio sugerido (con rango p25-p75) para un trayecto.
+        """
+        self.stats["suggestions"] += 1
+        distance = float(haversine_km(from_lat, from_lon, to_lat, to_lon))
+        ride = {
+            "from_city": from_city, "from_lat": from_lat, "from_lon": from_lon,
+            "to_city": to_city, "to_lat": to_lat, "to_lon": to_lon,
+        }
+        from_key, to_key = city_index.ride_keys([ride])[0]
+
+        stats = self.pairs.get(self.pair_key(from_key or "", to_key or ""))
+        if stats and stats[3] >= PRICE_MIN_SAMPLES:
+            low, price, high, samples = stats
+            basis = "pair"
+        else:
+            stats = self.bands.get(distance_band(distance))
+            if stats and stats[3] >= PRICE_MIN_SAMPLES:
+                low, price, high = (per_km * distance for per_km in stats[:3])
+                samples, basis = stats[3], "distance"
+            else:
+                low = price = high = PRICE_DEFAULT_PER_KM * distance
+                samples, basis = 0, "default"
+
+        return {
+            "distance_km": round(distance, 1),
+            "suggested_price": _round_price(price),
+            "low": _round_price(low),
+            "high": _round_price(high),
+            "basis": basis,
+            "sample_size": samples,
+        }
+
+    async def refresh(self, db: Client) -> None:
+        """
+        Lee los precios de los últimos `PRICE_LOOKBACK_DAYS` días.
+        """
+        since = (datetime.now() - timedelta(days=PRICE_LOOKBACK_DAYS)).isoformat()
+        rows = []
+        offset = 0
+        while True:
+            result = await run_query(
+                db.table("Ride").select(
+                    "from_city, to_city, from_city_key, to_city_key, from_lat, from_lon, to_lat, to_lon, price"
+                )
+                .gte("date_time", since)
+                .not_.is_("price", "null")
+                .order("id")
+                .range(offset, offset + REFRESH_PAGE_SIZE - 1)
+            )
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < REFRESH_PAGE_SIZE:
+                break
+            offset += REFRESH_PAGE_SIZE
+
+        # ~0.2 s por cada 50k viajes: fuera del event loop
+        await run_in_threadpool(self.rebuild, rows)
+        self.refreshed_at = time.time()
+        self.stats["refreshes"] += 1
+
+    async def _run(self, interval: float, delay: float) -> None:
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                db = await run_in_threadpool(get_supabase_client)
+                await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning("No se pudo recargar el modelo de precios: %s", e)
+            await asyncio.sleep(interval)
+
+    async def start(self, interval: float = PRICE_REFRESH_SECONDS) -> None:
+        """
+        Inicia la recarga periódica. En modo `FAST_STARTUP` la primera
+        carga se aplaza unos segundos; mientras tanto se usa el precio por
+        km por defecto.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval, 30 if FAST_STARTUP else 0))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "rides": self.rides,
+            "pairs": len(self.pairs),
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+# Instancia compartida por el worker
+price_model = PriceModel()
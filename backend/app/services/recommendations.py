@@ -0,0 +1,137 @@
+"""
+Recomendación de viajes para pasajeros.
+
+Cada candidato recibe una puntuación en [0, 1], suma ponderada de:
+
+- `origin`: cercanía de su origen al del pasajero (1 en el mismo punto,
+  0 a `radius_km`).
+- `destination`: ídem con el destino, si el pasajero lo indica.
+- `time`: cercanía de la salida a la hora deseada (o a ahora: antes es
+  mejor), con caída exponencial de escala `RECOMMEND_TIME_SCALE_HOURS`.
+- `price`: 1 para el más barato de los candidatos, 0 para el más caro.
+- `rating`: valoración media del conductor / 5 (3 si no tiene).
+
+Los candidatos (columnas de `RideIndex.nearby` o `columns_from_rows`)
+salen de un prefiltro espacial sobre el origen (índice en memoria de
+viajes o, si no está activo, un rectángulo en la base de datos); la
+puntuación se calcula con numpy para todos a la vez y los K mejores se
+eligen con `argpartition`, sin ordenar el resto.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.services.geo import haversine_km
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RECOMMEND_TIME_SCALE_HOURS = float(os.getenv("RECOMMEND_TIME_SCALE_HOURS", "12"))
+
+# Máximo de candidatos leídos de la base de datos sin índice en memoria
+RECOMMEND_MAX_CANDIDATES = 2000
+
+WEIGHTS: Dict[str, float] = {
+    "origin": 0.3,
+    "destination": 0.3,
+    "time": 0.2,
+    "price": 0.1,
+    "rating": 0.1,
+}
+
+NEUTRAL_RATING = 3.0
+
+
+def score(
+    candidates: dict,
+    from_lat: float,
+    from_lon: float,
+    radius_km: float,
+    target_time: float,
+    to_lat: Optional[float] = None,
+    to_lon: Optional[float] = None
+) -> Dict[str, "np.ndarray"]:
+    """
+    Puntuación de todos los candidatos en una pasada vectorizada.
+
+    Returns:
+        `score` y distancias `origin_km` / `destination_km` (NaN sin destino)
+    """
+    import numpy as np
+
+    origin_km = haversine_km(from_lat, from_lon, candidates["from_lat"], candidates["from_lon"])
+    total = WEIGHTS["origin"] * np.clip(1 - origin_km / radius_km, 0, 1)
+
+    if to_lat is not None and to_lon is not None:
+        destination_km = haversine_km(to_lat, to_lon, candidates["to_lat"], candidates["to_lon"])
+        total += WEIGHTS["destination"] * np.clip(1 - destination_km / radius_km, 0, 1)
+    else:
+        destination_km = np.full(len(origin_km), np.nan)
+
+    hours = np.abs(candidates["departures"] - target_time) / 3600
+    total += WEIGHTS["time"] * np.exp(-hours / RECOMMEND_TIME_SCALE_HOURS)
+
+    prices = candidates["prices"]
+    if np.isfinite(prices).any():
+        low, high = np.nanmin(prices), np.nanmax(prices)
+        price_score = 1 - (prices - low) / (high - low) if high > low else np.ones(len(prices))
+        total += WEIGHTS["price"] * np.nan_to_num(price_score, nan=0.5)
+    else:
+        total += WEIGHTS["price"] * 0.5
+
+    ratings = np.nan_to_num(candidates["ratings"], nan=NEUTRAL_RATING)
+    total += WEIGHTS["rating"] * np.clip(ratings / 5, 0, 1)
+
+    # Sin destino, la suma se normaliza con los pesos restantes
+    weight = sum(WEIGHTS.values()) - (WEIGHTS["destination"] if to_lat is None or to_lon is None else 0)
+    return {"score": total / weight, "origin_km": origin_km, "destination_km": destination_km}
+
+
+def top_k(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """
+    Índices de las `k` mejores puntuaciones, de mayor a menor. Selección
+    parcial (O(n)) y solo se ordenan esas `k`.
+    """
+    import numpy as np
+
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def encode_recommendations(candidates: dict, scored: dict, indices: "np.ndarray") -> bytes:
+    """
+    Array JSON de recomendaciones, reutilizando el JSON ya codificado de
+    cada viaje.
+    """
+    items = []
+    payloads, rows = candidates["payloads"], candidates["rows"]
+    for i in indices.tolist():
+        destination_km = float(scored["destination_km"][i])
+        items.append(
+            b'{"ride":' + payloads[rows[i]] + b"," + json.dumps({
+                "score": round(float(scored["score"][i]), 4),
+                "origin_km": round(float(scored["origin_km"][i]), 1),
+                "destination_km": None if destination_km != destination_km else round(destination_km, 1),
+            }, separators=(",", ":")).encode()[1:]
+        )
+    return b"[" + b",".join(items) + b"]"
+
+
+def recommend(candidates: dict, k: int, **query) -> bytes:
+    """
+    Puntúa los candidatos y devuelve las `k` mejores recomendaciones en
+    JSON. `query` son los argumentos de `score`.
+    """
+    import numpy as np
+
+    scored = score(candidates, **query)
+    # Esquinas del rectángulo del prefiltro, fuera del radio
+    scored["score"][scored["origin_km"] > query["radius_km"]] = -np.inf
+    indices = top_k(scored["score"], k)
+    indices = indices[np.isfinite(scored["score"][indices])]
+    return encode_recommendations(candidates, scored, indices)
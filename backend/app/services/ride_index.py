@@ -0,0 +1,581 @@
+"""
+Índice en memoria de los viajes próximos (opcional, `RIDE_INDEX_ENABLED`).
+
+El espacio de búsqueda caliente es pequeño: viajes futuros con plazas
+libres. Con el índice activo, `search_rides` los filtra, ordena y limita
+en memoria en lugar de consultar Supabase en cada búsqueda.
+
+Formato:
+
+- Columnas paralelas (una lista por campo: salida, plazas, precio, claves
+  de ciudad...) en lugar de un dict por viaje. Al buscar se usan como
+  arrays de numpy, construidos una vez por cada cambio estructural.
+- Posiciones agrupadas por par de ciudades, por origen y por destino,
+  ordenadas por hora de salida: el rango de fechas (o el día) se resuelve
+  con búsqueda binaria y el resto de filtros con máscaras vectorizadas.
+- El JSON de cada viaje (con su conductor) se codifica al cargarlo; una
+  búsqueda solo concatena bytes, sin modelos Pydantic por request.
+
+Actualización:
+
+- Carga completa al arrancar y cada `RIDE_INDEX_FULL_REFRESH_SECONDS`: la
+  instantánea nueva se construye en el threadpool (validar y codificar
+  20k viajes lleva ~1 s) y se sustituye de una vez.
+- Cada `RIDE_INDEX_REFRESH_SECONDS`, los viajes creados desde la última
+  carga (delta por `created_at`).
+- Las rutas que modifican viajes, reservas o perfiles ya invalidan
+  `ride:<id>` / `user:<id>` en la caché de entidades, que se propagan a
+  todos los workers por pub/sub; el índice se suscribe y vuelve a leer
+  esos viajes en una sola consulta.
+- En los deltas y relecturas, el JSON también se codifica en el threadpool;
+  en el event loop solo se actualizan las columnas.
+
+Hasta completar la primera carga (o si está desactivado) las búsquedas
+van a la base de datos como siempre.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.models.schemas import RideResponse
+from app.services.cities import city_index
+from app.services.geo import bounding_box
+from app.utils.cache import entity_cache
+from app.utils.database import Client, get_supabase_client, run_query
+
+logger = logging.getLogger(__name__)
+
+RIDE_INDEX_ENABLED = os.getenv("RIDE_INDEX_ENABLED", "false").lower() == "true"
+RIDE_INDEX_REFRESH_SECONDS = float(os.getenv("RIDE_INDEX_REFRESH_SECONDS", "30"))
+RIDE_INDEX_FULL_REFRESH_SECONDS = float(os.getenv("RIDE_INDEX_FULL_REFRESH_SECONDS", "600"))
+
+RIDE_SELECT = "*, driver:User(*)"
+
+# Filas por consulta al cargar (límite por defecto de PostgREST)
+LOAD_PAGE_SIZE = 1000
+
+# IDs por consulta al releer viajes modificados
+REFETCH_BATCH_SIZE = 200
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def encode_json_array(items: Iterable[bytes]) -> bytes:
+    """
+    Une elementos JSON ya codificados en un array.
+    """
+    return b"[" + b",".join(items) + b"]"
+
+
+def _encode(row: dict) -> Optional[bytes]:
+    # Validación y JSON de un viaje; None si no cumple `RideResponse`
+    try:
+        return RideResponse(**row).model_dump_json().encode()
+    except Exception as e:
+        logger.debug("Viaje %s fuera del índice: %s", row.get("id"), e)
+        return None
+
+
+def _encode_rows(rows: List[dict]) -> List[Tuple[dict, Optional[bytes]]]:
+    return [(row, _encode(row)) for row in rows]
+
+
+class _EncodedRows:
+    """
+    JSON de cada fila, codificado al pedirlo: al paginar solo se validan y
+    codifican las filas de la página.
+    """
+
+    def __init__(self, rows: List[dict]):
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> bytes:
+        return RideResponse(**self._rows[index]).model_dump_json().encode()
+
+
+def columns_from_rows(rows: List[dict]) -> dict:
+    """
+    Columnas de viajes de la base de datos, en el mismo formato que
+    devuelve el índice: `rows` (posición de cada viaje en `payloads`),
+    `payloads` (JSON de cada viaje) y arrays de numpy `departures`,
+    `prices`, `seats`, `ratings` y coordenadas (`from_lat`...).
+    """
+    import numpy as np
+
+    def column(values):
+        return np.fromiter((math.nan if v is None else v for v in values), dtype=float, count=len(rows))
+
+    return {
+        "rows": np.arange(len(rows)),
+        "payloads": _EncodedRows(rows),
+        "departures": column(_timestamp(row["date_time"]) for row in rows),
+        "prices": column(row.get("price") for row in rows),
+        "seats": column(row["seats_available"] for row in rows),
+        "ratings": column((row.get("driver") or {}).get("average_rating") for row in rows),
+        "from_lat": column(row["from_lat"] for row in rows),
+        "from_lon": column(row["from_lon"] for row in rows),
+        "to_lat": column(row["to_lat"] for row in rows),
+        "to_lon": column(row["to_lon"] for row in rows),
+    }
+
+
+class _View:
+    """
+    Arrays de numpy y grupos ordenados por salida, construidos a partir de
+    las columnas de una instantánea.
+    """
+
+    def __init__(self, snapshot: "_Snapshot"):
+        import numpy as np
+
+        self.departures = np.asarray(snapshot.departures, dtype=np.float64)
+        self.seats = np.asarray(snapshot.seats, dtype=np.int32)
+        self.prices = np.asarray(snapshot.prices, dtype=np.float64)
+        self.ratings = np.asarray(snapshot.ratings, dtype=np.float64)
+        self.coords = np.asarray(snapshot.coords, dtype=np.float64).reshape(-1, 4)
+        alive = np.asarray(snapshot.alive, dtype=bool)
+
+        order = np.argsort(self.departures, kind="stable")
+        order = order[alive[order]]
+
+        # Claves de ciudad -> códigos enteros, para agrupar con numpy
+        codes: Dict[str, int] = {}
+        from_codes = np.fromiter((codes.setdefault(k, len(codes)) for k in snapshot.from_keys), dtype=np.int64)
+        to_codes = np.fromiter((codes.setdefault(k, len(codes)) for k in snapshot.to_keys), dtype=np.int64)
+        names = list(codes)
+
+        self.all = self._group(order)
+        self.pairs = {
+            (names[code // len(names)], names[code % len(names)]): group
+            for code, group in self._split(order, from_codes * len(names) + to_codes)
+        }
+        self.origins = {names[code]: group for code, group in self._split(order, from_codes)}
+        self.destinations = {names[code]: group for code, group in self._split(order, to_codes)}
+        self.empty = self._group(np.empty(0, dtype=np.intp))
+
+        # Orden por latitud de origen, para el prefiltro espacial
+        by_lat = np.argsort(self.coords[:, 0], kind="stable")
+        self.by_origin_lat = by_lat[alive[by_lat]]
+        self.origin_lats = self.coords[self.by_origin_lat, 0]
+
+    def _split(self, order, codes):
+        # Orden estable por código: cada grupo conserva el orden por salida
+        import numpy as np
+
+        order = order[np.argsort(codes[order], kind="stable")]
+        values, starts = np.unique(codes[order], return_index=True)
+        for code, group in zip(values.tolist(), np.split(order, starts[1:])):
+            yield code, self._group(group)
+
+    def _group(self, positions):
+        # (posiciones, horas de salida) ordenadas por salida
+        return positions, self.departures[positions]
+
+
+class _Snapshot:
+    """
+    Columnas de los viajes indexados; una posición por viaje.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.driver_ids: List[str] = []
+        self.from_keys: List[str] = []
+        self.to_keys: List[str] = []
+        self.departures: List[float] = []
+        self.seats: List[int] = []
+        self.prices: List[float] = []
+        # (from_lat, from_lon, to_lat, to_lon) y valoración del conductor
+        self.coords: List[Tuple[float, float, float, float]] = []
+        self.ratings: List[float] = []
+        self.payloads: List[bytes] = []
+        self.alive: List[bool] = []
+        self.position: Dict[str, int] = {}
+        self.by_driver: Dict[str, Set[str]] = {}
+        self.watermark: Optional[str] = None
+        self._view: Optional[_View] = None
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    @property
+    def view(self) -> _View:
+        if self._view is None:
+            self._view = _View(self)
+        return self._view
+
+    @classmethod
+    def build(cls, rows: List[dict]) -> "_Snapshot":
+        """
+        Instantánea completa con sus arrays ya construidos. Se ejecuta en el
+        threadpool: la instantánea no se comparte hasta que termina.
+        """
+        snapshot = cls()
+        for row, payload in _encode_rows(rows):
+            snapshot.upsert(row, payload)
+        snapshot.view
+        return snapshot
+
+    def upsert(self, row: dict, payload: Optional[bytes]) -> None:
+        """
+        Añade o actualiza un viaje con su JSON ya codificado (ver `_encode`);
+        sin JSON, el viaje sale del índice.
+        """
+        ride_id = str(row["id"])
+        if payload is None:
+            self.remove(ride_id)
+            return
+
+        driver_id = str(row["driver_id"])
+        from_key = row.get("from_city_key") or city_index.canonical_key(row.get("from_city"))
+        to_key = row.get("to_city_key") or city_index.canonical_key(row.get("to_city"))
+        departure = _timestamp(row["date_time"])
+        seats = int(row["seats_available"])
+        price = float(row["price"]) if row.get("price") is not None else math.nan
+        coords = (float(row["from_lat"]), float(row["from_lon"]), float(row["to_lat"]), float(row["to_lon"]))
+        rating = (row.get("driver") or {}).get("average_rating")
+        rating = float(rating) if rating is not None else math.nan
+        if row.get("created_at") and (self.watermark is None or row["created_at"] > self.watermark):
+            self.watermark = row["created_at"]
+
+        pos = self.position.get(ride_id)
+        if pos is None:
+            pos = len(self.ids)
+            self.ids.append(ride_id)
+            self.driver_ids.append(driver_id)
+            self.from_keys.append(from_key)
+            self.to_keys.append(to_key)
+            self.departures.append(departure)
+            self.seats.append(seats)
+            self.prices.append(price)
+            self.coords.append(coords)
+            self.ratings.append(rating)
+            self.payloads.append(payload)
+            self.alive.append(True)
+            self.position[ride_id] = pos
+            self.by_driver.setdefault(driver_id, set()).add(ride_id)
+            self._view = None
+            return
+
+        structural = (
+            self.from_keys[pos] != from_key
+            or self.to_keys[pos] != to_key
+            or self.departures[pos] != departure
+            or self.coords[pos] != coords
+        )
+        self.from_keys[pos], self.to_keys[pos] = from_key, to_key
+        self.departures[pos], self.seats[pos], self.prices[pos] = departure, seats, price
+        self.coords[pos], self.ratings[pos] = coords, rating
+        self.payloads[pos] = payload
+        if structural:
+            self._view = None
+        elif self._view is not None:
+            # Reservas y cambios de precio: se actualiza el array en su sitio
+            self._view.seats[pos] = seats
+            self._view.prices[pos] = price
+            self._view.ratings[pos] = rating
+
+    def remove(self, ride_id: str) -> None:
+        pos = self.position.pop(ride_id, None)
+        if pos is None:
+            return
+        self.alive[pos] = False
+        self.by_driver.get(self.driver_ids[pos], set()).discard(ride_id)
+        self._view = None
+
+
+class RideIndex:
+    """
+    Viajes próximos en memoria, con búsqueda por ciudades, fechas, plazas
+    y precio.
+    """
+
+    def __init__(self, enabled: bool = RIDE_INDEX_ENABLED):
+        self.enabled = enabled
+        self._snapshot = _Snapshot()
+        self.ready = False
+        self._dirty: Set[str] = set()
+        self._full_needed = False
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_full = 0.0
+        self._last_delta = 0.0
+        self.loaded_at: Optional[float] = None
+        self.stats = {"hits": 0, "loads": 0, "deltas": 0, "refetched": 0, "errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    # --- Búsqueda ---
+
+    def select(
+        self,
+        from_key: Optional[str] = None,
+        to_key: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        min_seats: int = 1,
+        max_price: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Viajes que cumplen los filtros, ordenados por salida.
+
+        Args:
+            from_key / to_key: Claves canónicas de ciudad (None = cualquiera)
+            since / until: Rango de salida [since, until) en epoch (since
+                por defecto es ahora)
+            min_seats: Mínimo de plazas libres
+            max_price: Precio máximo (los viajes sin precio no coinciden)
+            limit: Máximo de resultados
+
+        Returns:
+            Columnas de los viajes (ver `columns_from_rows`), o None si el
+            índice no está listo
+        """
+        if not self.ready:
+            return None
+
+        snapshot = self._snapshot
+        view = snapshot.view
+        if from_key and to_key:
+            positions, departures = view.pairs.get((from_key, to_key), view.empty)
+        elif from_key:
+            positions, departures = view.origins.get(from_key, view.empty)
+        elif to_key:
+            positions, departures = view.destinations.get(to_key, view.empty)
+        else:
+            positions, departures = view.all
+
+        since = time.time() if since is None else since
+        start = departures.searchsorted(since, side="left")
+        end = departures.searchsorted(until, side="left") if until is not None else len(positions)
+        positions = positions[start:end]
+
+        mask = view.seats[positions] >= min_seats
+        if max_price is not None:
+            mask &= view.prices[positions] <= max_price
+        positions = positions[mask]
+        if limit is not None:
+            positions = positions[:limit]
+
+        self.stats["hits"] += 1
+        return self._columns(snapshot, positions)
+
+    def search(self, *args, **filters) -> Optional[List[bytes]]:
+        """
+        JSON de los viajes que cumplen los filtros de `select`, ordenados
+        por salida (None si el índice no está listo).
+        """
+        columns = self.select(*args, **filters)
+        if columns is None:
+            return None
+        payloads = columns["payloads"]
+        return [payloads[pos] for pos in columns["rows"].tolist()]
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        since: Optional[float] = None,
+        min_seats: int = 1,
+        exclude_driver_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Prefiltro espacial: viajes futuros cuyo origen está en el rectángulo
+        que contiene el círculo de `radius_km` alrededor de (lat, lon).
+
+        Returns:
+            Columnas de los candidatos (ver `columns_from_rows`), o None si
+            el índice no está listo
+        """
+        import numpy as np
+
+        if not self.ready:
+            return None
+
+        snapshot = self._snapshot
+        view = snapshot.view
+        d_lat, d_lon = bounding_box(lat, radius_km)
+        start, end = view.origin_lats.searchsorted([lat - d_lat, lat + d_lat], side="left")
+        positions = view.by_origin_lat[start:end]
+
+        since = time.time() if since is None else since
+        coords = view.coords[positions]
+        # Diferencia de longitud con vuelta en el antimeridiano
+        lon_diff = np.abs((coords[:, 1] - lon + 180) % 360 - 180)
+        mask = (lon_diff <= d_lon) & (view.departures[positions] >= since) & (view.seats[positions] >= min_seats)
+        if exclude_driver_id is not None:
+            own = [snapshot.position[ride_id] for ride_id in snapshot.by_driver.get(exclude_driver_id, ())]
+            mask &= ~np.isin(positions, own)
+        return self._columns(snapshot, positions[mask])
+
+    @staticmethod
+    def _columns(snapshot: _Snapshot, positions) -> dict:
+        view = snapshot.view
+        coords = view.coords[positions]
+        return {
+            "rows": positions,
+            "payloads": snapshot.payloads,
+            "departures": view.departures[positions],
+            "prices": view.prices[positions],
+            "seats": view.seats[positions],
+            "ratings": view.ratings[positions],
+            "from_lat": coords[:, 0],
+            "from_lon": coords[:, 1],
+            "to_lat": coords[:, 2],
+            "to_lon": coords[:, 3],
+        }
+
+    # --- Carga ---
+
+    async def _fetch_pages(self, build_query) -> List[dict]:
+        rows: List[dict] = []
+        offset = 0
+        while True:
+            result = await run_query(build_query().range(offset, offset + LOAD_PAGE_SIZE - 1))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < LOAD_PAGE_SIZE:
+                return rows
+            offset += LOAD_PAGE_SIZE
+
+    async def load(self, db: Client) -> None:
+        """
+        Carga completa de los viajes futuros con plazas libres.
+        """
+        now = datetime.now().isoformat()
+        rows = await self._fetch_pages(
+            lambda: db.table("Ride").select(RIDE_SELECT)
+            .gte("date_time", now).gt("seats_available", 0).order("id")
+        )
+        # Fuera del event loop; las búsquedas siguen con la anterior
+        self._snapshot = await run_in_threadpool(_Snapshot.build, rows)
+        self.ready = True
+        self._full_needed = False
+        self._last_full = self._last_delta = time.monotonic()
+        self.loaded_at = time.time()
+        self.stats["loads"] += 1
+
+    async def load_new(self, db: Client) -> None:
+        """
+        Añade los viajes creados desde la última carga.
+        """
+        snapshot = self._snapshot
+        if snapshot.watermark is None:
+            return
+        now = datetime.now().isoformat()
+        rows = await self._fetch_pages(
+            lambda: db.table("Ride").select(RIDE_SELECT)
+            .gte("created_at", snapshot.watermark).gte("date_time", now).order("id")
+        )
+        for row, payload in await run_in_threadpool(_encode_rows, rows):
+            snapshot.upsert(row, payload)
+        self._last_delta = time.monotonic()
+        self.stats["deltas"] += 1
+
+    async def refetch(self, db: Client) -> None:
+        """
+        Vuelve a leer los viajes marcados por invalidaciones.
+        """
+        ride_ids, self._dirty = list(self._dirty), set()
+        snapshot = self._snapshot
+        try:
+            for start in range(0, len(ride_ids), REFETCH_BATCH_SIZE):
+                batch = ride_ids[start:start + REFETCH_BATCH_SIZE]
+                result = await run_query(db.table("Ride").select(RIDE_SELECT).in_("id", batch))
+                found = set()
+                for row, payload in await run_in_threadpool(_encode_rows, result.data or []):
+                    found.add(str(row["id"]))
+                    snapshot.upsert(row, payload)
+                for ride_id in set(batch) - found:
+                    snapshot.remove(ride_id)
+                self.stats["refetched"] += len(batch)
+        except Exception:
+            # Se reintentan en la siguiente vuelta
+            self._dirty.update(ride_ids)
+            raise
+
+    # --- Eventos ---
+
+    def _on_invalidate(self, tags: Optional[List[str]]) -> None:
+        if tags is None:
+            self._full_needed = True
+        else:
+            for tag in tags:
+                kind, _, value = tag.partition(":")
+                if kind == "ride":
+                    self._dirty.add(value)
+                elif kind == "user":
+                    # El JSON de sus viajes incluye el perfil del conductor
+                    self._dirty.update(self._snapshot.by_driver.get(value, ()))
+        if self._wake is not None and (self._dirty or self._full_needed):
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                db = await run_in_threadpool(get_supabase_client)
+                now = time.monotonic()
+                if not self.ready or self._full_needed or now - self._last_full >= RIDE_INDEX_FULL_REFRESH_SECONDS:
+                    await self.load(db)
+                elif now - self._last_delta >= RIDE_INDEX_REFRESH_SECONDS:
+                    await self.load_new(db)
+                if self._dirty:
+                    await self.refetch(db)
+                # Reconstruye aquí los arrays, no en la siguiente búsqueda
+                self._snapshot.view
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning("No se pudo actualizar el índice de viajes: %s", e)
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=RIDE_INDEX_REFRESH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def start(self) -> None:
+        """
+        Inicia la carga y la actualización en segundo plano (si está activo).
+        """
+        if not self.enabled or self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        entity_cache.on_invalidate(self._on_invalidate)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "rides": len(self._snapshot),
+            "pending_refetch": len(self._dirty),
+            "loaded_at": self.loaded_at,
+        }
+
+
+# Instancia compartida por el worker
+ride_index = RideIndex()
@@ -0,0 +1,216 @@
+"""
+Búsqueda de viajes: ventanas de fechas agrupadas por día y resultados
+paginados con facetas.
+
+En lugar de una petición por día (`GET /api/rides?date=...`), el pasajero
+pide una ventana (`date_from`/`date_to` o `date` ± `flex_days`) y recibe
+en una sola respuesta los viajes agrupados por día, con el número de
+viajes de cada día (también los días sin viajes) para la tira de fechas.
+
+La ventana se resuelve con una sola consulta (o una selección en el índice
+en memoria); el reparto por días es un `searchsorted` sobre las horas de
+salida, ya ordenadas. Los días son días de `APP_TIMEZONE`: la ventana se
+construye con ese huso, de modo que el filtro en la base de datos, la
+selección en el índice y el reparto por días usan los mismos límites.
+
+Las facetas (bandas de precio, franja horaria de salida y plazas libres)
+se cuentan con numpy sobre el mismo conjunto filtrado del que sale la
+página de resultados: no hacen falta consultas extra ni enviar todas las
+filas al cliente. La franja horaria es la hora local de `APP_TIMEZONE`,
+no la del servidor (UTC en Docker).
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Huso horario de los viajes (días de la ventana y franjas de las facetas)
+APP_TIMEZONE = ZoneInfo(os.getenv("APP_TIMEZONE", "America/Caracas"))
+
+# Máximo de días de una ventana
+SEARCH_MAX_DAYS = 14
+
+# Ventana por defecto (desde hoy) si no se indica fecha
+SEARCH_DEFAULT_DAYS = 7
+
+MAX_FLEX_DAYS = 7
+
+# Resultados por página con facetas (por defecto y máximo)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Máximo de viajes leídos de la base de datos para las facetas (sin índice)
+SEARCH_FACET_MAX_ROWS = int(os.getenv("SEARCH_FACET_MAX_ROWS", "5000"))
+
+# Límites de las bandas de precio: [0, 10), [10, 20), [20, 50), [50, ∞)
+FACET_PRICE_BANDS = (10, 20, 50)
+
+# Franjas horarias de salida (hora local de `APP_TIMEZONE`): [inicio, fin)
+FACET_TIME_OF_DAY = (("morning", 5, 12), ("afternoon", 12, 19), ("night", 19, 5))
+
+# Plazas libres: 1, 2, 3 y "4+"
+FACET_MAX_SEATS = 4
+
+
+def _parse_date(value: str) -> datetime:
+    # Medianoche local del día indicado
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=APP_TIMEZONE)
+    except ValueError:
+        raise ValueError("Formato de fecha inválido. Use YYYY-MM-DD")
+
+
+def date_window(
+    date: Optional[str] = None,
+    flex_days: int = 0,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    default_days: Optional[int] = None
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Ventana de salida [inicio, fin) a partir de los parámetros de búsqueda,
+    de medianoche a medianoche en `APP_TIMEZONE`.
+
+    Args:
+        date: Día buscado (YYYY-MM-DD)
+        flex_days: Días de margen antes y después de `date`
+        date_from / date_to: Primer y último día (incluidos); `date_to` por
+            defecto es `date_from`
+        default_days: Sin fecha, ventana de este número de días desde hoy
+            (None = sin ventana)
+
+    Raises:
+        ValueError: Fechas inválidas o ventana de más de `SEARCH_MAX_DAYS`
+    """
+    if date and (date_from or date_to):
+        raise ValueError("Use `date` (con `flex_days`) o `date_from`/`date_to`, no ambos")
+    if flex_days and not date:
+        raise ValueError("`flex_days` requiere `date`")
+    if date_to and not date_from:
+        raise ValueError("`date_to` requiere `date_from`")
+
+    if date:
+        target = _parse_date(date)
+        start, end = target - timedelta(days=flex_days), target + timedelta(days=flex_days + 1)
+    elif date_from:
+        start = _parse_date(date_from)
+        end = (_parse_date(date_to) if date_to else start) + timedelta(days=1)
+        if end <= start:
+            raise ValueError("`date_to` debe ser igual o posterior a `date_from`")
+    elif default_days:
+        start = datetime.now(APP_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=default_days)
+    else:
+        return None
+
+    if end - start > timedelta(days=SEARCH_MAX_DAYS):
+        raise ValueError(f"La ventana de fechas no puede superar {SEARCH_MAX_DAYS} días")
+    return start, end
+
+
+def group_by_day(columns: dict, start: datetime, end: datetime) -> bytes:
+    """
+    Respuesta JSON con los viajes agrupados por día de salida.
+
+    Args:
+        columns: Viajes ordenados por salida (ver `columns_from_rows`)
+        start / end: Ventana [inicio, fin) (ver `date_window`)
+    """
+    import numpy as np
+
+    days = [start + timedelta(days=i) for i in range((end - start).days)]
+    bounds = np.array([day.timestamp() for day in days] + [end.timestamp()])
+    # Viajes ordenados por salida: cada día es un tramo contiguo
+    cuts = np.searchsorted(columns["departures"], bounds, side="left")
+    rows, payloads = columns["rows"].tolist(), columns["payloads"]
+
+    items = []
+    for i, day in enumerate(days):
+        day_rows = rows[cuts[i]:cuts[i + 1]]
+        items.append(
+            json.dumps({"date": day.date().isoformat(), "count": len(day_rows)}, separators=(",", ":")).encode()[:-1]
+            + b',"rides":[' + b",".join(payloads[row] for row in day_rows) + b"]}"
+        )
+
+    header = json.dumps({
+        "date_from": days[0].date().isoformat(),
+        "date_to": days[-1].date().isoformat(),
+        "total": int(cuts[-1] - cuts[0]),
+    }, separators=(",", ":")).encode()[:-1]
+    return header + b',"days":[' + b",".join(items) + b"]}"
+
+
+def _local_hours(departures: "np.ndarray") -> "np.ndarray":
+    # Hora local de cada salida; el desfase se calcula una vez por día (a
+    # mediodía UTC), así que un cambio de horario solo afecta a su día
+    import numpy as np
+
+    days, inverse = np.unique(departures // 86400, return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(day * 86400 + 43200, APP_TIMEZONE).utcoffset().total_seconds()
+        for day in days.tolist()
+    ])
+    return ((departures + offsets[inverse]) % 86400) // 3600
+
+
+def facet_counts(columns: dict) -> dict:
+    """
+    Recuento por banda de precio, franja horaria y plazas libres de los
+    viajes de `columns` (ver `columns_from_rows`). Los viajes sin precio
+    solo cuentan en `price_unknown`.
+    """
+    import numpy as np
+
+    prices, departures, seats = columns["prices"], columns["departures"], columns["seats"]
+
+    known = np.isfinite(prices)
+    bands = np.bincount(
+        np.searchsorted(FACET_PRICE_BANDS, prices[known], side="right"),
+        minlength=len(FACET_PRICE_BANDS) + 1
+    )
+    edges = (0, *FACET_PRICE_BANDS, None)
+
+    hours = _local_hours(departures)
+    time_of_day = {}
+    for name, start, end in FACET_TIME_OF_DAY:
+        in_bucket = (hours >= start) & (hours < end) if start < end else (hours >= start) | (hours < end)
+        time_of_day[name] = int(in_bucket.sum())
+
+    seat_counts = np.bincount(np.clip(seats.astype(np.int64), 0, FACET_MAX_SEATS), minlength=FACET_MAX_SEATS + 1)
+    return {
+        "price": [
+            {"min": edges[i], "max": edges[i + 1], "count": int(count)}
+            for i, count in enumerate(bands.tolist())
+        ],
+        "price_unknown": int((~known).sum()),
+        "time_of_day": time_of_day,
+        "seats": {
+            **{str(n): int(seat_counts[n]) for n in range(1, FACET_MAX_SEATS)},
+            f"{FACET_MAX_SEATS}+": int(seat_counts[FACET_MAX_SEATS]),
+        },
+    }
+
+
+def encode_page(columns: dict, offset: int, limit: int, truncated: bool = False) -> bytes:
+    """
+    Respuesta JSON con una página de resultados, el total y las facetas del
+    conjunto completo.
+
+    Args:
+        truncated: El conjunto se cortó en `SEARCH_FACET_MAX_ROWS` viajes
+            (total y facetas son un mínimo)
+    """
+    rows, payloads = columns["rows"], columns["payloads"]
+    header = json.dumps({
+        "total": len(rows),
+        "truncated": truncated,
+        "offset": offset,
+        "limit": limit,
+        "facets": facet_counts(columns),
+    }, separators=(",", ":")).encode()[:-1]
+    page = rows[offset:offset + limit].tolist()
+    return header + b',"rides":[' + b",".join(payloads[row] for row in page) + b"]}"
@@ -0,0 +1,337 @@
+"""
+Caché de entidades en dos niveles con invalidación por surrogate keys.
+
+- L1: LRU en memoria del proceso, con TTL corto.
+- L2: Redis compartido por todos los workers (si `REDIS_URL` está definido).
+
+Cada entrada se etiqueta con surrogate keys (`ride:<id>`, `user:<id>`).
+Las rutas que modifican datos llaman a `entity_cache.invalidate(...)`,
+que borra las entradas afectadas en L1 y L2 y publica las etiquetas por
+pub/sub para que el resto de workers limpie su L1.
+
+Otras estructuras en memoria (p. ej. el índice de viajes) se suscriben a
+esas invalidaciones con `entity_cache.on_invalidate(...)`.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+CACHE_L1_TTL_SECONDS = float(os.getenv("CACHE_L1_TTL_SECONDS", "30"))
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "2048"))
+CACHE_L2_TTL_SECONDS = int(os.getenv("CACHE_L2_TTL_SECONDS", "300"))
+CACHE_NAMESPACE = os.getenv("CACHE_NAMESPACE", "dale:cache")
+
+
+def _new_node_id() -> str:
+    """
+    Identificador del worker en el canal de invalidación. Incluye el PID:
+    con `preload_app` el módulo se importa en el master antes del fork.
+    """
+    return f"{os.getpid()}-{uuid.uuid4().hex}"
+
+
+def ride_tag(ride_id) -> str:
+    """Surrogate key de un viaje."""
+    return f"ride:{ride_id}"
+
+
+def user_tag(user_id) -> str:
+    """Surrogate key de un usuario."""
+    return f"user:{user_id}"
+
+
+class LRUCache:
+    """
+    Caché LRU en memoria con TTL y etiquetas.
+    """
+
+    def __init__(self, max_entries: int = CACHE_L1_MAX_ENTRIES, ttl: float = CACHE_L1_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retorna el valor cacheado o None si no existe o expiró.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        """
+        Guarda un valor con sus etiquetas, desalojando el menos usado si hace falta.
+        """
+        self.delete(key)
+        tags = tuple(tags)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self.delete(oldest)
+
+    def delete(self, key: str) -> None:
+        """
+        Elimina una entrada y sus referencias en el índice de etiquetas.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Elimina todas las entradas etiquetadas con alguna de las etiquetas.
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self.delete(key)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+
+class SizedLRUCache(LRUCache):
+    """
+    `LRUCache` de valores `bytes`, limitada además por su tamaño total.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = CACHE_L1_MAX_ENTRIES, ttl: float = CACHE_L1_TTL_SECONDS):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        if len(value) > self.max_bytes:
+            # No cabe: tampoco se conserva la copia anterior
+            self.delete(key)
+            return
+        super().set(key, value, tags, ttl)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self.delete(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.size -= len(entry[1])
+        super().delete(key)
+
+    def clear(self) -> None:
+        super().clear()
+        self.size = 0
+
+
+class EntityCache:
+    """
+    Caché L1 (proceso) + L2 (Redis) con invalidación entre workers.
+
+    Los fallos de Redis nunca rompen un request: se registran y la caché
+    sigue funcionando solo con L1.
+    """
+
+    def __init__(
+        self,
+        l1: Optional[LRUCache] = None,
+        l2_ttl: int = CACHE_L2_TTL_SECONDS,
+        namespace: str = CACHE_NAMESPACE
+    ):
+        self.l1 = l1 or LRUCache()
+        self.l2_ttl = l2_ttl
+        self.namespace = namespace
+        self.channel = f"{namespace}:invalidate"
+        self.node_id = _new_node_id()
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribers: List[Callable[[Optional[List[str]]], None]] = []
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.namespace}:tag:{tag}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Busca un valor en L1 y luego en L2. Retorna None si no está.
+        """
+        value = self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+
+        redis = self.redis
+        if redis is not None:
+            try:
+                raw = await redis.get(self._key(key))
+                if raw is not None:
+                    entry = json.loads(raw)
+                    self.l1.set(key, entry["value"], entry["tags"])
+                    self.stats["l2_hits"] += 1
+                    return entry["value"]
+            except Exception as e:
+                logger.warning("Error leyendo caché L2 (%s): %s", key, e)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        """
+        Guarda un valor JSON-serializable en L1 y L2 con sus etiquetas.
+        """
+        tags = list(tags)
+        self.l1.set(key, value, tags)
+
+        redis = self.redis
+        if redis is None:
+            return
+
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(self._key(key), json.dumps({"value": value, "tags": tags}), ex=self.l2_ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                pipe.expire(self._tag_key(tag), self.l2_ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning("Error escribiendo caché L2 (%s): %s", key, e)
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        Invalida todas las entradas con las etiquetas dadas en todos los workers.
+        """
+        tags = [t for t in tags if t]
+        if not tags:
+            return
+
+        self.stats["invalidations"] += 1
+        self.l1.invalidate_tags(tags)
+        self._notify(tags)
+
+        redis = self.redis
+        if redis is None:
+            return
+
+        try:
+            tag_keys = [self._tag_key(t) for t in tags]
+            members = set()
+            for tag_key in tag_keys:
+                members.update(await redis.smembers(tag_key))
+            keys = [self._key(m.decode() if isinstance(m, bytes) else m) for m in members]
+            await redis.delete(*keys, *tag_keys)
+            await redis.publish(self.channel, json.dumps({"node": self.node_id, "tags": tags}))
+        except Exception as e:
+            logger.warning("Error invalidando caché L2 (%s): %s", tags, e)
+
+    def clear(self) -> None:
+        """
+        Vacía la caché local (L1).
+        """
+        self.l1.clear()
+
+    def on_invalidate(self, callback: Callable[[Optional[List[str]]], None]) -> None:
+        """
+        Registra una función que recibe las etiquetas invalidadas en este
+        worker o en otro (vía pub/sub). Recibe None si se pudieron perder
+        invalidaciones y hay que descartarlo todo.
+        """
+        self._subscribers.append(callback)
+
+    def _notify(self, tags: Optional[List[str]]) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(tags)
+            except Exception as e:
+                logger.warning("Error notificando invalidación (%s): %s", tags, e)
+
+    async def start(self) -> None:
+        """
+        Inicia el listener de invalidaciones de otros workers (si hay Redis).
+        Se llama en cada worker, ya después del fork: el `node_id` se genera
+        aquí para que no lo compartan todos los workers.
+        """
+        if self.redis is not None and self._listener is None:
+            self.node_id = _new_node_id()
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Detiene el listener de invalidaciones.
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        """
+        Escucha el canal de invalidación y limpia L1; se reconecta si falla.
+        """
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                while True:
+                    # Timeout explícito: no depende del socket_timeout del cliente
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("node") != self.node_id:
+                        self.l1.invalidate_tags(payload.get("tags", []))
+                        self._notify(payload.get("tags", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Listener de invalidación de caché desconectado: %s", e)
+                # Lo que llegó mientras estábamos desconectados se perdió
+                self.l1.clear()
+                self._notify(None)
+                await asyncio.sleep(1)
+
+
+# Instancia compartida por todas las rutas del worker
+entity_cache = EntityCache()
@@ -1,12 +1,23 @@
 """
 Utilidades para interactuar con la base de datos Supabase.
 """
+import asyncio
 import os
-from supabase import create_client, Client
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Type
+from app.utils.resilience import DB_CLIENT_TIMEOUT_SECONDS, DB_TIMEOUT_SECONDS, DatabaseUnavailable, db_breaker
+from app.utils.cancellation import stats as cancellation_stats
+from app.utils.profiling import wrap_thread
+
+if TYPE_CHECKING:
+    from supabase import Client
+else:
+    # `supabase` (y httpx/gotrue) tarda en importarse: se importa al crear
+    # el cliente. Las rutas solo usan `Client` para anotar `Depends(get_db)`.
+    Client = Any
 
 # Cliente Supabase singleton
-_supabase_client: Optional[Client] = None
+_supabase_client: Optional["Client"] = None
 
 
 def get_supabase_client() -> Client:
@@ -27,11 +38,28 @@ def get_supabase_client() -> Client:
                 "Faltan variables de entorno: SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY"
             )
         
-        _supabase_client = create_client(supabase_url, supabase_key)
+        from supabase import ClientOptions, create_client
+        # Timeout HTTP de PostgREST (120 s por defecto): `run_query` deja de
+        # esperar al agotar su deadline, pero el hilo sigue ocupado hasta que
+        # termina la llamada
+        _supabase_client = create_client(
+            supabase_url,
+            supabase_key,
+            options=ClientOptions(postgrest_client_timeout=DB_CLIENT_TIMEOUT_SECONDS)
+        )
     
     return _supabase_client
 
 
+def _connection_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    Errores de red del cliente HTTP de Supabase (httpx ya está importado
+    cuando hay un cliente).
+    """
+    import httpx
+    return (httpx.TransportError, ConnectionError)
+
+
 async def get_db():
     """
     Dependency para obtener el cliente de base de datos.
@@ -42,3 +70,54 @@ async def get_db():
             return db.table("User").select("*").execute()
     """
     return get_supabase_client()
+
+
+async def run_query(query, timeout: Optional[float] = None) -> Any:
+    """
+    Ejecuta una consulta de Supabase en el threadpool, con deadline y
+    circuit breaker.
+    
+    El cliente de Supabase es síncrono: llamar a `execute()` directamente
+    desde un handler async bloquea el event loop durante todo el viaje de
+    ida y vuelta a PostgREST.
+    
+    Args:
+        query: Consulta construida con el cliente (sin `.execute()`)
+        timeout: Deadline en segundos (por defecto `DB_TIMEOUT_SECONDS`)
+    
+    Raises:
+        DatabaseUnavailable: Si el circuito está abierto, se agota el
+            deadline o falla la conexión con Supabase
+    
+    Usage:
+        response = await run_query(db.table("Ride").select("*").eq("id", ride_id))
+    """
+    if not db_breaker.allow():
+        raise DatabaseUnavailable(
+            "Base de datos no disponible temporalmente",
+            retry_after=db_breaker.retry_after()
+        )
+    
+    try:
+        result = await asyncio.wait_for(
+            run_in_threadpool(wrap_thread(query.execute)),
+            timeout or DB_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        db_breaker.record_failure()
+        raise DatabaseUnavailable("La base de datos no respondió a tiempo")
+    except _connection_errors() as e:
+        db_breaker.record_failure()
+        raise DatabaseUnavailable(f"Error de conexión con la base de datos: {str(e)}")
+    except asyncio.CancelledError:
+        # El request se canceló (p. ej. el cliente se desconectó)
+        db_breaker.release_trial()
+        cancellation_stats["cancelled_queries"] += 1
+        raise
+    except Exception:
+        # Errores de la consulta (p. ej. APIError de PostgREST): la base responde
+        db_breaker.record_success()
+        raise
+    
+    db_breaker.record_success()
+    return result
@@ -0,0 +1,190 @@
+"""
+Cargadores de entidades por request (DataLoader / identity map).
+
+Evita que un mismo handler vuelva a consultar el mismo `User` o `Ride`
+varias veces dentro de un request: las búsquedas por ID se deduplican,
+se agrupan en una sola consulta `in_` y el resultado se reutiliza tanto
+en el handler como en las tareas de notificación en segundo plano.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional
+from uuid import UUID
+from fastapi import Depends, HTTPException
+from app.utils.database import Client, get_db, run_query
+
+# Máximo de IDs aceptados en una búsqueda múltiple (GET ?ids=...)
+MAX_BATCH_IDS = 100
+
+
+def parse_ids(raw_ids: str, max_ids: int = MAX_BATCH_IDS) -> List[str]:
+    """
+    Convierte una lista de UUIDs separados por coma en una lista sin duplicados.
+
+    Raises:
+        HTTPException: Si algún ID no es un UUID válido o se supera el máximo
+    """
+    ids = list(dict.fromkeys(part.strip() for part in raw_ids.split(",") if part.strip()))
+
+    if not ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un ID")
+
+    if len(ids) > max_ids:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten como máximo {max_ids} IDs por consulta"
+        )
+
+    try:
+        return [str(UUID(i)) for i in ids]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de ID inválido")
+
+
+class DataLoader:
+    """
+    Carga filas de una tabla por ID agrupando las peticiones.
+
+    Todas las llamadas a `load()` hechas antes de que el event loop vuelva
+    a ceder el control se resuelven con una única consulta
+    `select(...).in_(key, [...])`. Los resultados (incluidos los IDs que no
+    existen) quedan en un identity map que vive lo mismo que el request.
+    """
+
+    def __init__(
+        self,
+        db: Client,
+        table: str,
+        columns: str = "*",
+        key: str = "id",
+        on_load: Optional[Callable[[dict], None]] = None
+    ):
+        """
+        Args:
+            db: Cliente de Supabase
+            table: Nombre de la tabla
+            columns: Columnas (y relaciones embebidas) a seleccionar
+            key: Columna por la que se busca
+            on_load: Callback opcional ejecutado por cada fila cargada
+        """
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self._on_load = on_load
+        self._cache: Dict[str, Optional[dict]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self.queries = 0
+
+    async def load(self, key) -> Optional[dict]:
+        """
+        Obtiene una fila por ID. Retorna None si no existe.
+        """
+        key = str(key)
+        if key in self._cache:
+            return self._cache[key]
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if self._dispatch_task is None:
+                self._dispatch_task = loop.create_task(self._dispatch())
+
+        return await future
+
+    async def load_many(self, keys: Iterable) -> Dict[str, Optional[dict]]:
+        """
+        Obtiene varias filas por ID con una sola consulta.
+
+        Returns:
+            Diccionario ID -> fila (None para los IDs inexistentes)
+        """
+        unique_keys = list(dict.fromkeys(str(k) for k in keys))
+        rows = await asyncio.gather(*(self.load(k) for k in unique_keys))
+        return dict(zip(unique_keys, rows))
+
+    def prime(self, row: dict) -> None:
+        """
+        Registra (o reemplaza) una fila ya conocida en el identity map.
+        """
+        self._cache[str(row[self.key])] = row
+        if self._on_load:
+            self._on_load(row)
+
+    def clear(self, key) -> None:
+        """
+        Olvida una fila, p. ej. después de modificarla.
+        """
+        self._cache.pop(str(key), None)
+
+    async def _dispatch(self) -> None:
+        """
+        Resuelve en lote todas las claves pendientes.
+        """
+        pending, self._pending = self._pending, {}
+        self._dispatch_task = None
+
+        try:
+            self.queries += 1
+            response = await run_query(
+                self.db.table(self.table).select(self.columns).in_(self.key, list(pending))
+            )
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # Cancelada (p. ej. al cerrar el loop): quienes esperan en
+            # `load()` no pueden quedarse colgados
+            for future in pending.values():
+                future.cancel()
+            raise
+
+        found = {str(row[self.key]): row for row in response.data or []}
+        for key, future in pending.items():
+            row = found.get(key)
+            if row is not None:
+                self.prime(row)
+            else:
+                self._cache[key] = None
+            if not future.done():
+                future.set_result(row)
+
+
+class RequestLoaders:
+    """
+    Conjunto de loaders compartidos por todo un request.
+
+    Los viajes se cargan junto con su conductor, que se registra también
+    en el loader de usuarios para no volver a consultarlo.
+    """
+
+    def __init__(self, db: Client):
+        self.db = db
+        self.users = DataLoader(db, "User")
+        self.rides = DataLoader(
+            db, "Ride", "*, driver:User(*)", on_load=self._prime_driver
+        )
+
+    def _prime_driver(self, ride: dict) -> None:
+        driver = ride.get("driver")
+        if driver:
+            self.users.prime(driver)
+
+
+async def get_loaders(db: Client = Depends(get_db)) -> RequestLoaders:
+    """
+    Dependency que crea los loaders del request.
+
+    FastAPI cachea las dependencias por request, por lo que todas las
+    dependencias y el handler reciben la misma instancia.
+
+    Usage:
+        @app.get("/rides/{ride_id}")
+        async def get_ride(ride_id: str, loaders: RequestLoaders = Depends(get_loaders)):
+            return await loaders.rides.load(ride_id)
+    """
+    return RequestLoaders(db)
@@ -0,0 +1,41 @@
+"""
+Enganche del profiler por request (`ProfilerMiddleware`) con el threadpool.
+
+El middleware muestrea el hilo del event loop, pero las consultas a
+PostgREST se ejecutan en hilos del threadpool. Mientras se perfila un
+request, el middleware publica en `profiled_threads` el conjunto de hilos
+a muestrear y `wrap_thread` registra en él el hilo que ejecuta cada
+consulta. Sin perfil activo no hace nada.
+"""
+import contextvars
+import threading
+from typing import Callable, Optional, Set, TypeVar
+
+T = TypeVar("T")
+
+# Hilos del threadpool que trabajan para el request perfilado (se hereda en
+# las tareas hijas); None si el request no se está perfilando
+profiled_threads: contextvars.ContextVar[Optional[Set[int]]] = contextvars.ContextVar(
+    "dale_profiled_threads", default=None
+)
+
+
+def wrap_thread(fn: Callable[[], T]) -> Callable[[], T]:
+    """
+    Envuelve una función que se ejecutará en el threadpool para que su hilo
+    se muestree si el request actual se está perfilando. Sin perfil activo
+    devuelve `fn` tal cual.
+    """
+    threads = profiled_threads.get()
+    if threads is None:
+        return fn
+
+    def tracked():
+        thread_id = threading.get_ident()
+        threads.add(thread_id)
+        try:
+            return fn()
+        finally:
+            threads.discard(thread_id)
+
+    return tracked
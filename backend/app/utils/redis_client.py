@@ -0,0 +1,50 @@
+"""
+Cliente Redis compartido (opcional).
+
+Redis solo se usa si `REDIS_URL` está definido y el paquete `redis` está
+instalado; en caso contrario las funcionalidades que dependen de él
+(caché L2, invalidación entre workers) funcionan solo en memoria.
+"""
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Cliente Redis singleton
+_redis_client = None
+_redis_initialized = False
+
+
+def get_redis() -> Optional["redis.asyncio.Redis"]:
+    """
+    Obtiene el cliente Redis asíncrono (singleton).
+
+    Returns:
+        Cliente Redis, o None si Redis no está configurado
+    """
+    global _redis_client, _redis_initialized
+
+    if not _redis_initialized:
+        _redis_initialized = True
+        redis_url = os.getenv("REDIS_URL")
+        if not redis_url:
+            return None
+
+        # Importación diferida: sin REDIS_URL no se paga el coste de `redis`
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:  # pragma: no cover - depende del entorno
+            aioredis = None
+
+        if aioredis is None:
+            logger.warning("REDIS_URL configurado pero el paquete 'redis' no está instalado")
+        else:
+            _redis_client = aioredis.from_url(
+                redis_url,
+                password=os.getenv("REDIS_PASSWORD") or None,
+                socket_timeout=float(os.getenv("REDIS_TIMEOUT_SECONDS", "0.5")),
+                socket_connect_timeout=float(os.getenv("REDIS_TIMEOUT_SECONDS", "0.5")),
+            )
+
+    return _redis_client
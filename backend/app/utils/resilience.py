@@ -0,0 +1,179 @@
+"""
+Utilidades de resiliencia frente a una base de datos degradada.
+
+- `CircuitBreaker`: deja de enviar consultas a Supabase tras varios fallos
+  seguidos y vuelve a probar pasado un tiempo.
+- `DatabaseUnavailable`: error 503 que las rutas propagan tal cual.
+- `with_stale_fallback`: sirve la última respuesta buena conocida (marcada
+  como obsoleta) cuando la base de datos no está disponible. Las copias se
+  guardan codificadas en JSON, con un límite de tamaño total, y se
+  descartan con las invalidaciones de la caché de entidades (un viaje
+  borrado o modificado no se vuelve a servir).
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from fastapi import HTTPException, Response
+from pydantic_core import to_json
+from app.utils.cache import SizedLRUCache, entity_cache
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+DB_TIMEOUT_SECONDS = float(os.getenv("DB_TIMEOUT_SECONDS", "5"))
+DB_CLIENT_TIMEOUT_SECONDS = float(os.getenv("DB_CLIENT_TIMEOUT_SECONDS", str(DB_TIMEOUT_SECONDS + 1)))
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+DB_BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", "15"))
+STALE_TTL_SECONDS = float(os.getenv("STALE_TTL_SECONDS", "3600"))
+STALE_MAX_ENTRIES = int(os.getenv("STALE_MAX_ENTRIES", "4096"))
+STALE_MAX_BYTES = int(os.getenv("STALE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class DatabaseUnavailable(HTTPException):
+    """
+    La base de datos no respondió a tiempo o el circuito está abierto.
+    """
+
+    def __init__(self, detail: str = "Base de datos no disponible", retry_after: float = DB_BREAKER_RESET_SECONDS):
+        super().__init__(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(max(1, int(retry_after)))}
+        )
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: closed -> open -> half-open -> closed.
+
+    En estado `open` rechaza las llamadas sin intentarlas; pasado
+    `reset_timeout` deja pasar una llamada de prueba (`half_open`) y
+    según su resultado vuelve a `closed` o a `open`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DB_BREAKER_FAILURES,
+        reset_timeout: float = DB_BREAKER_RESET_SECONDS
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """
+        Indica si se puede intentar una llamada.
+        """
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial_in_flight = False
+
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuito de base de datos cerrado")
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """
+        Libera la llamada de prueba sin resultado (p. ej. si se canceló).
+        """
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuito de base de datos abierto tras %d fallos", self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+# Breaker compartido por todas las consultas del worker
+db_breaker = CircuitBreaker()
+
+# Última respuesta buena conocida de las lecturas con fallback (JSON)
+last_good = SizedLRUCache(max_bytes=STALE_MAX_BYTES, max_entries=STALE_MAX_ENTRIES, ttl=STALE_TTL_SECONDS)
+
+
+def _evict_stale(tags: Optional[List[str]]) -> None:
+    # Sin etiquetas se pudieron perder invalidaciones: se descarta todo
+    if tags is None:
+        last_good.clear()
+    else:
+        last_good.invalidate_tags(tags)
+
+
+entity_cache.on_invalidate(_evict_stale)
+
+
+def mark_stale(response: Response) -> None:
+    """
+    Marca una respuesta servida desde la última copia buena conocida.
+    """
+    response.headers["Warning"] = '110 - "Response is Stale"'
+    response.headers["X-Cache-Status"] = "STALE"
+    response.headers["Cache-Control"] = "no-cache"
+
+
+async def with_stale_fallback(
+    key: str,
+    fetch: Callable[[], Awaitable[Any]],
+    response: Optional[Response] = None,
+    tags: Optional[Callable[[Any], Iterable[str]]] = None
+) -> Any:
+    """
+    Ejecuta una lectura y guarda su resultado; si la base de datos no está
+    disponible, devuelve el último resultado bueno para la misma clave.
+
+    Args:
+        key: Clave de la lectura
+        fetch: Lectura a ejecutar
+        response: Respuesta a marcar como obsoleta
+        tags: Surrogate keys del resultado (p. ej. `ride:<id>` de cada
+            viaje); invalidarlas descarta la copia
+
+    Returns:
+        El resultado de `fetch` o, si se usa la copia, su JSON decodificado
+        (dicts y listas en lugar de modelos)
+
+    Raises:
+        DatabaseUnavailable: Si falla y no hay copia previa
+    """
+    try:
+        result = await fetch()
+    except DatabaseUnavailable:
+        stale = last_good.get(key)
+        if stale is None:
+            raise
+        logger.warning("Sirviendo respuesta obsoleta para %s", key)
+        if response is not None:
+            mark_stale(response)
+        return json.loads(stale)
+
+    last_good.set(key, to_json(result), tags(result) if tags is not None else (key,))
+    return result
@@ -0,0 +1,88 @@
+"""
+Coalescencia de lecturas idénticas concurrentes (single-flight).
+
+Cuando varios requests piden exactamente lo mismo al mismo tiempo (misma
+ruta, mismos parámetros normalizados y mismo alcance de autenticación),
+solo el primero consulta a Supabase; el resto espera y recibe el mismo
+resultado. Funciona por worker: no hay coordinación entre procesos.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def flight_key(route: str, params: Dict[str, Any], scope: Optional[str] = None) -> Tuple:
+    """
+    Construye la clave de coalescencia de una lectura.
+
+    Los parámetros en None se ignoran y los textos se normalizan
+    (espacios y mayúsculas), de modo que `?from_city=Caracas` y
+    `?from_city=caracas ` comparten la misma consulta.
+
+    Args:
+        route: Nombre de la ruta o endpoint
+        params: Parámetros de la consulta
+        scope: Alcance de autenticación (ID de usuario o None si es pública)
+    """
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split()).casefold()
+        normalized.append((name, value))
+    return (route, tuple(normalized), scope or "public")
+
+
+class SingleFlight:
+    """
+    Comparte una única llamada en curso entre todos los que piden la misma clave.
+
+    La llamada se ejecuta en su propia tarea: si uno de los que esperan se
+    cancela (p. ej. el cliente se desconecta) los demás no se ven afectados.
+    Solo si se cancelan todos, la llamada en curso también se cancela.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta `fn()` o se une a una ejecución en curso con la misma clave.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["calls"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.stats["shared"] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(task) == 1:
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+# Instancia compartida por las rutas del worker
+flights = SingleFlight()
@@ -0,0 +1,100 @@
+"""
+Modo de arranque rápido (serverless) y métricas de arranque.
+
+En Vercel y otros entornos serverless cada cold start paga la importación
+de la app antes de atender el primer request. Con `FAST_STARTUP=true`
+(activo por defecto si `VERCEL` está definido):
+
+- No se carga `.env` (la plataforma inyecta las variables).
+- No se hace warm-up en `lifespan`: el cliente de Supabase, Redis y el
+  k-d tree de ciudades se crean en el primer request que los usa.
+
+En modo normal (servidor de larga duración) `lifespan` calienta esas
+conexiones y el esquema OpenAPI para que el primer request no pague el coste.
+
+Este módulo solo usa la librería estándar: se importa antes que todo lo demás.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+FAST_STARTUP = os.getenv(
+    "FAST_STARTUP", "true" if os.getenv("VERCEL") else "false"
+).lower() == "true"
+
+# Momento en que empezó la importación de la app
+IMPORT_STARTED = time.perf_counter()
+
+# Duración (segundos) de cada fase de importación y de warm-up
+import_phases: Dict[str, float] = {}
+warmup_phases: Dict[str, float] = {}
+
+
+@contextmanager
+def phase(name: str, timings: Dict[str, float] = import_phases):
+    """
+    Mide la duración de un bloque y la guarda en `timings[name]`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 4)
+
+
+def finish_import() -> None:
+    """
+    Registra el tiempo total de importación de `app.main`.
+    """
+    import_phases["total"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+
+
+async def warm_up(app) -> None:
+    """
+    Crea las conexiones y estructuras que de otro modo se construirían en
+    el primer request. No hace nada en modo `FAST_STARTUP`.
+
+    Los fallos se registran pero no impiden arrancar.
+    """
+    if FAST_STARTUP:
+        return
+
+    from fastapi.concurrency import run_in_threadpool
+    from app.utils.database import get_supabase_client
+    from app.utils.redis_client import get_redis
+
+    with phase("supabase_client", warmup_phases):
+        try:
+            # Importa supabase/httpx y crea el cliente (y su pool HTTP)
+            await run_in_threadpool(get_supabase_client)
+        except Exception as e:
+            logger.warning("No se pudo crear el cliente de Supabase en el arranque: %s", e)
+
+    redis = get_redis()
+    if redis is not None:
+        with phase("redis", warmup_phases):
+            try:
+                await redis.ping()
+            except Exception as e:
+                logger.warning("Redis no disponible en el arranque: %s", e)
+
+    with phase("city_locator", warmup_phases):
+        # Importa numpy y construye el k-d tree del nomenclátor
+        from app.services.cities import city_index
+        city_index.locator.tree
+
+    if app.openapi_url:
+        with phase("openapi_schema", warmup_phases):
+            app.openapi()
+
+
+def snapshot() -> dict:
+    return {
+        "mode": "fast" if FAST_STARTUP else "warm",
+        "import_seconds": dict(import_phases),
+        "warmup_seconds": dict(warmup_phases),
+    }
@@ -0,0 +1,132 @@
+"""
+Respuestas JSON en streaming para listas grandes.
+
+Las rutas de lista cargan todas las filas, las convierten a modelos
+Pydantic y serializan la lista completa de una vez: el pico de memoria
+crece con el número de filas y el primer byte no sale hasta el final.
+
+`stream_json_list` lee la consulta por páginas y codifica cada página en
+cuanto llega, de modo que solo una página de filas y modelos vive a la vez
+y el cliente recibe la primera página tras la primera consulta. El JSON
+resultante es el mismo documento que la respuesta normal, aunque no
+necesariamente byte a byte.
+
+Las páginas se piden por keyset (`(columna de orden, id)` mayor que la
+última fila enviada) y no por offset: las listas filtran por datos vivos
+(plazas libres, viajes futuros) y, si una reserva saca una fila de la
+lista a mitad del stream, un offset saltaría la fila siguiente.
+
+La primera página se consulta antes de empezar a responder: si falla, la
+ruta todavía puede devolver su error (503, 500...). Un fallo en una
+página posterior corta la conexión (el status ya se envió) y el cliente
+recibe un JSON incompleto.
+
+Las respuestas en streaming no llevan ETag (ver `HTTPCacheMiddleware`).
+Si el cliente se desconecta, Starlette cancela el generador.
+"""
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, List, Optional, Type
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.utils.database import run_query
+
+logger = logging.getLogger(__name__)
+
+# Filas por consulta a PostgREST (y por fragmento de la respuesta)
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "500"))
+
+# Contadores expuestos en /metrics
+stats = {
+    "responses": 0,
+    "pages": 0,
+    "rows": 0,
+    "aborted": 0,
+}
+
+
+def encode_rows(rows: List[dict], model: Type[BaseModel]) -> bytes:
+    """
+    Valida y codifica filas como elementos de un array JSON (sin corchetes),
+    con el mismo modelo que el `response_model` de la ruta.
+    """
+    return b",".join(model(**row).model_dump_json().encode() for row in rows)
+
+
+def _quote(value: Any) -> str:
+    # Valor entre comillas para los filtros lógicos de PostgREST
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def after_row(query, order_by: str, desc: bool, row: dict):
+    """
+    Filtra las filas posteriores a `row` en el orden `(order_by, id)`.
+    """
+    value, row_id = _quote(row[order_by]), _quote(row["id"])
+    op = "lt" if desc else "gt"
+    return query.or_(f"{order_by}.{op}.{value},and({order_by}.eq.{value},id.gt.{row_id})")
+
+
+async def stream_json_list(
+    build_query: Callable[[], Any],
+    model: Type[BaseModel],
+    order_by: str,
+    desc: bool = False,
+    page_size: Optional[int] = None
+) -> StreamingResponse:
+    """
+    Responde un array JSON leyendo la consulta página a página.
+
+    Args:
+        build_query: Crea la consulta ya filtrada y ordenada por `order_by`,
+            sin límite. Se llama una vez por página: los builders de
+            PostgREST acumulan parámetros y no se pueden reutilizar.
+        model: Modelo Pydantic de cada elemento
+        order_by / desc: Columna y sentido del orden de `build_query` (el
+            cursor de las páginas; `id` desempata)
+        page_size: Filas por página (por defecto `STREAM_PAGE_SIZE`)
+
+    Usage:
+        return await stream_json_list(
+            lambda: db.table("Ride").select("*").order("date_time"),
+            RideResponse,
+            order_by="date_time"
+        )
+    """
+    page_size = page_size or STREAM_PAGE_SIZE
+
+    async def fetch_page(last: Optional[dict]) -> List[dict]:
+        # `id` como desempate: el orden debe ser total para paginar sin
+        # saltar ni repetir filas
+        query = build_query()
+        if last is not None:
+            query = after_row(query, order_by, desc, last)
+        result = await run_query(query.order("id").limit(page_size))
+        return result.data or []
+
+    first_page = await fetch_page(None)
+    # Se valida antes de enviar el status: un error aquí sigue siendo un 500
+    first_chunk = encode_rows(first_page, model)
+    stats["responses"] += 1
+
+    async def body() -> AsyncIterator[bytes]:
+        page, chunk, sent = first_page, first_chunk, 0
+        try:
+            yield b"[" + chunk
+            while True:
+                stats["pages"] += 1
+                stats["rows"] += len(page)
+                sent += len(page)
+                if len(page) < page_size:
+                    break
+                page = await fetch_page(page[-1])
+                if not page:
+                    break
+                yield b"," + encode_rows(page, model)
+            yield b"]"
+        except Exception:
+            stats["aborted"] += 1
+            logger.exception("Error a mitad de una respuesta en streaming (%d filas enviadas)", sent)
+            raise
+
+    return StreamingResponse(body(), media_type="application/json")
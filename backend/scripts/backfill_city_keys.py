@@ -0,0 +1,82 @@
+"""
+Recalcula las claves de ciudad (`from_city_key` / `to_city_key`) de los
+viajes existentes con la misma resolución que `create_ride`.
+
+La migración `20261019_add_ride_city_keys.sql` rellena las claves con una
+aproximación en SQL (minúsculas y sin acentos); este script además
+resuelve alias, abreviaturas y estados contra el nomenclátor ("Pto. La
+Cruz" = "Puerto La Cruz") y asigna la ciudad más cercana a las
+coordenadas (k-d tree, en lote por página) cuando el nombre escrito no
+corresponde a ellas.
+
+Uso:
+    python scripts/backfill_city_keys.py [--dry-run] [--page-size 1000]
+"""
+import argparse
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.services.cities import city_index  # noqa: E402
+from app.utils.database import get_supabase_client  # noqa: E402
+
+# IDs por UPDATE (longitud razonable de la URL de PostgREST)
+UPDATE_BATCH_SIZE = 200
+
+
+def compute_updates(rows):
+    """
+    Agrupa los viajes cuyas claves cambian por el par de claves nuevo.
+
+    Returns:
+        {(from_city_key, to_city_key): [ride_id, ...]}
+    """
+    updates = defaultdict(list)
+    for row, keys in zip(rows, city_index.ride_keys(rows)):
+        if keys != (row.get("from_city_key"), row.get("to_city_key")):
+            updates[keys].append(row["id"])
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar los cambios")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = get_supabase_client()
+    offset, scanned, changed = 0, 0, 0
+    while True:
+        rows = db.table("Ride").select(
+            "id, from_city, from_lat, from_lon, to_city, to_lat, to_lon, from_city_key, to_city_key"
+        ).order("id").range(offset, offset + args.page_size - 1).execute().data or []
+        scanned += len(rows)
+
+        for (from_key, to_key), ids in compute_updates(rows).items():
+            changed += len(ids)
+            print(f"  {len(ids):>5} viajes -> {from_key} / {to_key}")
+            if args.dry_run:
+                continue
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                db.table("Ride").update({
+                    "from_city_key": from_key,
+                    "to_city_key": to_key,
+                }).in_("id", ids[start:start + UPDATE_BATCH_SIZE]).execute()
+
+        if len(rows) < args.page_size:
+            break
+        offset += args.page_size
+
+    action = "por actualizar" if args.dry_run else "actualizados"
+    print(f"✅ {scanned} viajes revisados, {changed} {action}")
+
+
+if __name__ == "__main__":
+    main()
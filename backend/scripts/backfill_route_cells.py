@@ -0,0 +1,56 @@
+"""
+Calcula las celdas de corredor (`route_cells`) de los viajes que no las
+tienen, con el círculo máximo entre origen y destino (como `create_ride`
+cuando el conductor no envía ruta).
+
+Uso:
+    python scripts/backfill_route_cells.py [--dry-run] [--page-size 1000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.services.corridors import route_cells  # noqa: E402
+from app.utils.database import get_supabase_client  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar los cambios")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = get_supabase_client()
+    last_id, changed = None, 0
+    while True:
+        # Paginación por cursor: las filas actualizadas salen del filtro
+        query = db.table("Ride").select(
+            "id, from_lat, from_lon, to_lat, to_lon"
+        ).is_("route_cells", "null").order("id").limit(args.page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+
+        for row in rows:
+            cells = route_cells(row)
+            changed += 1
+            if not args.dry_run:
+                db.table("Ride").update({"route_cells": cells}).eq("id", row["id"]).execute()
+
+        if len(rows) < args.page_size:
+            break
+        last_id = rows[-1]["id"]
+
+    action = "por actualizar" if args.dry_run else "actualizados"
+    print(f"✅ {changed} viajes {action}")
+
+
+if __name__ == "__main__":
+    main()
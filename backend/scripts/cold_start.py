@@ -0,0 +1,105 @@
+"""
+Mide el tiempo de cold start hasta la primera respuesta de la API.
+
+Lanza un proceso nuevo por medición que importa `app.main`, ejecuta el
+`lifespan` y atiende un `GET /health` directamente por ASGI (sin servidor
+ni red). Compara el modo normal con `FAST_STARTUP=true`.
+
+Uso:
+    python scripts/cold_start.py [--runs 5] [--path /health]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Código del proceso hijo: imprime los tiempos en JSON
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+from app.main import app
+from app.utils import startup
+imported = time.perf_counter()
+
+async def first_request(path):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        await app(scope, receive, send)
+        done = time.perf_counter()
+    return sent[0]["status"], ready, done
+
+status, ready, done = asyncio.run(first_request(sys.argv[1]))
+print(json.dumps({
+    "status": status,
+    "import": imported - started,
+    "lifespan": ready - imported,
+    "first_request": done - ready,
+    "total": done - started,
+    "phases": startup.snapshot(),
+}))
+"""
+
+
+def measure(fast: bool, path: str) -> dict:
+    env = {
+        **os.environ,
+        "FAST_STARTUP": "true" if fast else "false",
+        "RATE_LIMIT_ENABLED": "false",
+        # Valores ficticios: crear el cliente no abre conexiones
+        "SUPABASE_URL": os.getenv("SUPABASE_URL", "https://example.supabase.co"),
+        "SUPABASE_SERVICE_ROLE_KEY": os.getenv("SUPABASE_SERVICE_ROLE_KEY", "cold-start"),
+        "SUPABASE_JWT_SECRET": os.getenv("SUPABASE_JWT_SECRET", "cold-start"),
+    }
+    spawned = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, path],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Incluye el arranque del intérprete y la salida del proceso
+    result["process"] = time.perf_counter() - spawned
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health")
+    args = parser.parse_args()
+
+    for fast in (False, True):
+        results = [measure(fast, args.path) for _ in range(args.runs)]
+        median = {
+            name: statistics.median(r[name] for r in results) * 1000
+            for name in ("import", "lifespan", "first_request", "total", "process")
+        }
+        print(f"\n{'FAST_STARTUP=true' if fast else 'Modo normal'} ({args.runs} ejecuciones, mediana)")
+        for name, ms in median.items():
+            print(f"  {name:<14} {ms:8.1f} ms")
+        print(f"  fases import   {results[-1]['phases']['import_seconds']}")
+        print(f"  fases warm-up  {results[-1]['phases']['warmup_seconds']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Perfil de memoria (tracemalloc) de los endpoints que devuelven listas.
+
+Ejecuta cada endpoint de lista con resultados de tamaño creciente contra
+una base de datos simulada en memoria (sin red ni Supabase) y reporta:
+
+- pico de memoria del request y bytes por fila,
+- bloques vivos (asignaciones) por fila en cada etapa: filas convertidas a
+  dicts, modelos Pydantic + contenido serializado por FastAPI, y body JSON,
+- memoria que queda retenida después del request (cachés),
+- y, para el tamaño mayor, las líneas de código que más memoria asignan.
+
+La base simulada devuelve los datos como lo hace PostgREST: un body JSON
+que el cliente convierte a dicts (`json.loads`), con las relaciones
+anidadas (Booking -> Ride -> driver -> User) según el `select`.
+
+Uso:
+    python scripts/memory_profile.py [--sizes 100,1000,5000] [--top 10]
+        [--endpoint search_rides]
+
+Las notificaciones no se incluyen: su página está limitada a 100 filas.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "memory-profile-local-secret-0123456789")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("PROFILER_ENABLED", "false")
+
+import fastapi.routing  # noqa: E402
+import jwt  # noqa: E402
+from app.main import app  # noqa: E402
+from app.middleware.auth import JWT_ALGORITHM, JWT_AUDIENCE, SUPABASE_JWT_SECRET  # noqa: E402
+from app.utils.cache import entity_cache  # noqa: E402
+from app.utils.database import get_db  # noqa: E402
+from app.utils.resilience import last_good  # noqa: E402
+
+USER_ID = str(uuid.UUID(int=1))
+
+
+# ============= BASE DE DATOS SIMULADA =============
+
+def _user(i: int) -> dict:
+    return {
+        "id": str(uuid.UUID(int=10_000_000 + i)),
+        "email": f"user{i}@dale.app",
+        "name": f"Usuario {i}",
+        "avatar_url": f"https://cdn.dale.app/avatars/{i}.png",
+        "phone": "+584121234567",
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "average_rating": 4.5,
+        "rating_count": 12,
+    }
+
+
+def _ride(i: int, with_driver: bool) -> dict:
+    ride = {
+        "id": str(uuid.UUID(int=20_000_000 + i)),
+        "driver_id": str(uuid.UUID(int=10_000_000 + i % 500)),
+        "from_city": "Caracas",
+        "from_lat": 10.4806,
+        "from_lon": -66.9036,
+        "to_city": "Valencia",
+        "to_lat": 10.1620,
+        "to_lon": -68.0077,
+        "date_time": (datetime(2030, 1, 1) + timedelta(hours=i)).isoformat(),
+        "seats_total": 4,
+        "seats_available": 3,
+        "price": 15.0,
+        "notes": "Salida desde Altamira, parada en La Victoria",
+        "created_at": "2024-01-01T00:00:00+00:00",
+    }
+    if with_driver:
+        ride["driver"] = _user(i % 500)
+    return ride
+
+
+def _booking(i: int, select: str) -> dict:
+    ride = _ride(i, with_driver="driver:" in select)
+    if "rider:" not in select:
+        # Consulta de visibilidad de reseñas: viaje en el pasado, así la
+        # reseña es visible sin consulta recíproca (RideResponse, en cambio,
+        # exige fechas futuras)
+        ride["date_time"] = "2024-01-01T10:00:00"
+    booking = {
+        "id": str(uuid.UUID(int=30_000_000 + i)),
+        "ride_id": ride["id"],
+        "rider_id": USER_ID,
+        "seats": 1,
+        "status": "confirmed",
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "ride": ride,
+    }
+    if "rider:" in select:
+        booking["rider"] = _user(0)
+    return booking
+
+
+def _rating(i: int) -> dict:
+    return {
+        "id": str(uuid.UUID(int=40_000_000 + i)),
+        "booking_id": str(uuid.UUID(int=30_000_000 + i)),
+        "author_id": str(uuid.UUID(int=10_000_000 + i % 500)),
+        "subject_id": USER_ID,
+        "score": 5,
+        "comment": "Muy puntual y amable, el carro estaba impecable",
+        "role": "driver",
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "author": _user(i % 500),
+    }
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """
+    Query builder encadenable: ignora los filtros salvo `eq("id", ...)`,
+    que devuelve una sola fila.
+    """
+
+    def __init__(self, db: "FakeDatabase", table: str):
+        self.db = db
+        self.table = table
+        self.columns = "*"
+        self.single = False
+
+    def select(self, columns: str = "*", **kwargs):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        if column == "id":
+            self.single = True
+        return self
+
+    def __getattr__(self, name):
+        # gte, gt, order, range, neq, ilike, in_, ...
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        payload = self.db.payload(self.table, self.columns, 1 if self.single else self.db.size)
+        data = json.loads(payload)
+        _probe("rows")
+        return FakeResponse(data, count=len(data))
+
+
+class FakeDatabase:
+    """
+    Stand-in de Supabase que responde `size` filas por consulta.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._payloads = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def payload(self, table: str, columns: str, size: int) -> bytes:
+        key = (table, columns, size)
+        if key not in self._payloads:
+            if table == "Ride":
+                rows = [_ride(i, "driver:" in columns) for i in range(size)]
+            elif table == "Booking":
+                rows = [_booking(i, columns) for i in range(size)]
+            elif table == "ratings":
+                rows = [_rating(i) for i in range(size)]
+            else:
+                rows = [_user(i) for i in range(size)]
+            # El body se genera fuera de la medición, como lo enviaría PostgREST
+            self._payloads[key] = json.dumps(rows).encode()
+        return self._payloads[key]
+
+
+# ============= HARNESS =============
+
+ENDPOINTS = {
+    "search_rides": ("/api/rides", False),
+    "my_rides": ("/api/rides/my/rides", True),
+    "my_bookings": ("/api/bookings", True),
+    "user_reviews": (f"/api/reviews/user/{USER_ID}", False),
+}
+
+
+def _token() -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": USER_ID, "email": "user0@dale.app", "aud": JWT_AUDIENCE, "iat": now, "exp": now + 3600},
+        SUPABASE_JWT_SECRET,
+        algorithm=JWT_ALGORITHM,
+    )
+
+
+async def _request(path: str, authenticated: bool, on_start=None) -> tuple:
+    headers = [(b"authorization", f"Bearer {_token()}".encode())] if authenticated else []
+    status, size = 0, 0
+    first = True
+
+    async def receive():
+        nonlocal first
+        if first:
+            first = False
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            if on_start is not None:
+                on_start()
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+    await app(scope, receive, send)
+    return status, size
+
+
+def _reset_caches() -> None:
+    last_good.clear()
+    entity_cache.l1.clear()
+    gc.collect()
+
+
+# ============= PUNTOS DE MEDICIÓN =============
+# Snapshots de tracemalloc en cada etapa del request:
+# - "rows": filas ya convertidas a dicts (tras `execute()`)
+# - "serialized": modelos Pydantic + contenido serializado por FastAPI
+# - "send": body JSON listo para enviarse
+
+_probes = {}
+
+
+def _probe(stage: str) -> None:
+    if tracemalloc.is_tracing():
+        _probes[stage] = tracemalloc.take_snapshot()
+
+
+_serialize_response = fastapi.routing.serialize_response
+
+
+async def _probed_serialize_response(*args, **kwargs):
+    content = await _serialize_response(*args, **kwargs)
+    _probe("serialized")
+    return content
+
+
+fastapi.routing.serialize_response = _probed_serialize_response
+
+
+def _blocks(snapshot) -> int:
+    return sum(stat.count for stat in snapshot.statistics("filename"))
+
+
+def _size(snapshot) -> int:
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+async def measure(name: str, size: int, top: int = 0) -> dict:
+    path, authenticated = ENDPOINTS[name]
+    db = FakeDatabase(size)
+
+    async def override_get_db():
+        return db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    # Calentamiento (genera el payload y compila rutas) fuera de la medición
+    await _request(path, authenticated)
+    _reset_caches()
+    _probes.clear()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    status, body_size = await _request(path, authenticated, on_start=lambda: _probe("send"))
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    app.dependency_overrides.clear()
+
+    base_blocks, base_size = _blocks(before), _size(before)
+    stages = {
+        stage: {
+            "kib": (_size(snapshot) - base_size) / 1024,
+            "blocks_per_row": (_blocks(snapshot) - base_blocks) / size,
+        }
+        for stage, snapshot in _probes.items()
+    }
+
+    top_lines = []
+    if top and _probes:
+        # Las líneas que más memoria tienen viva en la etapa más pesada
+        heaviest = max(_probes.values(), key=_size)
+        root = str(Path(__file__).parent.parent) + os.sep
+        top_lines = [
+            str(stat).replace(root, "")
+            for stat in heaviest.compare_to(before, "lineno")[:top]
+        ]
+    _probes.clear()
+    _reset_caches()
+
+    return {
+        "endpoint": name,
+        "rows": size,
+        "status": status,
+        "body_kib": body_size / 1024,
+        "peak_kib": (peak - baseline) / 1024,
+        "peak_bytes_per_row": (peak - baseline) / size,
+        "stages": stages,
+        "retained_kib": (current - baseline) / 1024,
+        "top": top_lines,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--top", type=int, default=8, help="Líneas con más memoria (tamaño mayor)")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), action="append")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    for name in args.endpoint or ENDPOINTS:
+        print(f"\n{name} ({ENDPOINTS[name][0]})")
+        print(
+            f"  {'filas':>7} {'status':>6} {'body KiB':>9} {'pico KiB':>9} {'B/fila':>7} "
+            f"{'bloques/fila (rows / serialized / send)':>40} {'retenido KiB':>13}"
+        )
+        for size in sizes:
+            result = await measure(name, size, top=args.top if size == sizes[-1] else 0)
+            blocks = " / ".join(
+                f"{result['stages'][stage]['blocks_per_row']:.1f}" if stage in result["stages"] else "-"
+                for stage in ("rows", "serialized", "send")
+            )
+            print(
+                f"  {result['rows']:>7} {result['status']:>6} {result['body_kib']:>9.1f} "
+                f"{result['peak_kib']:>9.1f} {result['peak_bytes_per_row']:>7.0f} "
+                f"{blocks:>40} {result['retained_kib']:>13.1f}"
+            )
+        print("  Líneas con más memoria viva (tamaño mayor, etapa más pesada):")
+        for line in result["top"]:
+            print(f"    {line}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,8 @@ Contiene fixtures reutilizables para testing del backend
 
 import pytest
 import asyncio
+import re
+from typing import Optional
 from unittest.mock import Mock, patch
 from fastapi.testclient import TestClient
 import os
@@ -13,7 +15,11 @@ import sys
 # Añadir el directorio padre al path para imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+# Los tests comparten la IP del TestClient; el rate limiting se prueba aparte
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
 from app.main import app
+from app.utils.database import get_db
 
 
 @pytest.fixture(scope="session")
@@ -109,6 +115,147 @@ def integration_test_client(mock_supabase_client):
         return TestClient(app)
 
 
+# Viajes y base de datos falsa para las rutas de viajes
+DRIVER_ID = "123e4567-e89b-12d3-a456-426614174000"
+CARACAS = (10.4806, -66.9036)
+VALENCIA = (10.18, -67.99)
+
+
+def _ride(
+    i: int,
+    day: int = 25,
+    hour: int = 10,
+    to_city: str = "Valencia",
+    origin: tuple = CARACAS,
+    destination: tuple = VALENCIA,
+    seats: int = 3,
+    price: float = 20.0,
+    driver_id: str = DRIVER_ID,
+    rating: Optional[float] = None,
+    **fields
+) -> dict:
+    ride = {
+        "id": f"123e4567-e89b-12d3-a456-{i:012d}",
+        "driver_id": driver_id,
+        "from_city": "Caracas",
+        "to_city": to_city,
+        "from_lat": origin[0],
+        "from_lon": origin[1],
+        "to_lat": destination[0],
+        "to_lon": destination[1],
+        "date_time": f"2030-12-{day:02d}T{hour:02d}:00:00",
+        "price": price,
+        "seats_available": seats,
+        "seats_total": 4,
+        "created_at": "2024-01-01T00:00:00",
+    }
+    if rating is not None:
+        ride["driver"] = {
+            "id": driver_id, "email": "driver@example.com", "name": "Conductor",
+            "created_at": "2024-01-01T00:00:00", "average_rating": rating,
+        }
+    ride.update(fields)
+    return ride
+
+
+# Filtro keyset de `stream_json_list` (orden ascendente)
+_KEYSET = re.compile(r'\w+\.gt\."([^"]*)",and\(\w+\.eq\."[^"]*",id\.gt\."([^"]*)"\)')
+
+
+class FakeQuery:
+    """
+    Consulta encadenable sobre `rows` (ordenadas por date_time e id).
+    Registra cada llamada en `calls` y aplica `.in_()`, el filtro keyset
+    de `.or_()`, `.range()` y `.limit()`; el resto de filtros no filtra.
+    """
+
+    def __init__(self, db: "FakeDB", table: str):
+        self.db = db
+        self.table = table
+        self.calls = []
+        self.ids = None
+        self.after = None
+        self.window = None
+        self.size = None
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return call
+
+    def in_(self, column, values):
+        self.ids = set(values)
+        return self
+
+    def or_(self, filters):
+        self.after = _KEYSET.match(filters).groups()
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def execute(self):
+        if self.db.on_execute is not None:
+            self.db.on_execute(self)
+        rows = [
+            r for r in self.db.rows
+            if (self.ids is None or r["id"] in self.ids)
+            and (self.after is None or (r["date_time"], r["id"]) > self.after)
+        ]
+        if self.window is not None:
+            rows = rows[self.window[0]:self.window[1] + 1]
+        return Mock(data=rows[:self.size])
+
+
+class FakeDB:
+    """
+    Cliente Supabase falso: cada `table()` crea una `FakeQuery` sobre las
+    mismas filas y la guarda en `queries`.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.on_execute = None
+
+    def table(self, name: str) -> FakeQuery:
+        query = FakeQuery(self, name)
+        self.queries.append(query)
+        return query
+
+
+@pytest.fixture
+def make_ride():
+    """Fábrica de filas de Ride como las devuelve PostgREST"""
+    return _ride
+
+
+@pytest.fixture
+def fake_db():
+    """Fábrica de clientes Supabase falsos sobre una lista de filas"""
+    return FakeDB
+
+
+@pytest.fixture
+def use_db():
+    """Sustituye `get_db` por el cliente dado durante el test"""
+    def use(db):
+        async def override_get_db():
+            return db
+
+        app.dependency_overrides[get_db] = override_get_db
+        return db
+
+    yield use
+    app.dependency_overrides.pop(get_db, None)
+
+
 # Marcadores personalizados
 def pytest_configure(config):
     """Configurar marcadores personalizados"""
@@ -0,0 +1,133 @@
+"""
+Tests for admission control and load shedding.
+"""
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.middleware.admission import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionGate,
+    classify_request
+)
+from app.routes import batch
+
+
+class TestClassification:
+    """Route classes used for admission limits."""
+
+    def test_classify_request(self):
+        assert classify_request("GET", "/health") is None
+        assert classify_request("OPTIONS", "/api/rides") is None
+        assert classify_request("GET", "/api/rides") == "search"
+        assert classify_request("POST", "/api/bookings") == "writes"
+        assert classify_request("POST", "/api/batch") is None
+        assert classify_request("PATCH", "/api/notifications/read-all") == "notifications"
+        assert classify_request("GET", "/api/users/me") == "reads"
+
+
+class TestAdmissionGate:
+    """Unit tests for the bounded queue semaphore."""
+
+    @pytest.mark.asyncio
+    async def test_queue_then_shed(self):
+        """Excess requests queue up to the limit and the rest are shed."""
+        gate = AdmissionGate("test", max_concurrent=1, max_queue=1, max_wait=1.0)
+
+        assert await gate.acquire()
+        queued = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.queued == 1
+
+        assert not await gate.acquire()  # Queue full
+        assert gate.shed == 1
+
+        gate.release()
+        assert await queued
+        assert gate.active == 1
+        gate.release()
+        assert gate.active == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_timeout_sheds(self):
+        """A queued request that waits too long is shed."""
+        gate = AdmissionGate("test", max_concurrent=1, max_queue=5, max_wait=0.01)
+
+        assert await gate.acquire()
+        assert not await gate.acquire()
+        assert gate.queued == 0
+        assert gate.snapshot()["shed"] == 1
+
+
+class TestAdmissionMiddleware:
+    """Middleware behaviour on an isolated app."""
+
+    def test_overloaded_requests_get_503_with_retry_after(self):
+        """When the class is saturated, requests are shed but health passes."""
+        controller = AdmissionController({
+            "search": (0, 0, 1.0),
+            "reads": (0, 0, 1.0),
+            "writes": (0, 0, 1.0),
+            "notifications": (0, 0, 1.0),
+        })
+        test_app = FastAPI()
+        test_app.add_middleware(AdmissionControlMiddleware, controller=controller)
+
+        @test_app.get("/api/rides")
+        async def rides():
+            return []
+
+        @test_app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        client = TestClient(test_app)
+        response = client.get("/api/rides")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert client.get("/health").status_code == 200
+        assert controller.snapshot()["search"]["shed"] == 1
+
+    def test_batched_searches_use_the_search_gate(self):
+        """A batch cannot start searches past a full search gate."""
+        controller = AdmissionController({
+            "search": (0, 0, 1.0),
+            "reads": (1, 0, 1.0),
+            "writes": (0, 0, 1.0),
+            "notifications": (0, 0, 1.0),
+        })
+        test_app = FastAPI()
+        test_app.add_middleware(AdmissionControlMiddleware, controller=controller)
+        test_app.include_router(batch.router)
+
+        @test_app.get("/api/rides")
+        async def rides():
+            return []
+
+        @test_app.get("/api/users/me")
+        async def me():
+            return {"id": "user-1"}
+
+        response = TestClient(test_app).post("/api/batch", json={"requests": [
+            {"id": "rides", "path": "/api/rides"},
+            {"id": "me", "path": "/api/users/me"},
+        ]})
+
+        assert response.status_code == 200
+        assert [sub["status"] for sub in response.json()["responses"]] == [503, 200]
+        assert controller.snapshot()["search"]["shed"] == 1
+        assert controller.snapshot()["reads"]["admitted"] == 1
+
+    def test_metrics_endpoint(self, client):
+        """/metrics exposes queue depth and shed counts."""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert {"queued", "shed"} <= set(response.json()["admission"]["search"])
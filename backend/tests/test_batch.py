@@ -0,0 +1,69 @@
+"""
+Tests for the POST /api/batch multiplexing endpoint.
+"""
+import pytest
+from unittest.mock import Mock
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.utils.database import get_db
+
+
+class TestBatchEndpoint:
+    """Tests for in-process batched GET sub-requests."""
+
+    def test_batch_returns_per_subrequest_status(self):
+        """Each sub-request reports its own status and body."""
+        mock_client = Mock()
+        mock_query = Mock()
+        mock_query.gte.return_value = mock_query
+        mock_query.gt.return_value = mock_query
+        mock_query.order.return_value = mock_query
+        mock_query.execute.return_value = Mock(data=[])
+        mock_client.table.return_value.select.return_value = mock_query
+
+        async def override_get_db():
+            return mock_client
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            client = TestClient(app)
+            response = client.post("/api/batch", json={"requests": [
+                {"id": "health", "path": "/health"},
+                {"id": "rides", "path": "/api/rides"},
+                {"id": "me", "path": "/api/users/me"},
+                {"id": "missing", "path": "/api/nope?x=1"},
+            ]})
+
+            assert response.status_code == 200
+            results = {r["id"]: r for r in response.json()["responses"]}
+            assert results["health"]["status"] == 400
+            assert results["rides"]["status"] == 200
+            assert results["rides"]["body"] == []
+            assert results["me"]["status"] == 403  # No Authorization header
+            assert results["missing"]["status"] == 404
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_batch_rejects_nested_batches(self):
+        """A batch cannot contain another batch call."""
+        client = TestClient(app)
+        response = client.post("/api/batch", json={"requests": [{"path": "/api/batch"}]})
+
+        assert response.status_code == 200
+        assert response.json()["responses"][0]["status"] == 400
+
+    def test_batch_size_is_capped(self):
+        """More than 10 sub-requests is a validation error."""
+        client = TestClient(app)
+        response = client.post(
+            "/api/batch",
+            json={"requests": [{"path": "/api/rides"}] * 11}
+        )
+
+        assert response.status_code == 422
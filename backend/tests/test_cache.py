@@ -0,0 +1,189 @@
+"""
+Tests for the two-tier entity cache.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.utils.database import get_db
+from app.utils.cache import EntityCache, LRUCache, entity_cache, ride_tag, user_tag
+
+
+RIDE_ID = "123e4567-e89b-12d3-a456-426614174000"
+DRIVER_ID = "123e4567-e89b-12d3-a456-426614174001"
+
+
+class TestLRUCache:
+    """Unit tests for the in-process L1 cache."""
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self):
+        """Expired entries are not returned."""
+        cache = LRUCache(ttl=60)
+        with patch("app.utils.cache.time.monotonic", return_value=0):
+            cache.set("a", 1)
+        with patch("app.utils.cache.time.monotonic", return_value=61):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_invalidate_by_tag(self):
+        """Invalidating a surrogate key removes every tagged entry."""
+        cache = LRUCache()
+        cache.set("ride:1", {"id": 1}, ["ride:1", "user:9"])
+        cache.set("user:9", {"id": 9}, ["user:9"])
+        cache.set("ride:2", {"id": 2}, ["ride:2"])
+
+        assert cache.invalidate_tags(["user:9"]) == 2
+        assert cache.get("ride:1") is None
+        assert cache.get("ride:2") == {"id": 2}
+
+
+class TestEntityCache:
+    """Tests for EntityCache without Redis (L1 only)."""
+
+    @pytest.mark.asyncio
+    async def test_get_set_invalidate_without_redis(self):
+        """Without REDIS_URL the cache works purely in memory."""
+        cache = EntityCache(LRUCache())
+        with patch("app.utils.cache.get_redis", return_value=None):
+            await cache.set("user:1", {"id": "1"}, ["user:1"])
+            assert await cache.get("user:1") == {"id": "1"}
+
+            await cache.invalidate("user:1")
+            assert await cache.get("user:1") is None
+
+        assert cache.stats["l1_hits"] == 1
+        assert cache.stats["misses"] == 1
+
+
+class _FakePubSub:
+    def __init__(self, redis):
+        self.queue = asyncio.Queue()
+        redis.subscribers.append(self.queue)
+
+    async def subscribe(self, channel):
+        pass
+
+    async def get_message(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), 0.01)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _FakeRedis:
+    """Just enough of redis.asyncio for invalidation fan-out."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def pubsub(self, **kwargs):
+        return _FakePubSub(self)
+
+    async def smembers(self, key):
+        return set()
+
+    async def delete(self, *keys):
+        pass
+
+    async def publish(self, channel, data):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "message", "data": data})
+
+
+class TestCrossWorkerInvalidation:
+    """Workers forked from a preloaded master still see each other."""
+
+    @pytest.mark.asyncio
+    async def test_workers_with_the_same_starting_id(self):
+        """`start()` gives each worker its own id after the fork."""
+        master = EntityCache(LRUCache())
+        worker = EntityCache(LRUCache())
+        worker.node_id = master.node_id
+        notified = []
+        worker.on_invalidate(notified.append)
+
+        redis = _FakeRedis()
+        with patch("app.utils.cache.get_redis", return_value=redis):
+            await master.start()
+            await worker.start()
+            try:
+                while len(redis.subscribers) < 2:
+                    await asyncio.sleep(0)
+                assert master.node_id != worker.node_id
+                worker.l1.set("ride:1", {"id": "1"}, ["ride:1"])
+
+                await master.invalidate("ride:1")
+                for _ in range(50):
+                    if notified:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await master.stop()
+                await worker.stop()
+
+        assert notified == [["ride:1"]]
+        assert worker.l1.get("ride:1") is None
+
+
+class TestRideDetailCaching:
+    """Route-level caching of GET /api/rides/{id}."""
+
+    def test_ride_detail_is_cached_until_invalidated(self):
+        """Repeated reads hit the cache; invalidating the driver refetches."""
+        ride = {
+            "id": RIDE_ID,
+            "from_city": "Caracas",
+            "to_city": "Valencia",
+            "from_lat": 10.4806,
+            "from_lon": -66.9036,
+            "to_lat": 10.18,
+            "to_lon": -67.99,
+            "date_time": "2030-12-25T10:00:00",
+            "price": 20.0,
+            "seats_available": 3,
+            "seats_total": 4,
+            "driver_id": DRIVER_ID,
+            "driver": None,
+            "created_at": "2024-01-01T00:00:00"
+        }
+        mock_client = Mock()
+        execute = mock_client.table.return_value.select.return_value.eq.return_value.execute
+        execute.return_value = Mock(data=[ride])
+
+        async def override_get_db():
+            return mock_client
+
+        entity_cache.clear()
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            client = TestClient(app)
+            assert client.get(f"/api/rides/{RIDE_ID}").status_code == 200
+            assert client.get(f"/api/rides/{RIDE_ID}").status_code == 200
+            assert execute.call_count == 1
+
+            entity_cache.l1.invalidate_tags([user_tag(DRIVER_ID)])
+            assert client.get(f"/api/rides/{RIDE_ID}").status_code == 200
+            assert execute.call_count == 2
+            assert entity_cache.l1.get(ride_tag(RIDE_ID))["id"] == RIDE_ID
+        finally:
+            app.dependency_overrides.clear()
+            entity_cache.clear()
@@ -0,0 +1,88 @@
+"""
+Tests for cancelling request work when the client disconnects.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from pydantic import BaseModel
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.utils.cancellation import (
+    CLIENT_CLOSED_REQUEST,
+    run_until_disconnect,
+    serialize_rows,
+    stats
+)
+
+
+def _request(disconnect_after: float):
+    """Fake request whose client disconnects after `disconnect_after` seconds."""
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    return SimpleNamespace(receive=receive)
+
+
+class Item(BaseModel):
+    id: int
+
+
+class TestRunUntilDisconnect:
+    """Racing route work against http.disconnect."""
+
+    @pytest.mark.asyncio
+    async def test_completed_work_is_returned(self):
+        async def work():
+            return [1, 2, 3]
+
+        assert await run_until_disconnect(_request(10), work, "test") == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_work(self):
+        cancelled = asyncio.Event()
+        before = stats["disconnects"]
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        response = await run_until_disconnect(_request(0.01), work, "test")
+
+        assert response.status_code == CLIENT_CLOSED_REQUEST
+        assert cancelled.is_set()
+        assert stats["disconnects"] == before + 1
+        assert stats["routes"]["test"] >= 1
+
+
+class TestSerializeRows:
+    """Chunked conversion to Pydantic models."""
+
+    @pytest.mark.asyncio
+    async def test_cancellation_stops_between_chunks(self):
+        before = stats["skipped_rows"]
+        task = asyncio.ensure_future(
+            serialize_rows([{"id": i} for i in range(10)], Item, chunk_size=4)
+        )
+        await asyncio.sleep(0)  # First chunk converted, then yields
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert stats["skipped_rows"] == before + 6
+
+    @pytest.mark.asyncio
+    async def test_converts_all_rows(self):
+        items = await serialize_rows([{"id": i} for i in range(5)], Item, chunk_size=2)
+        assert [item.id for item in items] == list(range(5))
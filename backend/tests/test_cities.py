@@ -0,0 +1,144 @@
+"""
+Tests for the in-memory city autocomplete index.
+"""
+import pytest
+from unittest.mock import Mock
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.services import cities
+from app.services.cities import City, CityIndex, city_index, normalize_city
+from app.utils.database import get_db
+
+
+def _index():
+    return CityIndex([
+        City(key="merida", name="Mérida", state="Mérida", population=350000),
+        City(key="maracay", name="Maracay", state="Aragua", population=1000000),
+        City(key="maracaibo", name="Maracaibo", state="Zulia", population=2000000),
+        City(key="puerto la cruz", name="Puerto La Cruz", state="Anzoátegui", population=250000),
+    ])
+
+
+class TestNormalizeCity:
+    """Accent and case folding."""
+
+    def test_accents_case_and_punctuation(self):
+        assert normalize_city("  MÉRIDA. ") == "merida"
+        assert normalize_city("San Cristóbal") == normalize_city("san cristobal")
+        assert normalize_city(None) == ""
+
+
+class TestCanonicalKey:
+    """Keys stored on Ride and used for equality search."""
+
+    def test_abbreviations_aliases_and_state_suffixes(self):
+        assert city_index.canonical_key("Pto. La Cruz") == "puerto la cruz"
+        assert city_index.canonical_key("Ciudad Guayana") == "puerto ordaz"
+        assert city_index.canonical_key("Valencia, Edo. Carabobo") == "valencia"
+        assert city_index.canonical_key("Pueblo Nuevo") == "pueblo nuevo"
+        assert city_index.match_key("vale") is None
+
+
+class TestCityIndex:
+    """Prefix lookups and ranking."""
+
+    def test_accent_insensitive_prefix_and_word_match(self):
+        index = _index()
+
+        assert [c.name for c in index.suggest("mé")] == ["Mérida"]
+        assert [c.name for c in index.suggest("CRUZ")] == ["Puerto La Cruz"]
+        assert index.suggest("   ") == []
+
+    def test_ranks_by_ride_volume_then_population(self):
+        index = _index()
+        assert [c.name for c in index.suggest("mara")] == ["Maracaibo", "Maracay"]
+
+        index.record_ride({"from_city": "maracay", "to_city": "Tucupita"})
+        assert [c.name for c in index.suggest("mara")] == ["Maracay", "Maracaibo"]
+        # Unknown cities typed by drivers are added on the fly
+        assert [c.name for c in index.suggest("tucu")] == ["Tucupita"]
+
+        index.record_ride({"from_city": "Maracay", "to_city": "Tucupita"}, delta=-1)
+        assert [c.name for c in index.suggest("mara")] == ["Maracaibo", "Maracay"]
+
+    def test_unknown_key_without_name_is_ignored(self):
+        """A ride with a stored key but no city name adds nothing."""
+        index = _index()
+        index.record_ride({"from_city": None, "from_city_key": "tucupita", "to_city_key": "maracay"})
+
+        assert "tucupita" not in index.cities
+        assert index.cities["maracay"].ride_count == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_counts_rides_across_pages(self, monkeypatch):
+        monkeypatch.setattr(cities, "REFRESH_PAGE_SIZE", 2)
+        rows = [
+            {"from_city": "Mérida", "to_city": "Maracay"},
+            {"from_city": "merida", "to_city": "El Vigía"},
+            {"from_city": "MERIDA", "to_city": None},
+        ]
+        query = Mock()
+        for method in ("select", "gte", "order"):
+            getattr(query, method).return_value = query
+        query.range.side_effect = lambda start, end: Mock(
+            execute=Mock(return_value=Mock(data=rows[start:end + 1]))
+        )
+        db = Mock()
+        db.table.return_value = query
+        index = _index()
+
+        await index.refresh(db)
+
+        assert index.resolve("Merida").ride_count == 3
+        assert index.resolve("el vigia").name == "El Vigía"
+        assert index.stats["refreshes"] == 1
+
+
+class TestSuggestEndpoint:
+    """GET /api/cities/suggest."""
+
+    def test_bundled_gazetteer_is_served_without_db(self):
+        response = TestClient(app).get("/api/cities/suggest", params={"q": "merida"})
+
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == "Mérida"
+        assert "etag" in response.headers
+
+
+class TestSearchCityFilter:
+    """search_rides uses indexed equality for known cities."""
+
+    def test_known_city_uses_key_and_partial_text_falls_back(self):
+        calls = []
+
+        class RecordingQuery:
+            def __getattr__(self, name):
+                def method(*args, **kwargs):
+                    calls.append((name, args))
+                    return self
+                return method
+
+            def execute(self):
+                return Mock(data=[])
+
+        db = Mock()
+        db.table.return_value = RecordingQuery()
+
+        async def override_get_db():
+            return db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            response = TestClient(app).get("/api/rides", params={"from_city": "Mérida", "to_city": "Vale"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert ("eq", ("from_city_key", "merida")) in calls
+        assert ("ilike", ("to_city", "%Vale%")) in calls
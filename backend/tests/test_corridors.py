@@ -0,0 +1,63 @@
+"""
+Tests for route-corridor cells and corridor search.
+"""
+import pytest
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.services.corridors import heads_forward, point_cell, route_cells
+
+CARACAS = (10.4806, -66.9036)
+VALENCIA = (10.1620, -68.0077)
+BARQUISIMETO = (10.0678, -69.3474)
+MERIDA = (8.5897, -71.1561)
+
+
+@pytest.fixture
+def ride(make_ride):
+    return make_ride(1, to_city="Barquisimeto", origin=CARACAS, destination=BARQUISIMETO)
+
+
+class TestRouteCells:
+    """Rides are buffered into grid cells along their route."""
+
+    def test_great_circle_corridor_covers_towns_on_the_way(self, ride):
+        cells = set(route_cells(ride))
+
+        assert point_cell(*CARACAS) in cells
+        assert point_cell(*VALENCIA) in cells
+        assert point_cell(*MERIDA) not in cells
+
+    def test_polyline_detour_adds_its_cells(self, ride):
+        detour = [(9.66, -68.58)]  # San Carlos, ~60 km off the straight line
+
+        assert point_cell(*detour[0]) not in set(route_cells(ride))
+        assert point_cell(*detour[0]) in set(route_cells(ride, detour))
+
+    def test_direction(self, ride):
+        assert heads_forward(ride, VALENCIA, BARQUISIMETO)
+        assert not heads_forward(ride, BARQUISIMETO, VALENCIA)
+
+
+class TestCorridorRoute:
+    """`GET /api/rides/corridor` is a cell containment query."""
+
+    def test_contains_both_cells_and_drops_wrong_direction(self, ride, fake_db, use_db):
+        db = use_db(fake_db([ride]))
+        client = TestClient(app)
+
+        params = dict(from_lat=VALENCIA[0], from_lon=VALENCIA[1], to_lat=BARQUISIMETO[0], to_lon=BARQUISIMETO[1])
+        response = client.get("/api/rides/corridor", params=params)
+
+        assert response.status_code == 200
+        assert [r["id"] for r in response.json()] == [ride["id"]]
+        cells = sorted({point_cell(*VALENCIA), point_cell(*BARQUISIMETO)})
+        assert ("contains", ("route_cells", cells)) in db.queries[0].calls
+
+        reverse = dict(from_lat=BARQUISIMETO[0], from_lon=BARQUISIMETO[1], to_lat=VALENCIA[0], to_lon=VALENCIA[1])
+        assert client.get("/api/rides/corridor", params=reverse).json() == []
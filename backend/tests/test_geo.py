@@ -0,0 +1,60 @@
+"""
+Tests for the offline gazetteer geometry (haversine, k-d tree, city keys).
+"""
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.cities import city_index
+from app.services.geo import KDTree, haversine_km, unit_vectors
+
+
+class TestHaversine:
+    """Vectorized great-circle distances."""
+
+    def test_caracas_valencia(self):
+        distances = haversine_km([10.4806, 10.4806], [-66.9036, -66.9036], [10.1620, 10.4806], [-68.0077, -66.9036])
+
+        assert distances[0] == pytest.approx(124, abs=3)
+        assert distances[1] == 0
+
+
+class TestKDTree:
+    """Nearest neighbour over unit vectors."""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(42)
+        points = unit_vectors(rng.uniform(0, 12, 300), rng.uniform(-73, -60, 300))
+        queries = unit_vectors(rng.uniform(0, 12, 200), rng.uniform(-73, -60, 200))
+
+        expected = ((queries[:, None, :] - points[None, :, :]) ** 2).sum(-1).argmin(axis=1)
+
+        assert (KDTree(points).nearest(queries) == expected).all()
+
+
+class TestRideKeys:
+    """City keys from typed names and coordinates, in bulk."""
+
+    def test_typed_name_coordinates_and_fallback(self):
+        rides = [
+            # Unrecognised text snaps to the nearest city
+            {"from_city": "CCS centro", "from_lat": 10.50, "from_lon": -66.91,
+             "to_city": "Valencia", "to_lat": 10.17, "to_lon": -68.00},
+            # A nearby gazetteer city typed by the driver is kept
+            {"from_city": "Petare", "from_lat": 10.48, "from_lon": -66.82,
+             # Far from any city: the typed name is used
+             "to_city": "Mi casa", "to_lat": 0.0, "to_lon": 0.0},
+            # Typed name contradicts the coordinates
+            {"from_city": "Caracas", "from_lat": 10.48, "from_lon": -66.82,
+             "to_city": "Valencia", "to_lat": 8.59, "to_lon": -71.15},
+        ]
+
+        assert city_index.ride_keys(rides) == [
+            ("caracas", "valencia"),
+            ("petare", "mi casa"),
+            ("caracas", "merida"),
+        ]
@@ -0,0 +1,70 @@
+"""
+Tests for ETag / conditional GET handling on public read endpoints.
+"""
+import pytest
+from unittest.mock import Mock
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.utils.database import get_db
+from app.middleware.http_cache import compute_etag, etag_matches
+
+
+@pytest.fixture
+def rides_client():
+    """Client whose database returns an empty ride search."""
+    mock_client = Mock()
+    mock_query = Mock()
+    mock_query.gte.return_value = mock_query
+    mock_query.gt.return_value = mock_query
+    mock_query.order.return_value = mock_query
+    mock_query.execute.return_value = Mock(data=[])
+    mock_client.table.return_value.select.return_value = mock_query
+
+    async def override_get_db():
+        return mock_client
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+class TestETags:
+    """Tests for the HTTPCacheMiddleware."""
+
+    def test_etag_helpers(self):
+        """ETags are strong and If-None-Match uses weak comparison."""
+        etag = compute_etag(b"[]")
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+
+    def test_public_search_sets_cache_headers(self, rides_client):
+        """GET /api/rides returns an ETag and Cache-Control."""
+        response = rides_client.get("/api/rides")
+
+        assert response.status_code == 200
+        assert response.headers["etag"] == compute_etag(response.content)
+        assert "stale-while-revalidate" in response.headers["cache-control"]
+
+    def test_if_none_match_returns_304(self, rides_client):
+        """A matching If-None-Match yields 304 without a body."""
+        etag = rides_client.get("/api/rides").headers["etag"]
+        response = rides_client.get("/api/rides", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_private_routes_are_not_cached(self, client):
+        """Authenticated or non-listed routes get no ETag."""
+        response = client.get("/health")
+
+        assert response.status_code == 200
+        assert "etag" not in response.headers
@@ -0,0 +1,149 @@
+"""
+Tests for the request-scoped entity loaders.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.utils.loader import DataLoader, RequestLoaders
+
+
+def _mock_db(rows):
+    """Build a mock Supabase client whose `in_` query returns `rows`."""
+    mock_db = Mock()
+    mock_response = Mock()
+    mock_response.data = rows
+    mock_db.table.return_value.select.return_value.in_.return_value.execute.return_value = mock_response
+    return mock_db
+
+
+class TestDataLoader:
+    """Unit tests for DataLoader batching and identity map."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_are_batched(self):
+        """Loads issued in the same tick resolve with a single `in_` query."""
+        mock_db = _mock_db([{"id": "u1", "name": "Ana"}, {"id": "u2", "name": "Juan"}])
+        loader = DataLoader(mock_db, "User")
+
+        first, second, again = await asyncio.gather(
+            loader.load("u1"), loader.load("u2"), loader.load("u1")
+        )
+
+        assert first["name"] == "Ana"
+        assert second["name"] == "Juan"
+        assert again is first
+        assert loader.queries == 1
+        in_call = mock_db.table.return_value.select.return_value.in_
+        in_call.assert_called_once_with("id", ["u1", "u2"])
+
+    @pytest.mark.asyncio
+    async def test_cached_and_missing_rows(self):
+        """Known rows and missing IDs are not fetched twice."""
+        mock_db = _mock_db([{"id": "u1", "name": "Ana"}])
+        loader = DataLoader(mock_db, "User")
+
+        result = await loader.load_many(["u1", "missing"])
+        assert result["u1"]["name"] == "Ana"
+        assert result["missing"] is None
+
+        assert await loader.load("missing") is None
+        assert loader.queries == 1
+
+    @pytest.mark.asyncio
+    async def test_ride_loader_primes_driver(self):
+        """Rides loaded with an embedded driver prime the users loader."""
+        ride = {"id": "r1", "driver_id": "d1", "driver": {"id": "d1", "name": "María"}}
+        mock_db = _mock_db([ride])
+        loaders = RequestLoaders(mock_db)
+
+        assert (await loaders.rides.load("r1"))["id"] == "r1"
+        assert (await loaders.users.load("d1"))["name"] == "María"
+        assert loaders.users.queries == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_and_are_not_cached(self):
+        """A failed batch raises for every waiter and is retried later."""
+        mock_db = Mock()
+        mock_db.table.return_value.select.return_value.in_.return_value.execute.side_effect = RuntimeError("boom")
+        loader = DataLoader(mock_db, "User")
+
+        with pytest.raises(RuntimeError):
+            await loader.load("u1")
+
+        mock_db.table.return_value.select.return_value.in_.return_value.execute.side_effect = None
+        mock_db.table.return_value.select.return_value.in_.return_value.execute.return_value = Mock(
+            data=[{"id": "u1"}]
+        )
+        assert (await loader.load("u1"))["id"] == "u1"
+
+
+    @pytest.mark.asyncio
+    async def test_cancelled_dispatch_releases_waiters(self):
+        """Cancelling the batch query cancels every pending load."""
+        started = asyncio.Event()
+        dispatch = []
+
+        async def hanging_query(query):
+            dispatch.append(asyncio.current_task())
+            started.set()
+            await asyncio.Event().wait()
+
+        loader = DataLoader(Mock(), "User")
+        with patch("app.utils.loader.run_query", hanging_query):
+            loads = asyncio.gather(loader.load("u1"), loader.load("u2"), return_exceptions=True)
+            await started.wait()
+            dispatch[0].cancel()
+            results = await asyncio.wait_for(loads, timeout=1)
+
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+class TestBatchEndpoints:
+    """Tests for the multi-get endpoints built on the loaders."""
+
+    def test_parse_ids_validates_and_dedupes(self):
+        """IDs are de-duplicated, validated and capped."""
+        from fastapi import HTTPException
+        from app.utils.loader import parse_ids
+
+        uid = "123e4567-e89b-12d3-a456-426614174000"
+        assert parse_ids(f"{uid}, {uid}") == [uid]
+
+        with pytest.raises(HTTPException):
+            parse_ids("not-a-uuid")
+        with pytest.raises(HTTPException):
+            parse_ids(",".join([uid] * 2), max_ids=0)
+
+    def test_get_users_by_ids(self):
+        """GET /api/users?ids= returns profiles keyed by id in one query."""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.utils.database import get_db
+
+        found = "123e4567-e89b-12d3-a456-426614174001"
+        missing = "123e4567-e89b-12d3-a456-426614174002"
+        mock_db = _mock_db([{
+            "id": found,
+            "email": "ana@example.com",
+            "name": "Ana",
+            "created_at": "2024-01-01T00:00:00"
+        }])
+
+        async def override_get_db():
+            return mock_db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            response = TestClient(app).get(f"/api/users?ids={found},{missing}")
+            assert response.status_code == 200
+            data = response.json()
+            assert list(data) == [found]
+            assert data[found]["name"] == "Ana"
+            mock_db.table.return_value.select.return_value.in_.assert_called_once()
+        finally:
+            app.dependency_overrides.clear()
@@ -0,0 +1,71 @@
+"""
+Tests for the event-loop lag monitor and blocking-call detector.
+"""
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.middleware.loop_monitor import LagHistogram, LoopMonitor
+
+
+class _Route:
+    path = "/api/rides/{ride_id}"
+
+
+def _blocking_handler():
+    time.sleep(0.3)
+
+
+class TestLagHistogram:
+    """Cumulative lag buckets."""
+
+    def test_observe(self):
+        histogram = LagHistogram(buckets=(1, 10))
+        for value in (0.5, 5, 50):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets_ms"] == {"le_1": 1, "le_10": 2, "+Inf": 3}
+        assert snapshot["max_ms"] == 50
+
+
+class TestLoopMonitor:
+    """Blocking detection attributed to the request route."""
+
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_attributed_to_route(self):
+        monitor = LoopMonitor(interval=0.02, threshold=0.05)
+        await monitor.start()
+        try:
+            scope = {"type": "http", "method": "GET", "path": "/api/rides/1", "route": _Route()}
+
+            async def request():
+                previous = monitor.bind(scope)
+                try:
+                    # A child task inherits the request via the task factory
+                    await asyncio.create_task(_child())
+                finally:
+                    monitor.unbind(previous)
+
+            async def _child():
+                _blocking_handler()
+
+            await asyncio.create_task(request())
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+
+        snapshot = monitor.snapshot()
+        assert snapshot["blocked_by_route"].get("GET /api/rides/{ride_id}") == 1
+        event = next(e for e in snapshot["recent_blocks"] if e["route"] == "GET /api/rides/{ride_id}")
+        assert event["duration_ms"] >= 200
+        assert "stack" not in event
+        # The stack is kept for the log, never exposed in /metrics
+        logged = next(e for e in monitor.blocking_events if e["route"] == "GET /api/rides/{ride_id}")
+        assert any("_blocking_handler" in frame for frame in logged["stack"])
+        assert snapshot["lag"]["max_ms"] >= 200
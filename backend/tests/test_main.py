@@ -14,6 +14,11 @@ def test_root(client):
     assert response.status_code == 200
     assert "Dale API" in response.json()["name"]
 
+def test_startup_breakdown_is_reported(client):
+    startup = client.get("/metrics").json()["startup"]
+    assert startup["mode"] in ("fast", "warm")
+    assert {"fastapi", "routes", "total"} <= set(startup["import_seconds"])
+
 def test_search_rides():
     # Create mock supabase client
     mock_client = Mock()
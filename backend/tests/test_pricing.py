@@ -0,0 +1,90 @@
+"""
+Tests for the price suggestion model.
+"""
+import numpy as np
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.services import pricing
+from app.services.pricing import PriceModel, grouped_quantiles
+
+CARACAS = (10.4806, -66.9036)
+VALENCIA = (10.1620, -68.0077)
+MARACAY = (10.2469, -67.5958)
+
+
+def _row(origin, destination, price, from_key, to_key):
+    return {
+        "from_city_key": from_key, "to_city_key": to_key,
+        "from_lat": origin[0], "from_lon": origin[1],
+        "to_lat": destination[0], "to_lon": destination[1],
+        "price": price,
+    }
+
+
+def _model():
+    model = PriceModel()
+    model.rebuild(
+        [_row(CARACAS, VALENCIA, p, "caracas", "valencia") for p in (10, 12, 14)]
+        + [_row(VALENCIA, CARACAS, p, "valencia", "caracas") for p in (16, 18)]
+        + [_row(CARACAS, MARACAY, None, "caracas", "maracay")]
+    )
+    return model
+
+
+class TestGroupedQuantiles:
+    """Vectorized per-group percentiles."""
+
+    def test_matches_numpy_percentile(self):
+        rng = np.random.default_rng(1)
+        groups = rng.integers(0, 5, 200)
+        values = rng.random(200)
+
+        keys, counts, result = grouped_quantiles(groups, values, (0.25, 0.5, 0.75))
+
+        for i, key in enumerate(keys):
+            expected = np.percentile(values[groups == key], [25, 50, 75])
+            assert np.allclose(result[:, i], expected)
+            assert counts[i] == (groups == key).sum()
+
+
+class TestPriceModel:
+    """Pair history first, then distance bands, then the default rate."""
+
+    def test_pair_history_in_either_direction(self):
+        suggestion = _model().suggest(*VALENCIA, *CARACAS, "Valencia", "Caracas")
+
+        assert suggestion["basis"] == "pair"
+        assert suggestion["sample_size"] == 5
+        assert suggestion["suggested_price"] == 14.0
+        assert (suggestion["low"], suggestion["high"]) == (12.0, 16.0)
+
+    def test_falls_back_to_distance_band_and_default(self, monkeypatch):
+        model = _model()
+        # No city pair history, same distance band as Caracas-Valencia
+        suggestion = model.suggest(0.0, 0.0, 0.0, 1.1)
+        assert suggestion["basis"] == "distance"
+        assert suggestion["sample_size"] == 5
+
+        monkeypatch.setattr(pricing, "PRICE_MIN_SAMPLES", 10)
+        suggestion = model.suggest(*CARACAS, *MARACAY)
+        assert suggestion["basis"] == "default"
+        assert suggestion["suggested_price"] == round(suggestion["distance_km"] * 0.1 * 2) / 2
+
+
+class TestPriceSuggestionRoute:
+    """`GET /api/rides/price-suggestion` answers from memory."""
+
+    def test_route(self, monkeypatch):
+        monkeypatch.setattr("app.routes.rides.price_model", _model())
+        params = dict(from_lat=CARACAS[0], from_lon=CARACAS[1], to_lat=VALENCIA[0], to_lon=VALENCIA[1])
+
+        response = TestClient(app).get("/api/rides/price-suggestion", params=params)
+
+        assert response.status_code == 200
+        assert response.json()["basis"] == "pair"
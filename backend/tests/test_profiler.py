@@ -0,0 +1,95 @@
+"""
+Tests for the on-demand request profiler.
+"""
+import time
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.middleware.profiler import ProfilerMiddleware, profiling_requested
+from app.utils.profiling import profiled_threads, wrap_thread
+
+
+def _busy_handler():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_app(token=None):
+    test_app = FastAPI()
+    test_app.add_middleware(ProfilerMiddleware, token=token)
+
+    @test_app.get("/api/rides")
+    async def rides():
+        _busy_handler()
+        return []
+
+    return test_app
+
+
+class TestProfilerMiddleware:
+    """Profiling is only triggered on request."""
+
+    def test_profile_header_returns_folded_stacks(self):
+        client = TestClient(_profiled_app())
+        response = client.get("/api/rides", headers={"X-Dale-Profile": "1"})
+
+        assert response.status_code == 200
+        assert response.headers["x-profile-status"] == "200"
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.headers["x-profile-summary"].startswith("samples=")
+
+        lines = response.text.splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("_busy_handler" in line for line in lines)
+
+    def test_unprofiled_requests_pass_through(self):
+        client = TestClient(_profiled_app())
+        assert client.get("/api/rides").json() == []
+        assert client.get("/api/rides?__profile=1").headers["x-profile-status"] == "200"
+
+    def test_token_is_required_when_configured(self):
+        headers = [(b"x-dale-profile", b"1")]
+        assert profiling_requested({"headers": headers, "query_string": b""}, token=None)
+        assert not profiling_requested({"headers": headers, "query_string": b""}, token="secret")
+        assert profiling_requested(
+            {"headers": [], "query_string": b"__profile=secret"}, token="secret"
+        )
+
+    @pytest.mark.skipif("PROFILER_ENABLED" in os.environ, reason="profiler configured explicitly")
+    def test_disabled_unless_explicitly_enabled(self):
+        """Without PROFILER_ENABLED=true the middleware is not installed."""
+        assert ProfilerMiddleware not in [m.cls for m in app.user_middleware]
+
+
+class TestWrapThread:
+    """Threadpool threads join the active profile while they run."""
+
+    def test_thread_is_tracked_only_while_running(self):
+        seen = []
+        threads = set()
+
+        def query():
+            seen.append(set(threads))
+            return "rows"
+
+        assert wrap_thread(query) is query
+        token = profiled_threads.set(threads)
+        try:
+            tracked = wrap_thread(query)
+        finally:
+            profiled_threads.reset(token)
+
+        worker = threading.Thread(target=tracked)
+        worker.start()
+        worker.join()
+        assert seen == [{worker.ident}]
+        assert threads == set()
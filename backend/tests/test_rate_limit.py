@@ -0,0 +1,116 @@
+"""
+Tests for token-bucket rate limiting.
+"""
+import time
+import jwt
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.middleware.rate_limit import MemoryTokenBucket, RateLimitMiddleware, match_rule
+from app.middleware.auth import SUPABASE_JWT_SECRET
+from app.routes import batch
+
+
+def _rate_limited_app():
+    test_app = FastAPI()
+    test_app.add_middleware(RateLimitMiddleware, enabled=True, backend="memory")
+    test_app.include_router(batch.router)
+
+    @test_app.get("/api/rides")
+    async def rides():
+        return []
+
+    @test_app.get("/api/rides/search")
+    async def rides_by_day():
+        return {"days": []}
+
+    @test_app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return test_app
+
+
+class TestMemoryTokenBucket:
+    """Unit tests for the in-process bucket."""
+
+    def test_burst_then_refill(self):
+        """A bucket allows `burst` hits and refills at `rate` per second."""
+        bucket = MemoryTokenBucket()
+        with patch("app.middleware.rate_limit.time.monotonic", return_value=100.0):
+            assert [bucket.hit_sync("k", 1.0, 2)[0] for _ in range(3)] == [True, True, False]
+            allowed, remaining, retry_after = bucket.hit_sync("k", 1.0, 2)
+            assert not allowed and retry_after == pytest.approx(1.0)
+
+        with patch("app.middleware.rate_limit.time.monotonic", return_value=101.0):
+            assert bucket.hit_sync("k", 1.0, 2)[0]
+            assert bucket.hit_sync("other", 1.0, 2)[0]
+
+    def test_rules(self):
+        assert match_rule("GET", "/api/rides").name == "search"
+        for path in ("/api/rides/page", "/api/rides/search", "/api/rides/corridor", "/api/rides/recommended"):
+            assert match_rule("GET", path).name == "search"
+        assert match_rule("GET", "/api/rides/price-suggestion").name == "api"
+        assert match_rule("POST", "/api/bookings").name == "writes"
+        assert match_rule("POST", "/api/batch").name == "api"
+        assert match_rule("GET", "/health") is None
+
+
+class TestRateLimitMiddleware:
+    """Middleware behaviour on an isolated app."""
+
+    def test_search_is_limited_per_ip(self):
+        """Anonymous clients exceeding the search budget get 429."""
+        client = TestClient(_rate_limited_app())
+        statuses = [client.get("/api/rides").status_code for _ in range(31)]
+
+        assert statuses[:30] == [200] * 30
+        assert statuses[30] == 429
+        limited = client.get("/api/rides")
+        assert int(limited.headers["retry-after"]) >= 1
+        assert limited.headers["x-ratelimit-remaining"] == "0"
+        assert client.get("/health").status_code == 200
+
+    def test_search_routes_share_the_search_budget(self):
+        """`/api/rides/search` cannot be used to dodge the search limit."""
+        client = TestClient(_rate_limited_app())
+        statuses = [client.get("/api/rides/search").status_code for _ in range(31)]
+
+        assert statuses[:30] == [200] * 30
+        assert statuses[30] == 429
+        assert client.get("/api/rides").status_code == 429
+
+    def test_batch_sub_requests_share_the_search_budget(self):
+        """Searches sent through /api/batch are charged like direct ones."""
+        client = TestClient(_rate_limited_app())
+        statuses = []
+        for size in (10, 10, 10, 1):
+            response = client.post("/api/batch", json={"requests": [{"path": "/api/rides"}] * size})
+            assert response.status_code == 200
+            statuses += [sub["status"] for sub in response.json()["responses"]]
+
+        assert statuses[:30] == [200] * 30
+        assert statuses[30] == 429
+        assert client.get("/api/rides").status_code == 429
+
+    def test_authenticated_users_have_their_own_bucket(self):
+        """A valid JWT is keyed by `sub`, not by the shared IP."""
+        middleware = RateLimitMiddleware(None, enabled=True, backend="memory")
+        token = jwt.encode(
+            {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60},
+            SUPABASE_JWT_SECRET,
+            algorithm="HS256"
+        )
+        scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("1.2.3.4", 1)}
+
+        assert middleware.identity(scope) == "user:user-1"
+        assert middleware.identity({"headers": [], "client": ("1.2.3.4", 1)}) == "ip:1.2.3.4"
+        bad = {"headers": [(b"authorization", b"Bearer nope")], "client": ("1.2.3.4", 1)}
+        assert middleware.identity(bad) == "ip:1.2.3.4"
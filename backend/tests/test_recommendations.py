@@ -0,0 +1,105 @@
+"""
+Tests for ride recommendations.
+"""
+import json
+import numpy as np
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.middleware.auth import get_current_user
+from app.models.schemas import TokenPayload
+from app.services.recommendations import recommend, top_k
+from app.services.ride_index import RideIndex, columns_from_rows
+
+RIDER = "123e4567-e89b-12d3-a456-426614174099"
+CARACAS = (10.4806, -66.9036)
+VALENCIA = (10.1620, -68.0077)
+
+
+@pytest.fixture
+def rows(make_ride):
+    def ride(i, origin=CARACAS, rating=4.0, **fields):
+        return make_ride(i, origin=origin, destination=VALENCIA, rating=rating, **fields)
+
+    return [
+        ride(1),
+        ride(2, origin=(10.60, -66.90)),  # ~13 km away
+        ride(3, price=40.0, rating=2.0),
+        ride(4, hour=20),
+        ride(5, origin=(11.5, -66.9)),  # outside the radius
+        ride(6, driver_id=RIDER),
+    ]
+
+
+QUERY = dict(
+    from_lat=CARACAS[0], from_lon=CARACAS[1], radius_km=30,
+    target_time=datetime(2030, 12, 25, 10).timestamp(), to_lat=VALENCIA[0], to_lon=VALENCIA[1],
+)
+
+
+def _ids(body):
+    return [item["ride"]["id"][-2:] for item in json.loads(body)]
+
+
+class TestTopK:
+    """Partial selection returns the same order as a full sort."""
+
+    def test_matches_full_sort(self):
+        scores = np.random.default_rng(3).random(1000)
+        assert top_k(scores, 10).tolist() == np.argsort(-scores)[:10].tolist()
+        assert len(top_k(scores[:3], 10)) == 3
+
+
+class TestScoring:
+    """Weighted origin, destination, time, price and rating."""
+
+    def test_ranking_and_radius(self, rows):
+        body = recommend(columns_from_rows(rows[:5]), 10, **QUERY)
+
+        # Same-place ride, then 10 h later, then 13 km away, then dearer / worse rated
+        assert _ids(body) == ["01", "04", "02", "03"]
+        first = json.loads(body)[0]
+        assert first["origin_km"] == 0.0
+        assert first["score"] > 0.9
+
+
+class TestRecommendedRoute:
+    """`GET /api/rides/recommended` from the index or the database."""
+
+    @pytest.fixture
+    def rider(self):
+        async def override_user():
+            return TokenPayload(sub=RIDER, email="rider@example.com", exp=0, iat=0)
+
+        app.dependency_overrides[get_current_user] = override_user
+        yield TestClient(app)
+        app.dependency_overrides.pop(get_current_user, None)
+
+    def test_index_excludes_own_rides(self, rider, rows, fake_db, use_db, event_loop, monkeypatch):
+        index = RideIndex(enabled=True)
+        event_loop.run_until_complete(index.load(fake_db(rows)))
+        db = use_db(fake_db([]))
+        monkeypatch.setattr("app.routes.rides.ride_index", index)
+
+        params = dict(from_lat=CARACAS[0], from_lon=CARACAS[1], date_time="2030-12-25T10:00:00", limit=2)
+        response = rider.get("/api/rides/recommended", params=params)
+
+        assert response.status_code == 200
+        assert _ids(response.content) == ["01", "04"]
+        assert "06" not in _ids(rider.get("/api/rides/recommended", params={**params, "limit": 10}).content)
+        assert db.queries == []
+
+    def test_database_prefilter_without_index(self, rider, rows, fake_db, use_db):
+        db = use_db(fake_db(rows[:2]))
+        response = rider.get("/api/rides/recommended", params=dict(from_lat=CARACAS[0], from_lon=CARACAS[1]))
+
+        assert response.status_code == 200
+        assert _ids(response.content) == ["01", "02"]
+        assert ("neq", ("driver_id", RIDER)) in db.queries[0].calls
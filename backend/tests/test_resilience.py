@@ -0,0 +1,170 @@
+"""
+Tests for the database circuit breaker, query deadlines and stale fallback.
+"""
+import time
+import pytest
+from unittest.mock import Mock, patch
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.utils.cache import SizedLRUCache, entity_cache, ride_tag
+from app.utils.database import get_db, run_query
+from app.utils.resilience import CircuitBreaker, DatabaseUnavailable, db_breaker, last_good
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """Each test starts with a closed breaker and empty caches."""
+    db_breaker.record_success()
+    last_good.clear()
+    entity_cache.l1.clear()
+    yield
+    db_breaker.record_success()
+    last_good.clear()
+    entity_cache.l1.clear()
+    app.dependency_overrides.clear()
+
+
+class TestCircuitBreaker:
+    """State transitions of the breaker."""
+
+    def test_opens_after_threshold_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        with patch("app.utils.resilience.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+            assert breaker.allow()
+            breaker.record_failure()
+            assert breaker.state == "open"
+            assert not breaker.allow()
+
+        with patch("app.utils.resilience.time.monotonic", return_value=110.0):
+            assert breaker.allow()       # Trial call
+            assert not breaker.allow()   # Only one trial at a time
+            breaker.record_failure()
+            assert breaker.state == "open"
+
+        with patch("app.utils.resilience.time.monotonic", return_value=120.0):
+            assert breaker.allow()
+            breaker.record_success()
+            assert breaker.state == "closed"
+            assert breaker.snapshot()["rejected"] == 2
+
+
+class TestRunQuery:
+    """run_query deadline handling."""
+
+    @pytest.mark.asyncio
+    async def test_timeout_raises_503(self):
+        query = Mock()
+        query.execute.side_effect = lambda: time.sleep(0.2)
+
+        with pytest.raises(DatabaseUnavailable) as exc_info:
+            await run_query(query, timeout=0.01)
+
+        assert exc_info.value.status_code == 503
+        assert "Retry-After" in exc_info.value.headers
+        assert db_breaker.failures == 1
+
+
+class TestOpenBreaker:
+    """Routes surface an open breaker as 503, not as their own 500."""
+
+    @pytest.mark.parametrize("path", ["/api/rides/batch", "/api/users"])
+    def test_multi_get_returns_503(self, path):
+        async def override_get_db():
+            return Mock()
+
+        app.dependency_overrides[get_db] = override_get_db
+        for _ in range(db_breaker.failure_threshold):
+            db_breaker.record_failure()
+
+        response = TestClient(app).get(path, params={"ids": "123e4567-e89b-12d3-a456-426614174001"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"]
+
+
+class TestStaleFallback:
+    """Reads fall back to the last known good response."""
+
+    def test_ride_search_serves_stale_copy(self, event_loop):
+        ride = {
+            "id": "123e4567-e89b-12d3-a456-426614174001",
+            "from_city": "Caracas",
+            "to_city": "Valencia",
+            "from_lat": 10.4806,
+            "from_lon": -66.9036,
+            "to_lat": 10.18,
+            "to_lon": -67.99,
+            "date_time": "2030-12-25T10:00:00",
+            "price": 20.0,
+            "seats_available": 3,
+            "seats_total": 4,
+            "driver_id": "123e4567-e89b-12d3-a456-426614174000",
+            "driver": None,
+            "created_at": "2024-01-01T00:00:00"
+        }
+        mock_client = Mock()
+        mock_query = Mock()
+        mock_query.gte.return_value = mock_query
+        mock_query.gt.return_value = mock_query
+        mock_query.order.return_value = mock_query
+        mock_query.execute.return_value = Mock(data=[ride])
+        mock_client.table.return_value.select.return_value = mock_query
+
+        async def override_get_db():
+            return mock_client
+
+        app.dependency_overrides[get_db] = override_get_db
+        client = TestClient(app)
+
+        fresh = client.get("/api/rides")
+        assert fresh.status_code == 200
+        assert "x-cache-status" not in fresh.headers
+
+        mock_query.execute.side_effect = ConnectionError("supabase down")
+        stale = client.get("/api/rides")
+
+        assert stale.status_code == 200
+        assert stale.json() == fresh.json()
+        assert stale.headers["x-cache-status"] == "STALE"
+        assert stale.headers["warning"].startswith("110")
+        assert stale.headers["cache-control"] == "no-cache"
+
+        # Deleting or updating the ride drops the stale copy
+        with patch("app.utils.cache.get_redis", return_value=None):
+            event_loop.run_until_complete(entity_cache.invalidate(ride_tag(ride["id"])))
+        assert len(last_good) == 0
+        assert client.get("/api/rides").status_code == 503
+
+    def test_copies_are_bounded_by_size(self):
+        cache = SizedLRUCache(max_bytes=10, ttl=60)
+        cache.set("a", b"1234")
+        cache.set("b", b"5678")
+        cache.set("c", b"90ab")
+
+        assert cache.get("a") is None
+        assert (cache.get("b"), cache.size) == (b"5678", 8)
+        cache.set("b", b"x" * 11)
+        assert cache.get("b") is None and cache.size == 4
+
+    def test_no_stale_copy_returns_503(self):
+        mock_client = Mock()
+        mock_client.table.return_value.select.return_value.eq.return_value.execute.side_effect = (
+            ConnectionError("supabase down")
+        )
+
+        async def override_get_db():
+            return mock_client
+
+        app.dependency_overrides[get_db] = override_get_db
+        response = TestClient(app).get("/api/users/123e4567-e89b-12d3-a456-426614174000")
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"]
@@ -0,0 +1,110 @@
+"""
+Tests for the in-memory upcoming-rides index.
+"""
+import json
+import threading
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.services import ride_index
+from app.services.ride_index import RideIndex
+
+
+def _ids(payloads):
+    return [json.loads(p)["id"][-2:] for p in payloads]
+
+
+@pytest.fixture
+def loaded(event_loop, make_ride, fake_db):
+    rows = [
+        make_ride(1, hour=12),
+        make_ride(2, hour=8, price=35.0),
+        make_ride(3, day=26),
+        make_ride(4, to_city="Maracay"),
+        make_ride(5, seats=1),
+    ]
+    index = RideIndex(enabled=True)
+    event_loop.run_until_complete(index.load(fake_db(rows)))
+    return index, rows
+
+
+class TestRideIndexSearch:
+    """Filtering, ordering and limits answered from memory."""
+
+    def test_not_ready_falls_back(self):
+        assert RideIndex(enabled=True).search(from_key="caracas") is None
+
+    def test_pair_day_seats_and_price(self, loaded):
+        index, _ = loaded
+        day = datetime(2030, 12, 25).timestamp()
+
+        assert _ids(index.search("caracas", "valencia")) == ["02", "05", "01", "03"]
+        assert _ids(index.search("caracas", "valencia", since=day, until=day + 86400)) == ["02", "05", "01"]
+        assert _ids(index.search("caracas", "valencia", min_seats=2, max_price=30)) == ["01", "03"]
+        assert _ids(index.search(to_key="maracay")) == ["04"]
+        assert _ids(index.search(limit=2)) == ["02", "04"]
+        assert index.search("caracas", "merida") == []
+
+
+class TestRideIndexUpdates:
+    """Invalidations re-read the affected rides."""
+
+    def test_refetch_updates_and_removes(self, loaded, event_loop, fake_db):
+        index, rows = loaded
+        rows[0]["seats_available"] = 0
+        removed = rows.pop(1)
+
+        index._on_invalidate([f"ride:{rows[0]['id']}", f"ride:{removed['id']}"])
+        event_loop.run_until_complete(index.refetch(fake_db(rows)))
+
+        assert _ids(index.search("caracas", "valencia")) == ["05", "03"]
+        assert len(index) == 4
+
+    def test_encoding_runs_off_the_event_loop(self, loaded, event_loop, fake_db, monkeypatch):
+        """Full loads and refetches validate and encode rows in the threadpool."""
+        index, rows = loaded
+        threads = set()
+        encode = ride_index._encode
+
+        def tracking_encode(row):
+            threads.add(threading.get_ident())
+            return encode(row)
+
+        monkeypatch.setattr(ride_index, "_encode", tracking_encode)
+        event_loop.run_until_complete(index.load(fake_db(rows)))
+        index._on_invalidate([f"ride:{rows[0]['id']}"])
+        event_loop.run_until_complete(index.refetch(fake_db(rows)))
+
+        assert threads and threading.get_ident() not in threads
+        assert len(index) == 5
+
+    def test_driver_profile_change_marks_their_rides(self, loaded):
+        index, _ = loaded
+        index._on_invalidate(["user:123e4567-e89b-12d3-a456-426614174000"])
+        assert len(index._dirty) == 5
+
+
+class TestSearchRoute:
+    """`GET /api/rides` uses the index for known cities."""
+
+    def test_known_cities_skip_the_database(self, loaded, monkeypatch, fake_db, use_db):
+        index, _ = loaded
+        monkeypatch.setattr("app.routes.rides.ride_index", index)
+        db = use_db(fake_db([]))
+        client = TestClient(app)
+
+        response = client.get("/api/rides", params={"from_city": "Caracas", "to_city": "Maracay"})
+        assert response.status_code == 200
+        assert [r["to_city"] for r in response.json()] == ["Maracay"]
+        assert db.queries == []
+
+        # Partial text: database search as before
+        assert client.get("/api/rides", params={"from_city": "carac"}).json() == []
+        assert [query.table for query in db.queries] == ["Ride"]
@@ -0,0 +1,123 @@
+"""
+Tests for flexible-date search grouped by day and faceted result pages.
+"""
+import json
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.services.ride_index import columns_from_rows
+from app.services.ride_search import APP_TIMEZONE, SEARCH_FACET_MAX_ROWS, date_window, facet_counts, group_by_day
+
+
+@pytest.fixture
+def rows(make_ride):
+    return [make_ride(1, day=24, hour=8), make_ride(2, day=24, hour=18), make_ride(3, day=26)]
+
+
+@pytest.fixture
+def search_db(rows, fake_db, use_db):
+    return use_db(fake_db(rows))
+
+
+def _local(*args) -> datetime:
+    return datetime(*args, tzinfo=APP_TIMEZONE)
+
+
+class TestDateWindow:
+    """`date` ± `flex_days` or `date_from`..`date_to`, in local days."""
+
+    def test_windows(self):
+        assert date_window() is None
+        assert date_window("2030-12-25") == (_local(2030, 12, 25), _local(2030, 12, 26))
+        assert date_window("2030-12-25", 2) == (_local(2030, 12, 23), _local(2030, 12, 28))
+        assert date_window(date_from="2030-12-24", date_to="2030-12-26") == (
+            _local(2030, 12, 24), _local(2030, 12, 27)
+        )
+        assert date_window("2030-12-25")[0].isoformat() == "2030-12-25T00:00:00-04:00"
+
+    @pytest.mark.parametrize("kwargs", [
+        {"date": "2030-12-25", "date_from": "2030-12-24"},
+        {"flex_days": 1},
+        {"date_from": "2030-12-26", "date_to": "2030-12-24"},
+        {"date_from": "2030-12-01", "date_to": "2030-12-31"},
+        {"date": "25/12/2030"},
+    ])
+    def test_invalid(self, kwargs):
+        with pytest.raises(ValueError):
+            date_window(**kwargs)
+
+
+class TestGroupByDay:
+    """Every day of the window is listed, empty ones included."""
+
+    def test_counts_and_groups(self, rows):
+        body = json.loads(group_by_day(columns_from_rows(rows), *date_window(date_from="2030-12-24", date_to="2030-12-26")))
+
+        assert body["total"] == 3
+        assert (body["date_from"], body["date_to"]) == ("2030-12-24", "2030-12-26")
+        assert [(d["date"], d["count"]) for d in body["days"]] == [
+            ("2030-12-24", 2), ("2030-12-25", 0), ("2030-12-26", 1)
+        ]
+        assert [r["id"][-2:] for r in body["days"][0]["rides"]] == ["01", "02"]
+
+    def test_late_evening_departure_stays_on_its_local_day(self, make_ride):
+        """21:00 in Caracas on the 5th is 01:00 UTC on the 6th."""
+        rows = [make_ride(1, date_time="2030-12-06T01:00:00+00:00")]
+        body = json.loads(group_by_day(columns_from_rows(rows), *date_window(date_from="2030-12-05", date_to="2030-12-06")))
+
+        assert [(d["date"], d["count"]) for d in body["days"]] == [("2030-12-05", 1), ("2030-12-06", 0)]
+
+
+class TestSearchByDayRoute:
+    """`GET /api/rides/search` answers the whole window with one query."""
+
+    def test_one_query_for_the_window(self, search_db):
+        client = TestClient(app)
+        response = client.get("/api/rides/search", params={"date": "2030-12-25", "flex_days": 1})
+
+        assert response.status_code == 200
+        assert [d["count"] for d in response.json()["days"]] == [2, 0, 1]
+        assert len(search_db.queries) == 1
+        assert ("gte", ("date_time", "2030-12-24T00:00:00-04:00")) in search_db.queries[0].calls
+        assert ("lt", ("date_time", "2030-12-27T00:00:00-04:00")) in search_db.queries[0].calls
+
+        assert client.get("/api/rides/search", params={"flex_days": 1}).status_code == 400
+
+
+class TestFacets:
+    """Facet counts come from the same filtered set as the page."""
+
+    def test_facet_counts(self, make_ride):
+        rows = [make_ride(1, day=24), make_ride(2, day=24), make_ride(3, day=26), make_ride(4, day=26)]
+        # UTC timestamps as PostgREST returns them: 08, 18, 22 and 02 h in Caracas
+        for row, utc in zip(rows, ("24T12", "24T22", "27T02", "26T06")):
+            row["date_time"] = f"2030-12-{utc}:00:00+00:00"
+        rows[1]["price"], rows[2]["price"], rows[3]["price"] = 5.0, 60.0, None
+        rows[0]["seats_available"], rows[3]["seats_available"] = 1, 6
+
+        facets = facet_counts(columns_from_rows(rows))
+
+        assert [band["count"] for band in facets["price"]] == [1, 0, 1, 1]
+        assert facets["price"][-1] == {"min": 50, "max": None, "count": 1}
+        assert facets["price_unknown"] == 1
+        assert facets["time_of_day"] == {"morning": 1, "afternoon": 1, "night": 2}
+        assert facets["seats"] == {"1": 1, "2": 0, "3": 2, "4+": 1}
+
+    def test_page_with_facets(self, search_db):
+        client = TestClient(app)
+        body = client.get("/api/rides/page", params={"limit": 2, "offset": 1}).json()
+
+        assert (body["total"], body["offset"], body["limit"], body["truncated"]) == (3, 1, 2, False)
+        assert [r["id"][-2:] for r in body["rides"]] == ["02", "03"]
+        assert body["facets"]["seats"]["3"] == 3
+        assert [query.size for query in search_db.queries] == [SEARCH_FACET_MAX_ROWS]
+
+        response = client.get("/api/rides", params={"limit": 2, "stream": "true"})
+        assert response.status_code == 400
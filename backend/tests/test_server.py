@@ -0,0 +1,27 @@
+"""
+Tests for the production server launcher configuration.
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import server
+
+
+def test_uvicorn_options_drain_on_shutdown():
+    options = server.uvicorn_options()
+    assert options["timeout_graceful_shutdown"] == server.GRACEFUL_TIMEOUT_SECONDS
+    assert options["loop"] in ("uvloop", "asyncio")
+    assert options["http"] in ("httptools", "h11")
+
+
+@pytest.mark.skipif(server.GunicornServer is None, reason="gunicorn not installed")
+def test_gunicorn_preloads_and_honours_workers():
+    options = server.gunicorn_options()
+    assert options["preload_app"] is True
+    assert options["workers"] == server.WORKERS
+    assert options["graceful_timeout"] > server.GRACEFUL_TIMEOUT_SECONDS
+    assert options["worker_class"] == "app.server.DaleUvicornWorker"
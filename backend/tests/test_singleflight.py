@@ -0,0 +1,89 @@
+"""
+Tests for single-flight coalescing of identical concurrent reads.
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.utils.singleflight import SingleFlight, flight_key
+
+
+class TestSingleFlight:
+    """Unit tests for SingleFlight."""
+
+    def test_flight_key_normalizes_params(self):
+        """Case, whitespace and None params do not change the key."""
+        a = flight_key("search", {"from_city": " Caracas", "to_city": None, "min_seats": 2})
+        b = flight_key("search", {"min_seats": 2, "from_city": "caracas "})
+
+        assert a == b
+        assert a != flight_key("search", {"from_city": "caracas"}, scope="user-1")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        """Identical in-flight reads run the upstream call once."""
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return ["ride"]
+
+        results = await asyncio.gather(*(flights.do("k", fetch) for _ in range(5)))
+
+        assert calls == 1
+        assert results == [["ride"]] * 5
+        assert flights.stats == {"calls": 1, "shared": 4}
+        assert flights.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Only when every waiter leaves is the upstream call cancelled."""
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.ensure_future(flights.do("k", fetch))
+        second = asyncio.ensure_future(flights.do("k", fetch))
+        await started.wait()
+
+        first.cancel()
+        assert await second == 42
+
+        lonely = asyncio.ensure_future(flights.do("other", fetch))
+        await asyncio.sleep(0)
+        upstream = flights._calls["other"]
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        await asyncio.sleep(0)
+        assert upstream.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared_and_not_cached(self):
+        """An upstream error reaches every waiter and the next call retries."""
+        flights = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise RuntimeError("PostgREST down")
+
+        results = await asyncio.gather(
+            flights.do("k", failing), flights.do("k", failing), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        async def ok():
+            return "ok"
+
+        assert await flights.do("k", ok) == "ok"
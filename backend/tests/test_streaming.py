@@ -0,0 +1,70 @@
+"""
+Tests for streamed JSON list responses.
+"""
+import json
+import pytest
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.main import app
+from app.utils import streaming
+from app.utils.resilience import db_breaker, last_good
+
+
+@pytest.fixture
+def paged_db(monkeypatch, make_ride, fake_db, use_db):
+    monkeypatch.setattr(streaming, "STREAM_PAGE_SIZE", 2)
+    # Pairs share a departure: pages must break ties by id
+    rows = [make_ride(i, hour=10 + i // 2, notes="Parada en Maracay") for i in range(5)]
+    last_good.clear()
+    yield use_db(fake_db(rows))
+    last_good.clear()
+    db_breaker.record_success()
+
+
+class TestStreamedLists:
+    """`stream=true` returns the same array, read page by page."""
+
+    def test_search_stream_matches_buffered_response(self, paged_db):
+        client = TestClient(app)
+
+        buffered = client.get("/api/rides")
+        streamed = client.get("/api/rides", params={"stream": "true"})
+
+        assert streamed.status_code == 200
+        assert streamed.headers["content-type"] == "application/json"
+        assert "etag" not in streamed.headers
+        assert json.loads(streamed.content) == buffered.json()
+        assert len(json.loads(streamed.content)) == len(paged_db.rows)
+        # One unbounded query, then pages of 2 after the last row sent
+        pages = [(q.after and q.after[1][-2:], q.size) for q in paged_db.queries]
+        assert pages == [(None, None), (None, 2), ("01", 2), ("03", 2)]
+
+    def test_rows_removed_between_pages_are_not_skipped(self, paged_db):
+        """Keyset pages stay stable when earlier rows leave the filter."""
+        rows = paged_db.rows
+        original = [r["id"] for r in rows]
+
+        def booked_out(query):
+            # The first two rides fill up once their page has been sent
+            if query.after is not None and rows[0]["id"] == original[0]:
+                del rows[:2]
+
+        paged_db.on_execute = booked_out
+        streamed = TestClient(app).get("/api/rides", params={"stream": "true"})
+
+        assert [r["id"] for r in json.loads(streamed.content)] == original
+
+    def test_first_page_error_keeps_status_code(self, paged_db):
+        def boom(query):
+            raise Exception("boom")
+
+        paged_db.on_execute = boom
+        response = TestClient(app).get("/api/rides", params={"stream": "true"})
+
+        assert response.status_code == 500
+        assert "boom" in response.json()["detail"]
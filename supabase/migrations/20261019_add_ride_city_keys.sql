@@ -0,0 +1,60 @@
+-- Migration: Normalized city keys on Ride for index-friendly search
+-- Date: 2026-10-19
+--
+-- search_rides filtered with ILIKE '%city%', which no B-tree index can serve.
+-- The API now stores a canonical key per endpoint (lowercase, unaccented,
+-- matched against the bundled city gazetteer, see app/services/cities.py)
+-- and searches known cities with equality on these columns.
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+ALTER TABLE "Ride"
+ADD COLUMN IF NOT EXISTS from_city_key TEXT,
+ADD COLUMN IF NOT EXISTS to_city_key TEXT;
+
+-- Approximation of normalize_city() for rows written outside the API
+-- (seed scripts, dashboard). It does not resolve aliases or abbreviations;
+-- scripts/backfill_city_keys.py applies the full canonicalization.
+CREATE OR REPLACE FUNCTION dale_city_key(city TEXT) RETURNS TEXT
+LANGUAGE sql STABLE AS $$
+  SELECT NULLIF(trim(regexp_replace(lower(unaccent(city)), '[^a-z0-9]+', ' ', 'g')), '')
+$$;
+
+CREATE OR REPLACE FUNCTION dale_ride_city_keys() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- A renamed city invalidates its key unless the writer sent a new one
+  IF TG_OP = 'UPDATE' THEN
+    IF NEW.from_city IS DISTINCT FROM OLD.from_city
+       AND NEW.from_city_key IS NOT DISTINCT FROM OLD.from_city_key THEN
+      NEW.from_city_key := NULL;
+    END IF;
+    IF NEW.to_city IS DISTINCT FROM OLD.to_city
+       AND NEW.to_city_key IS NOT DISTINCT FROM OLD.to_city_key THEN
+      NEW.to_city_key := NULL;
+    END IF;
+  END IF;
+  NEW.from_city_key := COALESCE(NEW.from_city_key, dale_city_key(NEW.from_city));
+  NEW.to_city_key := COALESCE(NEW.to_city_key, dale_city_key(NEW.to_city));
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS ride_city_keys ON "Ride";
+CREATE TRIGGER ride_city_keys
+  BEFORE INSERT OR UPDATE ON "Ride"
+  FOR EACH ROW EXECUTE FUNCTION dale_ride_city_keys();
+
+-- Backfill existing rows (approximate keys, see above)
+UPDATE "Ride" SET
+  from_city_key = dale_city_key(from_city),
+  to_city_key = dale_city_key(to_city)
+WHERE from_city_key IS NULL OR to_city_key IS NULL;
+
+-- Search always filters seats_available > 0 and future date_time
+CREATE INDEX IF NOT EXISTS idx_ride_city_keys_date
+  ON "Ride"(from_city_key, to_city_key, date_time)
+  WHERE seats_available > 0;
+CREATE INDEX IF NOT EXISTS idx_ride_to_city_key_date
+  ON "Ride"(to_city_key, date_time)
+  WHERE seats_available > 0;
@@ -0,0 +1,17 @@
+-- Migration: Route corridor cells on Ride for corridor search
+-- Date: 2026-10-20
+--
+-- GET /api/rides/corridor finds rides passing near a pickup and drop-off,
+-- not only rides starting and ending there. The API stores each ride's
+-- route (driver polyline or great-circle segment) buffered into grid cell
+-- IDs (see app/services/corridors.py); search is an array containment
+-- test (route_cells @> ARRAY[pickup_cell, dropoff_cell]) served by GIN.
+
+ALTER TABLE "Ride"
+ADD COLUMN IF NOT EXISTS route_cells INTEGER[];
+
+CREATE INDEX IF NOT EXISTS idx_ride_route_cells
+  ON "Ride" USING GIN (route_cells)
+  WHERE seats_available > 0;
+
+-- Existing rows: run scripts/backfill_route_cells.py